@@ -1,4 +1,4 @@
-from fastapi import APIRouter, HTTPException, Depends, status, File, UploadFile
+from fastapi import APIRouter, HTTPException, Depends, Response, status, File, UploadFile
 from fastapi.responses import JSONResponse
 from fastapi.encoders import jsonable_encoder
 import os
@@ -7,6 +7,9 @@ from pathlib import Path
 from typing import List
 from datetime import datetime
 from models import *
+from mock_db import ReturnDocument
+from pagination import NEWEST_FIRST, PageParams, paginate
+from schedule import ExpiringDict
 from auth import get_current_admin, verify_password, hash_password, create_access_token, DEFAULT_ADMIN
 # MongoDB import removed - using mock database
 from dotenv import load_dotenv
@@ -20,8 +23,10 @@ db = None
 
 admin_router = APIRouter(prefix="/api/admin", tags=["admin"])
 
-# Upload progress tracking
-upload_progress = {}
+# Upload progress tracking. Entries go 5 minutes after the upload starts,
+# whether or not anyone polls for them.
+UPLOAD_PROGRESS_TTL = 300
+upload_progress = ExpiringDict(UPLOAD_PROGRESS_TTL)
 
 class UploadProgress:
     def __init__(self, total_size):
@@ -152,11 +157,8 @@ async def update_admin_profile(profile_data: AdminProfileUpdate, current_admin:
     if not update_data:
         raise HTTPException(status_code=400, detail="No data to update")
     
-    # Update admin profile
-    await db.admins.update_one(
-        {"id": current_admin["id"]}, 
-        {"$set": update_data}
-    )
+    # The admin and the public profile change together, in one transaction
+    transaction = db.transaction().update_one(db.admins, {"id": current_admin["id"]}, {"$set": update_data})
     
     # Also update profiles collection for public API
     profile_update_data = {}
@@ -185,15 +187,15 @@ async def update_admin_profile(profile_data: AdminProfileUpdate, current_admin:
         profile_update_data["avatar"] = update_data["avatar"]
     
     if profile_update_data:
-        await db.profiles.update_one(
+        transaction.update_one(
+            db.profiles,
             {"admin_id": current_admin["id"]},
             {"$set": profile_update_data},
             upsert=True
         )
     
-    # Get updated admin data
-    updated_admin = await db.admins.find_one({"id": current_admin["id"]})
-    return {"admin": AdminResponse(**updated_admin)}
+    await transaction.commit()
+    return {"admin": AdminResponse(**{**admin, **update_data})}
 
 # Media Management Endpoints
 @admin_router.get("/media-settings")
@@ -245,7 +247,8 @@ async def get_upload_progress(
     current_admin: dict = Depends(get_current_admin)
 ):
     """Get upload progress for a specific upload ID"""
-    if upload_id not in upload_progress:
+    progress = upload_progress.get(upload_id)
+    if progress is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail={
@@ -254,15 +257,7 @@ async def get_upload_progress(
             }
         )
     
-    progress = upload_progress[upload_id].get_progress()
-    
-    # Clean up completed or failed uploads after 5 minutes
-    if progress["status"] in ["completed", "failed"]:
-        elapsed_time = datetime.now() - upload_progress[upload_id].start_time
-        if elapsed_time.total_seconds() > 300:  # 5 minutes
-            del upload_progress[upload_id]
-    
-    return progress
+    return progress.get_progress()
 
 @admin_router.post("/upload-media")
 async def upload_media(
@@ -303,11 +298,11 @@ async def upload_media(
     file_size = len(file_content)
     
     # Initialize progress tracking
-    upload_progress[upload_id] = UploadProgress(file_size)
+    progress = upload_progress[upload_id] = UploadProgress(file_size)
     
     try:
         if file_size > MAX_FILE_SIZE:
-            upload_progress[upload_id].fail(f"File size ({file_size / (1024*1024):.2f}MB) exceeds maximum allowed size (10MB)")
+            progress.fail(f"File size ({file_size / (1024*1024):.2f}MB) exceeds maximum allowed size (10MB)")
             raise HTTPException(
                 status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
                 detail={
@@ -320,7 +315,7 @@ async def upload_media(
             )
         
         if file_size == 0:
-            upload_progress[upload_id].fail("The uploaded file is empty")
+            progress.fail("The uploaded file is empty")
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail={
@@ -341,7 +336,7 @@ async def upload_media(
         }
         
         if file.content_type not in allowed_types:
-            upload_progress[upload_id].fail(f"File type '{file.content_type}' is not supported")
+            progress.fail(f"File type '{file.content_type}' is not supported")
             raise HTTPException(
                 status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
                 detail={
@@ -358,7 +353,7 @@ async def upload_media(
         valid_extensions = [ext for exts in allowed_types.values() for ext in exts]
         
         if file_extension not in valid_extensions:
-            upload_progress[upload_id].fail(f"File extension '{file_extension}' is not allowed")
+            progress.fail(f"File extension '{file_extension}' is not allowed")
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail={
@@ -371,7 +366,7 @@ async def upload_media(
             )
         
         # Update progress - validation complete
-        upload_progress[upload_id].update(file_size * 0.1)  # 10% for validation
+        progress.update(file_size * 0.1)  # 10% for validation
         
         # Create uploads directory if it doesn't exist
         upload_dir = Path("uploads")
@@ -382,25 +377,25 @@ async def upload_media(
         file_path = upload_dir / unique_filename
         
         # Update progress - starting file write
-        upload_progress[upload_id].update(file_size * 0.2)  # 20% for setup
+        progress.update(file_size * 0.2)  # 20% for setup
         
         # Save file with progress tracking
         with open(file_path, "wb") as buffer:
             buffer.write(file_content)
         
         # Update progress - file written
-        upload_progress[upload_id].update(file_size * 0.8)  # 80% for file write
+        progress.update(file_size * 0.8)  # 80% for file write
         
         # Verify file was written correctly
         if not file_path.exists() or file_path.stat().st_size != file_size:
-            upload_progress[upload_id].fail("File write verification failed")
+            progress.fail("File write verification failed")
             raise Exception("File write verification failed")
         
         # Create URL
         file_url = f"/uploads/{unique_filename}"
         
         # Update progress - updating database
-        upload_progress[upload_id].update(file_size * 0.9)  # 90% for verification
+        progress.update(file_size * 0.9)  # 90% for verification
         
         # Update media settings in database
         media_collection = db.media_settings
@@ -420,7 +415,7 @@ async def upload_media(
         )
         
         # Mark upload as complete
-        upload_progress[upload_id].complete()
+        progress.complete()
         
         return {
             "success": True,
@@ -441,7 +436,7 @@ async def upload_media(
         raise
     except Exception as e:
         # Mark upload as failed
-        upload_progress[upload_id].fail(str(e))
+        progress.fail(str(e))
         
         # Clean up file if anything fails
         if 'file_path' in locals() and file_path.exists():
@@ -495,7 +490,7 @@ async def remove_media(
     
     try:
         media_collection = db.media_settings
-        result = await media_collection.update_one(
+        await media_collection.update_one(
             {"id": "main"},
             {"$unset": {media_type: ""}}
         )
@@ -647,19 +642,16 @@ async def update_offer(
 ):
     """Update offer"""
     try:
-        # Check if offer exists first
-        existing_offer = await db.offers.find_one({"id": offer_id})
-        if not existing_offer:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Offer not found"
-            )
-        
         offer_data["updated_at"] = datetime.utcnow().isoformat()
-        await db.offers.update_one(
+        result = await db.offers.update_one(
             {"id": offer_id},
             {"$set": offer_data}
         )
+        if not result.matched_count:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Offer not found"
+            )
         return jsonable_encoder({"message": "Offer updated successfully"})
     except HTTPException:
         raise
@@ -676,21 +668,19 @@ async def toggle_offer(
 ):
     """Toggle offer active status"""
     try:
-        offer = await db.offers.find_one({"id": offer_id})
-        if not offer:
+        # Flip active in storage, so two toggles never both read the old state
+        updated_offer = await db.offers.find_one_and_update(
+            {"id": offer_id},
+            {"$bit": {"active": {"xor": True}}, "$set": {"updated_at": datetime.utcnow().isoformat()}},
+            return_document=ReturnDocument.AFTER
+        )
+        if not updated_offer:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Offer not found"
             )
         
-        new_status = not offer.get("active", False)
-        result = await db.offers.update_one(
-            {"id": offer_id},
-            {"$set": {"active": new_status, "updated_at": datetime.utcnow().isoformat()}}
-        )
-        
-        # Get updated offer and return with proper serialization
-        updated_offer = await db.offers.find_one({"id": offer_id})
+        new_status = updated_offer["active"]
         return jsonable_encoder({
             "message": f"Offer {'activated' if new_status else 'deactivated'} successfully", 
             "active": new_status,
@@ -728,8 +718,9 @@ async def delete_offer(
 
 # Services Management
 @admin_router.get("/services", response_model=List[Service])
-async def get_services(current_admin: dict = Depends(get_current_admin)):
-    services = await db.services.find().to_list(1000)
+async def get_services(response: Response, page: PageParams = Depends(),
+                       current_admin: dict = Depends(get_current_admin)):
+    services = await paginate(db.services, response, page)
     return [Service(**service) for service in services]
 
 @admin_router.post("/services", response_model=Service)
@@ -744,10 +735,10 @@ async def update_service(service_id: str, service_data: ServiceUpdate, current_a
     if not update_data:
         raise HTTPException(status_code=400, detail="No data to update")
     
-    result = await db.services.update_one({"id": service_id}, {"$set": update_data})
-    # MockDB doesn't have matched_count, skip this check
-    
-    updated_service = await db.services.find_one({"id": service_id})
+    updated_service = await db.services.find_one_and_update(
+        {"id": service_id}, {"$set": update_data}, return_document=ReturnDocument.AFTER)
+    if not updated_service:
+        raise HTTPException(status_code=404, detail="Service not found")
     return Service(**updated_service)
 
 @admin_router.delete("/services/{service_id}")
@@ -759,8 +750,9 @@ async def delete_service(service_id: str, current_admin: dict = Depends(get_curr
 
 # Projects Management
 @admin_router.get("/projects", response_model=List[Project])
-async def get_projects(current_admin: dict = Depends(get_current_admin)):
-    projects = await db.projects.find().to_list(1000)
+async def get_projects(response: Response, page: PageParams = Depends(),
+                       current_admin: dict = Depends(get_current_admin)):
+    projects = await paginate(db.projects, response, page)
     return [Project(**project) for project in projects]
 
 @admin_router.post("/projects", response_model=Project)
@@ -775,10 +767,10 @@ async def update_project(project_id: str, project_data: ProjectUpdate, current_a
     if not update_data:
         raise HTTPException(status_code=400, detail="No data to update")
     
-    result = await db.projects.update_one({"id": project_id}, {"$set": update_data})
-    # MockDB doesn't have matched_count, skip this check
-    
-    updated_project = await db.projects.find_one({"id": project_id})
+    updated_project = await db.projects.find_one_and_update(
+        {"id": project_id}, {"$set": update_data}, return_document=ReturnDocument.AFTER)
+    if not updated_project:
+        raise HTTPException(status_code=404, detail="Project not found")
     return Project(**updated_project)
 
 @admin_router.delete("/projects/{project_id}")
@@ -790,8 +782,9 @@ async def delete_project(project_id: str, current_admin: dict = Depends(get_curr
 
 # Testimonials Management
 @admin_router.get("/testimonials", response_model=List[Testimonial])
-async def get_testimonials(current_admin: dict = Depends(get_current_admin)):
-    testimonials = await db.testimonials.find().to_list(1000)
+async def get_testimonials(response: Response, page: PageParams = Depends(),
+                       current_admin: dict = Depends(get_current_admin)):
+    testimonials = await paginate(db.testimonials, response, page)
     return [Testimonial(**testimonial) for testimonial in testimonials]
 
 @admin_router.post("/testimonials", response_model=Testimonial)
@@ -806,10 +799,10 @@ async def update_testimonial(testimonial_id: str, testimonial_data: TestimonialU
     if not update_data:
         raise HTTPException(status_code=400, detail="No data to update")
     
-    result = await db.testimonials.update_one({"id": testimonial_id}, {"$set": update_data})
-    # MockDB doesn't have matched_count, skip this check
-    
-    updated_testimonial = await db.testimonials.find_one({"id": testimonial_id})
+    updated_testimonial = await db.testimonials.find_one_and_update(
+        {"id": testimonial_id}, {"$set": update_data}, return_document=ReturnDocument.AFTER)
+    if not updated_testimonial:
+        raise HTTPException(status_code=404, detail="Testimonial not found")
     return Testimonial(**updated_testimonial)
 
 @admin_router.delete("/testimonials/{testimonial_id}")
@@ -820,10 +813,18 @@ async def delete_testimonial(testimonial_id: str, current_admin: dict = Depends(
     return {"message": "Testimonial deleted successfully"}
 
 # Blog Management
-@admin_router.get("/blogs", response_model=List[BlogPost])
-async def get_blogs(current_admin: dict = Depends(get_current_admin)):
-    blogs = await db.blogs.find().to_list(1000)
-    return [BlogPost(**blog) for blog in blogs]
+@admin_router.get("/blogs", response_model=List[BlogPostSummary])
+async def get_blogs(response: Response, page: PageParams = Depends(),
+                    current_admin: dict = Depends(get_current_admin)):
+    blogs = await paginate(db.blogs, response, page, projection={"content": 0})
+    return [BlogPostSummary(**blog) for blog in blogs]
+
+@admin_router.get("/blogs/{blog_id}", response_model=BlogPost)
+async def get_blog(blog_id: str, current_admin: dict = Depends(get_current_admin)):
+    blog = await db.blogs.find_one({"id": blog_id})
+    if not blog:
+        raise HTTPException(status_code=404, detail="Blog not found")
+    return BlogPost(**blog)
 
 @admin_router.post("/blogs", response_model=BlogPost)
 async def create_blog(blog_data: BlogPostCreate, current_admin: dict = Depends(get_current_admin)):
@@ -837,10 +838,10 @@ async def update_blog(blog_id: str, blog_data: BlogPostUpdate, current_admin: di
     if not update_data:
         raise HTTPException(status_code=400, detail="No data to update")
     
-    result = await db.blogs.update_one({"id": blog_id}, {"$set": update_data})
-    # MockDB doesn't have matched_count, skip this check
-    
-    updated_blog = await db.blogs.find_one({"id": blog_id})
+    updated_blog = await db.blogs.find_one_and_update(
+        {"id": blog_id}, {"$set": update_data}, return_document=ReturnDocument.AFTER)
+    if not updated_blog:
+        raise HTTPException(status_code=404, detail="Blog not found")
     return BlogPost(**updated_blog)
 
 @admin_router.delete("/blogs/{blog_id}")
@@ -852,8 +853,9 @@ async def delete_blog(blog_id: str, current_admin: dict = Depends(get_current_ad
 
 # Contact Management
 @admin_router.get("/contacts", response_model=List[ContactInquiry])
-async def get_contacts(current_admin: dict = Depends(get_current_admin)):
-    contacts = await db.contacts.find().sort("created_at", -1).to_list(1000)
+async def get_contacts(response: Response, page: PageParams = Depends(),
+                       current_admin: dict = Depends(get_current_admin)):
+    contacts = await paginate(db.contacts, response, page, sort_keys=NEWEST_FIRST)
     return [ContactInquiry(**contact) for contact in contacts]
 
 @admin_router.post("/contacts", response_model=ContactInquiry)
@@ -874,7 +876,9 @@ async def get_notifications(current_admin: dict = Depends(get_current_admin)):
     try:
         # Get recent activities for notifications
         recent_contacts = await db.contacts.find({}).sort([("created_at", -1)]).limit(5).to_list()
-        recent_blogs = await db.blogs.find({"published": True}).sort([("created_at", -1)]).limit(3).to_list()
+        recent_blogs = await db.blogs.find(
+            {"published": True}, {"id": 1, "title": 1, "created_at": 1}
+        ).sort([("created_at", -1)]).limit(3).to_list()
         
         notifications = []
         
@@ -970,24 +974,19 @@ async def delete_contact(contact_id: str, current_admin: dict = Depends(get_curr
 # Dashboard Stats
 @admin_router.get("/stats", response_model=DashboardStats)
 async def get_dashboard_stats(current_admin: dict = Depends(get_current_admin)):
-    total_projects = await db.projects.count_documents({})
-    total_services = await db.services.count_documents({"active": True})
-    total_testimonials = await db.testimonials.count_documents({"approved": True})
-    total_contacts = await db.contacts.count_documents({})
-    unread_contacts = await db.contacts.count_documents({"read": False})
-    published_blogs = await db.blogs.count_documents({"published": True})
-    total_blogs = await db.blogs.count_documents({})
+    # Maintained by the storage layer on every write, so no documents are scanned
+    counters = await db.counters()
     
     recent_contacts = await db.contacts.find().sort("created_at", -1).limit(5).to_list(5)
     recent_contacts_list = [ContactInquiry(**contact) for contact in recent_contacts]
     
     return DashboardStats(
-        total_projects=total_projects,
-        total_services=total_services,
-        total_testimonials=total_testimonials,
-        total_contacts=total_contacts,
-        unread_contacts=unread_contacts,
-        published_blogs=published_blogs,
-        total_blogs=total_blogs,
+        total_projects=counters["projects"]["total"],
+        total_services=counters["services"]["active"],
+        total_testimonials=counters["testimonials"]["approved"],
+        total_contacts=counters["contacts"]["total"],
+        unread_contacts=counters["contacts"]["unread"],
+        published_blogs=counters["blogs"]["published"],
+        total_blogs=counters["blogs"]["total"],
         recent_contacts=recent_contacts_list
     )
\ No newline at end of file
@@ -0,0 +1,82 @@
+"""The landing page's data fetched as seven separate requests vs one
+/api/bootstrap: server time per page load, rendered and cached, and bytes
+sent with and without gzip.
+
+    python benchmarks/bench_bootstrap.py
+"""
+import asyncio
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import public_routes
+from bench_responses import make_app
+from mock_db import MockDB
+
+SERVICES = 12
+TESTIMONIALS = 30
+LOADS = 200
+SEPARATE = ["/api/site-settings", "/api/hero-section", "/api/media-settings", "/api/profile",
+            "/api/offers/active", "/api/services", "/api/testimonials"]
+BOOTSTRAP = ["/api/bootstrap"]
+
+async def seed(db):
+    await db.services.insert_many([{
+        "id": f"service-{i}", "title": f"Service {i}", "description": "Responsive websites that convert. " * 6,
+        "icon": "Globe", "features": ["Responsive", "SEO", "Hosting", "Support"], "price": "₹9,999",
+        "duration": "2 weeks", "active": True, "created_at": f"2024-01-01T00:00:{i:02d}",
+    } for i in range(SERVICES)])
+    await db.testimonials.insert_many([{
+        "id": f"testimonial-{i}", "name": f"Client {i}", "position": "Founder", "company": "Acme",
+        "text": "Great work, delivered on time and beyond expectations. " * 3, "rating": 5,
+        "image": "/uploads/client.jpg", "approved": True, "created_at": f"2024-01-01T00:00:{i:02d}",
+    } for i in range(TESTIMONIALS)])
+    await db.offers.insert_one({"id": "launch", "title": "Launch Offer", "active": True, "priority": 1,
+                                "starts_at": "2024-01-01T00:00:00", "ends_at": "2099-01-01T00:00:00"})
+
+async def request(app, url, headers):
+    path, _, query = url.partition('?')
+    scope = {'type': 'http', 'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+             'path': path, 'raw_path': path.encode(), 'root_path': '', 'query_string': query.encode(),
+             'headers': [(b'host', b'localhost'), *headers], 'server': ('localhost', 80), 'client': ('127.0.0.1', 1)}
+    size = 0
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        nonlocal size
+        if message['type'] == 'http.response.body':
+            size += len(message.get('body', b''))
+
+    await app(scope, receive, send)
+    return size
+
+async def page_load(app, urls, headers=()):
+    return sum([await request(app, url, headers) for url in urls])
+
+async def measure(app, urls):
+    await page_load(app, urls)
+    start = time.perf_counter()
+    for _ in range(LOADS):
+        await page_load(app, urls)
+    return (time.perf_counter() - start) / LOADS * 1000
+
+async def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        db = MockDB(tmp)
+        await seed(db)
+        public_routes.db = db
+        rendered, cached = make_app(db, 0), make_app(db, 32 * 1024 * 1024)
+        print(f"{'fetch':<10} {'requests':>8} {'rendered ms':>12} {'cached ms':>10} {'bytes':>7} {'gzip bytes':>11}")
+        for name, urls in [("separate", SEPARATE), ("bootstrap", BOOTSTRAP)]:
+            size = await page_load(cached, urls)
+            compressed = await page_load(cached, urls, [(b'accept-encoding', b'gzip')])
+            print(f"{name:<10} {len(urls):>8} {await measure(rendered, urls):>12.2f} "
+                  f"{await measure(cached, urls):>10.3f} {size:>7} {compressed:>11}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,61 @@
+"""Time to insert, mark read and delete N contacts one at a time vs in bulk.
+
+The one-at-a-time numbers await each call in turn, the way a loop over
+insert_one/update_one/delete_one in a route or seed script would. They
+are skipped above LOOP_MAX documents, where they take minutes.
+
+    python benchmarks/bench_bulk.py
+"""
+import asyncio
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from corpus import make_contacts
+from mock_db import MockDB
+
+SIZES = [100, 1_000, 10_000, 100_000]
+LOOP_MAX = 1_000
+
+async def timed(coro):
+    start = time.perf_counter()
+    await coro
+    return (time.perf_counter() - start) * 1000
+
+async def one_at_a_time(collection, docs):
+    start = time.perf_counter()
+    for doc in docs:
+        await collection.insert_one(doc)
+    insert = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    for doc in docs:
+        await collection.update_one({"id": doc["id"]}, {"$set": {"read": True}})
+    update = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    for doc in docs:
+        await collection.delete_one({"id": doc["id"]})
+    delete = (time.perf_counter() - start) * 1000
+    return insert, update, delete
+
+async def bulk(collection, docs):
+    insert = await timed(collection.insert_many(docs))
+    update = await timed(collection.update_many({"read": False}, {"$set": {"read": True}}))
+    delete = await timed(collection.delete_many({}))
+    return insert, update, delete
+
+async def main():
+    print(f"{'docs':>8} {'mode':>6} {'insert ms':>10} {'update ms':>10} {'delete ms':>10}")
+    for size in SIZES:
+        modes = [('loop', one_at_a_time), ('bulk', bulk)] if size <= LOOP_MAX else [('bulk', bulk)]
+        for mode, run in modes:
+            with tempfile.TemporaryDirectory() as tmp:
+                collection = MockDB(tmp).contacts
+                insert, update, delete = await run(collection, make_contacts(size))
+                assert await collection.count_documents() == 0
+            print(f"{size:>8} {mode:>6} {insert:>10.1f} {update:>10.1f} {delete:>10.1f}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
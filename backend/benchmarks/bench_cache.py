@@ -0,0 +1,69 @@
+"""Per-request read latency of MockCollection with and without the document cache.
+
+The uncached numbers are taken by bumping the file's mtime before every
+request, which forces the same full json.load the old code did each call.
+
+    python benchmarks/bench_cache.py
+"""
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from mock_db import MockDB
+
+SIZES = [100, 10_000, 100_000]
+REQUESTS = 50
+
+def make_docs(count):
+    return [{
+        "id": str(uuid.uuid4()),
+        "title": f"Service {i}",
+        "description": "Lorem ipsum dolor sit amet " * 4,
+        "price": "₹9,999",
+        "features": ["Responsive", "SEO", "Hosting"],
+        "active": i % 2 == 0,
+        "created_at": "2024-01-01T00:00:00",
+    } for i in range(count)]
+
+async def handle_request(collection, doc_id):
+    # Roughly what a public page plus a detail lookup costs
+    await collection.find({"active": True}).to_list()
+    await collection.find_one({"id": doc_id})
+
+async def measure(collection, doc_id, cached):
+    timings = []
+    for _ in range(REQUESTS):
+        if not cached:
+            now = time.time_ns()
+            os.utime(collection.file_path, ns=(now, now))
+        start = time.perf_counter()
+        await handle_request(collection, doc_id)
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return timings[len(timings) // 2] * 1000
+
+async def main():
+    print(f"{'docs':>8} {'uncached ms':>12} {'cached ms':>10} {'speedup':>8}")
+    for size in SIZES:
+        with tempfile.TemporaryDirectory() as tmp:
+            docs = make_docs(size)
+            with open(Path(tmp) / 'services.json', 'w', encoding='utf-8') as f:
+                json.dump(docs, f, indent=2, ensure_ascii=False)
+            # Stat on every read so bumping the mtime is noticed right away
+            collection = MockDB(tmp, stat_interval=0).services
+            doc_id = docs[-1]["id"]
+
+            uncached = await measure(collection, doc_id, cached=False)
+            await handle_request(collection, doc_id)  # warm the cache
+            cached = await measure(collection, doc_id, cached=True)
+            print(f"{size:>8} {uncached:>12.3f} {cached:>10.3f} {uncached / cached:>7.1f}x")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,97 @@
+"""p99 latency of the GET /api/services read while POST /api/contact writes run.
+
+Both handlers are reduced to the storage calls they make. Every log append
+sleeps for --write-ms to stand in for a slow disk. The "inline" run executes
+file I/O on the event loop thread, the way MockDB did before it had a thread
+pool. The "pool" run uses the MockDB executor.
+
+    python benchmarks/bench_concurrency.py --write-ms 5
+"""
+import argparse
+import asyncio
+import json
+import sys
+import tempfile
+import time
+from concurrent.futures import Executor, Future
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from mock_db import MockCollection, MockDB
+
+class InlineExecutor(Executor):
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        future.set_result(fn(*args, **kwargs))
+        return future
+
+def slow_disk(delay):
+    append_log = MockCollection._append_log
+
+    def _append_log(self, data, expected_size):
+        time.sleep(delay)
+        return append_log(self, data, expected_size)
+
+    MockCollection._append_log = _append_log
+
+async def reader(db, stop, timings):
+    while not stop.is_set():
+        # A request "arrives" 1ms from now; time spent waiting for a stalled
+        # event loop to get to it counts towards its latency
+        arrival = time.perf_counter() + 0.001
+        await asyncio.sleep(0.001)
+        await db.services.find({"active": True}).to_list()
+        timings.append(time.perf_counter() - arrival)
+
+async def writer(db, stop, counter):
+    while not stop.is_set():
+        await db.contacts.insert_one({
+            "id": f"contact-{counter[0]}",
+            "name": "Load Test",
+            "email": "load@test.dev",
+            "message": "Hello there",
+            "read": False,
+        })
+        counter[0] += 1
+
+async def run(executor, args):
+    with tempfile.TemporaryDirectory() as tmp:
+        services = [{"id": f"service-{i}", "title": f"Service {i}", "active": True} for i in range(50)]
+        with open(Path(tmp) / 'services.json', 'w', encoding='utf-8') as f:
+            json.dump(services, f)
+        db = MockDB(tmp)
+        if executor is not None:
+            for collection in (db.services, db.contacts):
+                collection._executor = executor
+        await db.services.find().to_list()
+
+        stop = asyncio.Event()
+        timings, counter = [], [0]
+        tasks = [asyncio.create_task(reader(db, stop, timings)) for _ in range(args.readers)]
+        tasks += [asyncio.create_task(writer(db, stop, counter)) for _ in range(args.writers)]
+        await asyncio.sleep(args.seconds)
+        stop.set()
+        await asyncio.gather(*tasks)
+
+    timings.sort()
+    p50 = timings[len(timings) // 2] * 1000
+    p99 = timings[int(len(timings) * 0.99)] * 1000
+    return p50, p99, counter[0] / args.seconds
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--readers', type=int, default=20)
+    parser.add_argument('--writers', type=int, default=5)
+    parser.add_argument('--seconds', type=float, default=3)
+    parser.add_argument('--write-ms', type=float, default=5)
+    args = parser.parse_args()
+    slow_disk(args.write_ms / 1000)
+
+    print(f"{'mode':>7} {'read p50 ms':>12} {'read p99 ms':>12} {'writes/s':>9}")
+    for mode, executor in (('inline', InlineExecutor()), ('pool', None)):
+        p50, p99, writes = await run(executor, args)
+        print(f"{mode:>7} {p50:>12.3f} {p99:>12.3f} {writes:>9.0f}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,63 @@
+"""Latency of a tag and category filtered project page: scanning the
+documents vs intersecting FacetIndex posting sets, plus the facet counts.
+
+    python benchmarks/bench_facets.py
+"""
+import asyncio
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from corpus import load
+from facets import FacetIndex
+from mock_db import MockDB
+
+SIZES = [1_000, 10_000, 100_000]
+QUERIES = 20
+LIMIT = 100
+SELECTION = {"tags": ["react"], "category": "Design"}
+
+async def measure(read):
+    start = time.perf_counter()
+    for _ in range(QUERIES):
+        result = await read()
+    return (time.perf_counter() - start) / QUERIES * 1000, result
+
+async def scan(db):
+    # What filtering without the index takes: every project, filtered and sorted
+    projects = await db.projects.find().to_list()
+    matches = sorted((doc for doc in projects
+                      if "react" in doc["tags"] and doc["category"] == "Design"),
+                     key=lambda doc: (doc["created_at"], doc["id"]))
+    return [doc["id"] for doc in matches[:LIMIT]], len(matches)
+
+async def select(db, index):
+    keys, total = await index.select("projects", SELECTION, LIMIT)
+    docs = await db.projects.find({"id": {"$in": [doc_id for _, doc_id in keys]}}).to_list()
+    by_id = {doc["id"]: doc for doc in docs}
+    return [by_id[doc_id]["id"] for _, doc_id in keys], total
+
+async def main():
+    print(f"{'docs':>7} {'build s':>8} {'scan ms':>8} {'index ms':>9} {'counts ms':>10} {'matches':>8}")
+    for size in SIZES:
+        with tempfile.TemporaryDirectory() as tmp:
+            db = MockDB(tmp)
+            await load(db, size)
+            # Fold the load into the snapshots, so no compaction runs mid-measurement
+            await db.blogs.compact()
+            await db.projects.compact()
+            index = FacetIndex(db)
+            start = time.perf_counter()
+            await index.refresh()
+            build = time.perf_counter() - start
+            scan_ms, expected = await measure(lambda: scan(db))
+            index_ms, result = await measure(lambda: select(db, index))
+            assert result == expected
+            counts_ms, _ = await measure(index.counts)
+            print(f"{size:>7} {build:>8.2f} {scan_ms:>8.2f} {index_ms:>9.2f} {counts_ms:>10.3f} {result[1]:>8}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
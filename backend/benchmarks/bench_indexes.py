@@ -0,0 +1,45 @@
+"""find_one({"id": x}) latency with and without the secondary index on "id".
+
+    python benchmarks/bench_indexes.py
+"""
+import asyncio
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from mock_db import MockCollection
+
+SIZES = [1_000, 100_000, 1_000_000]
+LOOKUPS = 200
+
+async def measure(collection, ids):
+    start = time.perf_counter()
+    for doc_id in ids:
+        await collection.find_one({"id": doc_id})
+    return (time.perf_counter() - start) / len(ids) * 1_000_000
+
+async def main():
+    print(f"{'docs':>9} {'scan us':>10} {'indexed us':>11}")
+    for size in SIZES:
+        with tempfile.TemporaryDirectory() as tmp:
+            file_path = Path(tmp) / 'contacts.json'
+            with open(file_path, 'w', encoding='utf-8') as f:
+                json.dump([{"id": f"contact-{i}", "read": i % 3 == 0} for i in range(size)], f)
+            # Look up ids spread across the whole collection
+            ids = [f"contact-{i * size // LOOKUPS}" for i in range(LOOKUPS)]
+
+            scanned = MockCollection(file_path)
+            scan_us = await measure(scanned, ids[:20])
+
+            indexed = MockCollection(file_path)
+            indexed.create_index('id')
+            await indexed.count_documents()  # load and build the index
+            indexed_us = await measure(indexed, ids)
+            print(f"{size:>9} {scan_us:>10.1f} {indexed_us:>11.2f}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
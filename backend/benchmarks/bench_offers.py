@@ -0,0 +1,61 @@
+"""Latency of the active offers read: a windowed find() vs the EffectiveView.
+
+    python benchmarks/bench_offers.py
+"""
+import asyncio
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from mock_db import MockDB
+from sqlite_db import SqliteDB
+
+SIZES = [100, 1_000, 10_000]
+# One offer in this many is still running; the rest have ended
+RUNNING_EVERY = 50
+QUERIES = 50
+NOW = "2025-06-01T00:00:00"
+
+def make_offers(count):
+    return [{
+        "id": f"offer-{i}",
+        "title": "Load Test",
+        "active": True,
+        "priority": i % 5,
+        "starts_at": "2025-01-01T00:00:00",
+        "ends_at": "2099-01-01T00:00:00" if i % RUNNING_EVERY == 0 else "2025-02-01T00:00:00",
+    } for i in range(count)]
+
+def window_filter(now):
+    unbounded = lambda field: [{field: {"$exists": False}}, {field: {"$in": [None, ""]}}]
+    return {
+        "active": True,
+        "$and": [
+            {"$or": unbounded("starts_at") + [{"starts_at": {"$lte": now}}]},
+            {"$or": unbounded("ends_at") + [{"ends_at": {"$gte": now}}]},
+        ],
+    }
+
+async def measure(read):
+    result = await read()
+    start = time.perf_counter()
+    for _ in range(QUERIES):
+        result = await read()
+    return (time.perf_counter() - start) / QUERIES * 1000, result
+
+async def main():
+    print(f"{'offers':>7} {'backend':>8} {'find ms':>8} {'view ms':>8}")
+    for size in SIZES:
+        with tempfile.TemporaryDirectory() as tmp:
+            for name, db in [('json', MockDB(tmp)), ('sqlite', SqliteDB(Path(tmp) / 'bench.sqlite3'))]:
+                await db.offers.insert_many(make_offers(size))
+                find_ms, expected = await measure(lambda: db.offers.find(window_filter(NOW)).to_list())
+                view_ms, result = await measure(lambda: db.active_offers.current(NOW))
+                assert sorted(doc["id"] for doc in result) == sorted(doc["id"] for doc in expected)
+                print(f"{size:>7} {name:>8} {find_ms:>8.3f} {view_ms:>8.3f}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,53 @@
+"""Latency of fetching one page of contacts, newest first, at increasing depth.
+
+"skip" jumps to the page with skip(), which still has to walk past every
+earlier document. "keyset" starts after the last document of the previous
+page with after(), the way the list routes' cursors do, and walks the
+ordered created_at index from there.
+
+    python benchmarks/bench_pagination.py
+"""
+import asyncio
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from corpus import make_contacts
+from mock_db import MockDB
+from sqlite_db import SqliteDB
+
+DOCS = 100_000
+PAGE = 50
+DEPTHS = [0, 1_000, 10_000, 90_000]
+QUERIES = 20
+SORT = [("created_at", -1), ("id", -1)]
+
+async def measure(make_query):
+    start = time.perf_counter()
+    for _ in range(QUERIES):
+        page = await make_query().to_list()
+    return (time.perf_counter() - start) / QUERIES * 1000, page
+
+async def main():
+    print(f"{'backend':>8} {'depth':>7} {'skip ms':>8} {'keyset ms':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        backends = [('json', MockDB(tmp).contacts), ('sqlite', SqliteDB(Path(tmp) / 'bench.sqlite3').contacts)]
+        for name, collection in backends:
+            await collection.insert_many(make_contacts(DOCS, span=DOCS // 10))
+            ordered = await collection.find().sort(SORT).to_list()
+            for depth in DEPTHS:
+                skip_ms, expected = await measure(lambda: collection.find().sort(SORT).skip(depth).limit(PAGE))
+                if depth:
+                    last = ordered[depth - 1]
+                    after = [last[field] for field, _ in SORT]
+                    keyset_ms, page = await measure(lambda: collection.find().sort(SORT).after(after).limit(PAGE))
+                else:
+                    keyset_ms, page = skip_ms, expected
+                assert page == expected == ordered[depth:depth + PAGE]
+                print(f"{name:>8} {depth:>7} {skip_ms:>8.2f} {keyset_ms:>10.2f}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,61 @@
+"""Blog index read with and without content, on both storage backends.
+
+"full" reads every published post whole, the way GET /api/blogs did;
+"summary" passes the {"content": 0} projection it uses now. Times cover
+the read plus json.dumps() of the result, which stands in for the
+response body; KB is the size of that body.
+
+    python benchmarks/bench_projection.py
+"""
+import asyncio
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from mock_db import MockDB
+from sqlite_db import SqliteDB
+
+POSTS = 200
+CONTENT_SIZES = [1_000, 10_000, 100_000]
+READS = 20
+
+def make_posts(content_size):
+    return [{
+        "id": f"blog-{i}",
+        "title": f"Post {i}",
+        "excerpt": "A short summary of the post " * 3,
+        "content": "<p>" + "Lorem ipsum dolor sit amet. " * (content_size // 28) + "</p>",
+        "image": "https://example.com/cover.jpg",
+        "category": "Web Development",
+        "tags": ["react", "fastapi"],
+        "author": "MMB",
+        "publish_date": "2024-01-01T00:00:00",
+        "published": True,
+        "read_time": "5 min read",
+        "created_at": f"2024-01-01T00:00:{i:08d}",
+    } for i in range(POSTS)]
+
+async def measure(collection, projection):
+    start = time.perf_counter()
+    for _ in range(READS):
+        body = json.dumps(await collection.find({"published": True}, projection).to_list())
+    return (time.perf_counter() - start) / READS * 1000, len(body) / 1024
+
+async def main():
+    print(f"{'content':>8} {'backend':>8} {'full ms':>8} {'full KB':>8} {'summary ms':>11} {'summary KB':>11}")
+    for size in CONTENT_SIZES:
+        posts = make_posts(size)
+        with tempfile.TemporaryDirectory() as tmp:
+            backends = [('json', MockDB(tmp).blogs), ('sqlite', SqliteDB(Path(tmp) / 'bench.sqlite3').blogs)]
+            for name, collection in backends:
+                await collection.insert_many(posts)
+                full_ms, full_kb = await measure(collection, None)
+                summary_ms, summary_kb = await measure(collection, {"content": 0})
+                print(f"{size:>8} {name:>8} {full_ms:>8.2f} {full_kb:>8.0f} {summary_ms:>11.2f} {summary_kb:>11.1f}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,51 @@
+"""Latency of a date-bounded unread-contacts query, filtered in the route vs in storage.
+
+"route" loads every unread contact and checks the date window in Python,
+the way get_active_offers did. "storage" passes the window as a $gte/$lt
+filter, which the compiled query answers from the ordered created_at index.
+
+    python benchmarks/bench_query.py
+"""
+import asyncio
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from corpus import make_contacts
+from mock_db import MockDB
+
+SIZES = [1_000, 10_000, 100_000]
+QUERIES = 50
+# The contacts span 2024; the window is roughly one week of it
+YEAR = 366 * 24 * 60 * 60
+START, END = "2024-03-01", "2024-03-08"
+
+async def in_route(collection):
+    contacts = await collection.find({"read": False}).to_list()
+    return [c for c in contacts if START <= c["created_at"] < END]
+
+async def in_storage(collection):
+    return await collection.find({"read": False, "created_at": {"$gte": START, "$lt": END}}).to_list()
+
+async def measure(query, collection):
+    start = time.perf_counter()
+    for _ in range(QUERIES):
+        result = await query(collection)
+    return (time.perf_counter() - start) / QUERIES * 1000, result
+
+async def main():
+    print(f"{'docs':>8} {'route ms':>9} {'storage ms':>11} {'matches':>8}")
+    for size in SIZES:
+        with tempfile.TemporaryDirectory() as tmp:
+            collection = MockDB(tmp).contacts
+            await collection.insert_many(make_contacts(size, span=YEAR, read_every=3))
+            route_ms, expected = await measure(in_route, collection)
+            storage_ms, result = await measure(in_storage, collection)
+            assert result == expected
+            print(f"{size:>8} {route_ms:>9.2f} {storage_ms:>11.3f} {len(result):>8}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
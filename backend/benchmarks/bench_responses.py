@@ -0,0 +1,81 @@
+"""Requests per second of the public list routes over 1k projects, rendered
+per request vs replayed from the middleware's encoded response cache.
+
+Requests go straight to the ASGI app, so the numbers leave out the HTTP
+server and the network.
+
+    python benchmarks/bench_responses.py
+"""
+import asyncio
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fastapi import FastAPI
+
+import public_routes
+from conditional import ConditionalGetMiddleware
+from corpus import load
+from facets import FacetIndex
+from mock_db import MockDB
+from public_routes import public_router
+from search import SearchIndex
+
+DOCUMENTS = 2_000  # Half of them projects
+DURATION = 2.0
+URLS = ["/api/projects?limit=1000", "/api/projects", "/api/blogs", "/api/projects?tag=react"]
+
+def make_app(db, cache_bytes):
+    app = FastAPI()
+    app.include_router(public_router)
+    app.add_middleware(ConditionalGetMiddleware, db=db, cache_bytes=cache_bytes)
+    return app
+
+async def request(app, url):
+    path, _, query = url.partition('?')
+    scope = {'type': 'http', 'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+             'path': path, 'raw_path': path.encode(), 'root_path': '', 'query_string': query.encode(),
+             'headers': [(b'host', b'localhost')], 'server': ('localhost', 80), 'client': ('127.0.0.1', 1)}
+    status, size = None, 0
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        nonlocal status, size
+        if message['type'] == 'http.response.start':
+            status = message['status']
+        else:
+            size += len(message.get('body', b''))
+
+    await app(scope, receive, send)
+    assert status == 200, status
+    return size
+
+async def rate(app, url):
+    await request(app, url)
+    count, start = 0, time.perf_counter()
+    while time.perf_counter() - start < DURATION:
+        await request(app, url)
+        count += 1
+    return count / (time.perf_counter() - start)
+
+async def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        db = MockDB(tmp)
+        await load(db, DOCUMENTS)
+        public_routes.db = db
+        public_routes.search_index = SearchIndex(db)
+        public_routes.facet_index = FacetIndex(db)
+        rendered, cached = make_app(db, 0), make_app(db, 32 * 1024 * 1024)
+        print(f"{'url':<28} {'KB':>6} {'rendered req/s':>15} {'cached req/s':>13}")
+        for url in URLS:
+            size = await request(rendered, url)
+            before, after = await rate(rendered, url), await rate(cached, url)
+            print(f"{url:<28} {size / 1024:>6.0f} {before:>15.0f} {after:>13.0f}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
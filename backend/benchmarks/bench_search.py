@@ -0,0 +1,61 @@
+"""Search latency over the synthetic corpus: full index build, a query for
+a common word, a rare word and a prefix, and the index refresh after one edit.
+
+    python benchmarks/bench_search.py
+"""
+import asyncio
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from corpus import Corpus, load
+from mock_db import MockDB
+from search import SearchIndex
+
+SIZES = [1_000, 10_000, 100_000]
+QUERIES = 20
+LIMIT = 20
+
+async def measure(search):
+    start = time.perf_counter()
+    for _ in range(QUERIES):
+        hits, total = await search()
+    return (time.perf_counter() - start) / QUERIES * 1000, total
+
+async def main():
+    corpus = Corpus()
+    common, rare = corpus.vocabulary[0], corpus.vocabulary[5_000]
+    queries = [("common", f"{common} "), ("rare", f"{rare} "), ("prefix", rare[:4]),
+               ("two words", f"{common} {rare} ")]
+    print(f"{'docs':>7} {'build s':>8} " + ' '.join(f"{name + ' ms':>13}" for name, _ in queries)
+          + f" {'edit ms':>8}")
+    for size in SIZES:
+        with tempfile.TemporaryDirectory() as tmp:
+            db = MockDB(tmp)
+            await load(db, size)
+            # Fold the load into the snapshots, so no compaction runs mid-measurement
+            await db.blogs.compact()
+            await db.projects.compact()
+            index = SearchIndex(db)
+            start = time.perf_counter()
+            await index.refresh()
+            build = time.perf_counter() - start
+
+            timings = []
+            for _, query in queries:
+                ms, total = await measure(lambda: index.search(query, LIMIT))
+                timings.append(f"{ms:>7.2f} ({total:>4})"[-13:])
+
+            await db.projects.update_one({"id": "project-000000"}, {"$set": {"title": "Edited Title"}})
+            start = time.perf_counter()
+            await index.refresh()
+            edit = (time.perf_counter() - start) * 1000
+            hits, _ = await index.search("edited title", LIMIT)
+            assert hits and hits[0][2] == "project-000000"
+            print(f"{size:>7} {build:>8.2f} " + ' '.join(f"{timing:>13}" for timing in timings) + f" {edit:>8.2f}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
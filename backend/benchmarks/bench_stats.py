@@ -0,0 +1,49 @@
+"""Latency of the dashboard counts: seven count_documents calls vs one counters() read.
+
+    python benchmarks/bench_stats.py
+"""
+import asyncio
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from corpus import make_contacts
+from mock_db import MockDB
+from sqlite_db import SqliteDB
+
+SIZES = [1_000, 10_000, 100_000]
+QUERIES = 20
+
+async def count_each(db):
+    return {
+        "projects": {"total": await db.projects.count_documents({})},
+        "services": {"active": await db.services.count_documents({"active": True})},
+        "testimonials": {"approved": await db.testimonials.count_documents({"approved": True})},
+        "contacts": {"total": await db.contacts.count_documents({}),
+                     "unread": await db.contacts.count_documents({"read": False})},
+        "blogs": {"total": await db.blogs.count_documents({}),
+                  "published": await db.blogs.count_documents({"published": True})},
+    }
+
+async def measure(read, db):
+    start = time.perf_counter()
+    for _ in range(QUERIES):
+        result = await read(db)
+    return (time.perf_counter() - start) / QUERIES * 1000, result
+
+async def main():
+    print(f"{'contacts':>9} {'backend':>8} {'count ms':>9} {'counters ms':>12}")
+    for size in SIZES:
+        with tempfile.TemporaryDirectory() as tmp:
+            for name, db in [('json', MockDB(tmp)), ('sqlite', SqliteDB(Path(tmp) / 'bench.sqlite3'))]:
+                await db.contacts.insert_many(make_contacts(size, read_every=3))
+                count_ms, expected = await measure(count_each, db)
+                counters_ms, result = await measure(lambda db: db.counters(), db)
+                assert result == expected
+                print(f"{size:>9} {name:>8} {count_ms:>9.3f} {counters_ms:>12.3f}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
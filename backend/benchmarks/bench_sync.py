@@ -0,0 +1,57 @@
+"""Bytes and latency of bringing a client's copy of the projects up to date.
+
+"full" refetches every project, as the list pages did on each visit.
+"delta" asks changes_since() for what changed after the client's version,
+the way /api/changes does for a returning visitor.
+
+    python benchmarks/bench_sync.py
+"""
+import asyncio
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from mock_db import MockDB
+from sqlite_db import SqliteDB
+
+DOCS = 1_000
+CHANGES = [0, 1, 10, 100]
+QUERIES = 20
+
+def make_projects(count):
+    return [{
+        "id": f"project-{i:05d}",
+        "title": f"Project {i}",
+        "description": "A responsive site with a custom CMS. " * 8,
+        "technologies": ["React", "FastAPI", "Tailwind"],
+        "category": "Web",
+        "created_at": f"2024-01-01T00:00:{i:08d}",
+    } for i in range(count)]
+
+async def measure(read):
+    start = time.perf_counter()
+    for _ in range(QUERIES):
+        result = await read()
+    return (time.perf_counter() - start) / QUERIES * 1000, len(json.dumps(result))
+
+async def main():
+    print(f"{'backend':>8} {'changes':>8} {'full ms':>8} {'full KB':>8} {'delta ms':>9} {'delta B':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        backends = [('json', MockDB(tmp).projects), ('sqlite', SqliteDB(Path(tmp) / 'bench.sqlite3').projects)]
+        for name, collection in backends:
+            await collection.insert_many(make_projects(DOCS))
+            for changes in CHANGES:
+                version = await collection.get_version()
+                for i in range(changes):
+                    await collection.update_one({"id": f"project-{i * 7:05d}"}, {"$set": {"title": f"Edited {i}"}})
+                full_ms, full_bytes = await measure(lambda: collection.find().to_list())
+                delta_ms, delta_bytes = await measure(lambda: collection.changes_since(version))
+                print(f"{name:>8} {changes:>8} {full_ms:>8.2f} {full_bytes / 1024:>8.0f} "
+                      f"{delta_ms:>9.3f} {delta_bytes:>8}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,48 @@
+"""Latency of toggling an offer: find, update, find again vs one find_one_and_update.
+
+    python benchmarks/bench_update.py
+"""
+import asyncio
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from mock_db import MockDB, ReturnDocument
+from sqlite_db import SqliteDB
+
+OFFERS = 1_000
+TOGGLES = 200
+
+async def round_trips(collection, offer_id):
+    offer = await collection.find_one({"id": offer_id})
+    await collection.update_one({"id": offer_id}, {"$set": {"active": not offer.get("active", False)}})
+    return await collection.find_one({"id": offer_id})
+
+async def one_call(collection, offer_id):
+    return await collection.find_one_and_update(
+        {"id": offer_id}, {"$bit": {"active": {"xor": True}}}, return_document=ReturnDocument.AFTER)
+
+async def measure(toggle, collection):
+    start = time.perf_counter()
+    for i in range(TOGGLES):
+        await toggle(collection, f"offer-{i % OFFERS}")
+    return (time.perf_counter() - start) / TOGGLES * 1000
+
+async def main():
+    print(f"{'backend':>8} {'3 calls ms':>11} {'1 call ms':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        backends = [('json', MockDB(tmp).offers), ('sqlite', SqliteDB(Path(tmp) / 'bench.sqlite3').offers)]
+        for name, collection in backends:
+            await collection.insert_many([{"id": f"offer-{i}", "title": f"Offer {i}", "active": True}
+                                          for i in range(OFFERS)])
+            before = await measure(round_trips, collection)
+            after = await measure(one_call, collection)
+            # Each pass toggled every offer it touched once
+            assert await collection.count_documents({"active": True}) == OFFERS
+            print(f"{name:>8} {before:>11.3f} {after:>10.3f}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,121 @@
+"""Synthetic blogs, projects and contacts for the benchmarks.
+
+Words are drawn from a made-up vocabulary with Zipf-distributed
+frequencies, as in real text: a few words appear in most documents and
+most words in only a handful. Tags, categories and technologies come
+from short lists of real ones. The same seed always gives the same corpus.
+
+    python benchmarks/corpus.py 100000 --data-dir /tmp/corpus
+
+writes that many documents, half blogs and half projects, into a JSON
+storage directory that the server can be pointed at.
+"""
+import argparse
+import asyncio
+import random
+import sys
+from datetime import datetime, timedelta
+from itertools import accumulate
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+VOCABULARY_SIZE = 50_000
+ZIPF_EXPONENT = 1.1
+CATEGORIES = ["Web Development", "Mobile", "Design", "SEO", "E-commerce", "Marketing", "Cloud", "AI"]
+TAGS = ["react", "python", "fastapi", "seo", "ux", "performance", "tailwind", "nextjs", "django",
+        "startup", "branding", "analytics", "security", "testing", "devops", "accessibility"]
+TECHNOLOGIES = ["React", "FastAPI", "Tailwind", "PostgreSQL", "MongoDB", "Node.js", "Docker",
+                "Redis", "TypeScript", "Flutter", "Django", "Next.js"]
+# Document i was created i seconds after this
+EPOCH = datetime(2024, 1, 1)
+SYLLABLES = ["ka", "ro", "mi", "ten", "sa", "lo", "vex", "dar", "in", "po", "qui", "ber", "na",
+             "tor", "el", "fa", "gu", "shi", "mon", "ze"]
+
+def timestamp(i):
+    return (EPOCH + timedelta(seconds=i)).isoformat()
+
+def make_contacts(count, span=None, read_every=None):
+    """Return count contacts created evenly over span seconds from EPOCH,
+    one a second by default. A span shorter than count gives runs of
+    contacts created in the same second. Every read_every-th one is read;
+    by default none are."""
+    span = count if span is None else span
+    return [{
+        "id": f"contact-{i:06d}",
+        "name": "Load Test",
+        "email": "load@test.dev",
+        "message": "Hello there " * 10,
+        "read": bool(read_every) and i % read_every == 0,
+        "created_at": timestamp(i * span // count),
+    } for i in range(count)]
+
+def make_vocabulary(rng, size=VOCABULARY_SIZE):
+    words = set()
+    while len(words) < size:
+        words.add(''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))))
+    return sorted(words)
+
+class Corpus:
+    def __init__(self, seed=0):
+        self.rng = random.Random(seed)
+        self.vocabulary = make_vocabulary(self.rng)
+        weights = [1 / rank ** ZIPF_EXPONENT for rank in range(1, len(self.vocabulary) + 1)]
+        self._cum_weights = list(accumulate(weights))
+
+    def words(self, count):
+        return ' '.join(self.rng.choices(self.vocabulary, cum_weights=self._cum_weights, k=count))
+
+    def blog(self, i):
+        return {
+            "id": f"blog-{i:06d}",
+            "title": self.words(6).title(),
+            "excerpt": self.words(25),
+            "content": self.words(self.rng.randint(80, 200)),
+            "image": "/uploads/blog.jpg",
+            "category": self.rng.choice(CATEGORIES),
+            "tags": self.rng.sample(TAGS, 3),
+            "author": "MMB",
+            "publish_date": timestamp(i),
+            "published": self.rng.random() < 0.9,
+            "read_time": "5 min read",
+            "created_at": timestamp(i),
+        }
+
+    def project(self, i):
+        return {
+            "id": f"project-{i:06d}",
+            "title": self.words(4).title(),
+            "description": self.words(self.rng.randint(30, 80)),
+            "image": "/uploads/project.jpg",
+            "category": self.rng.choice(CATEGORIES),
+            "tags": self.rng.sample(TAGS, 3),
+            "technologies": self.rng.sample(TECHNOLOGIES, 3),
+            "live_url": "https://example.com",
+            "github_url": None,
+            "featured": False,
+            "created_at": timestamp(i),
+        }
+
+    def documents(self, count):
+        """Return (blogs, projects), count documents in all."""
+        blogs = [self.blog(i) for i in range(count // 2)]
+        projects = [self.project(i) for i in range(count - count // 2)]
+        return blogs, projects
+
+async def load(db, count, seed=0):
+    blogs, projects = Corpus(seed).documents(count)
+    await db.blogs.insert_many(blogs)
+    await db.projects.insert_many(projects)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('count', type=int)
+    parser.add_argument('--data-dir', required=True, help="JSON storage directory to write")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    from mock_db import MockDB
+    asyncio.run(load(MockDB(args.data_dir), args.count, args.seed))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+"""Kill writer processes mid-commit and check that nothing acknowledged is lost.
+
+Each round starts several worker processes on one data directory. Their
+tasks insert, update and delete contacts, writing every operation to a
+journal before it starts and again once it is acknowledged. One worker
+is armed to SIGKILL itself at a random fsync() or rename(), before or
+after it: mid-group-commit, mid-snapshot or mid-compaction. The rest are
+killed at a random moment. Compaction is made to run often, so snapshot
+writes get killed too. Some rounds then append a torn line to the log,
+either cut short or with a bad CRC, as a power cut can leave.
+
+Checks after every round:
+- The snapshot parses and no valid log record follows a corrupt one.
+- A fresh MockDB sees every acknowledged write, and nothing besides the
+  one unacknowledged write each task may have had in flight.
+- Every counter agrees with a full recount.
+
+Rounds share the data directory, so each one starts by recovering from
+the last. Exits non-zero if any check fails.
+
+    python benchmarks/crash_recovery.py --rounds 20 --workers 3
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import signal
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import mock_db
+from mock_db import MockDB, decode_record, encode_record
+
+# Compact once the log passes this many bytes, so snapshots are written often
+COMPACT_MIN_BYTES = 8 * 1024
+
+# The armed worker dies at a random one of its first this many fsync()/rename() calls
+KILL_POINTS = 200
+
+# Longest a round runs before the remaining workers are killed, in seconds,
+# counted from when every worker has started writing
+ROUND_SECONDS = 1.0
+STARTUP_SECONDS = 10.0
+
+def arm(kill_at):
+    """Make this process SIGKILL itself at the kill_at-th point before or
+    after an fsync() or rename()."""
+    calls = 0
+
+    def checkpoint():
+        nonlocal calls
+        calls += 1
+        if calls == kill_at:
+            os.kill(os.getpid(), signal.SIGKILL)
+
+    def wrap(func):
+        def wrapped(*args, **kwargs):
+            checkpoint()
+            result = func(*args, **kwargs)
+            checkpoint()
+            return result
+        return wrapped
+
+    os.fsync = wrap(os.fsync)
+    os.replace = wrap(os.replace)
+
+class Journal:
+    def __init__(self, path):
+        # One write() per line on an O_APPEND file survives the process being killed
+        self.fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+
+    def log(self, **entry):
+        os.write(self.fd, (json.dumps(entry) + '\n').encode())
+
+async def run_operation(db, journal, doc_id, op):
+    journal.log(begin=doc_id, op=op)
+    if op == 'insert':
+        await db.contacts.insert_one({"id": doc_id, "name": "Crash Test", "email": "crash@test.dev",
+                                      "message": "Hello there " * 10, "read": False, "n": 0})
+    elif op == 'inc':
+        await db.contacts.update_one({"id": doc_id}, {"$inc": {"n": 1}})
+    elif op == 'read':
+        await db.contacts.update_one({"id": doc_id}, {"$set": {"read": True}})
+    elif op == 'delete':
+        await db.contacts.delete_one({"id": doc_id})
+    journal.log(ack=doc_id)
+
+async def write_forever(db, journal, prefix, rng):
+    for i in range(10**9):
+        doc_id = f"{prefix}-{i}"
+        await run_operation(db, journal, doc_id, 'insert')
+        for _ in range(rng.randrange(4)):
+            await run_operation(db, journal, doc_id, rng.choice(('inc', 'read')))
+        if rng.random() < 0.3:
+            await run_operation(db, journal, doc_id, 'delete')
+
+async def run_worker(data_dir, journal_path, prefix, tasks, seed):
+    db = MockDB(data_dir)
+    journal = Journal(journal_path)
+    await asyncio.gather(*(write_forever(db, journal, f"{prefix}-{t}", random.Random(seed + t))
+                           for t in range(tasks)))
+
+def worker_main(data_dir, journal_path, prefix, tasks, seed, kill_at):
+    mock_db.COMPACT_MIN_BYTES = COMPACT_MIN_BYTES
+    if kill_at:
+        arm(kill_at)
+    asyncio.run(run_worker(data_dir, journal_path, prefix, tasks, seed))
+
+def apply_operation(state, op):
+    if op == 'insert':
+        return {"n": 0, "read": False}
+    if op == 'delete':
+        return None
+    if state is None:
+        return None  # Updates match nothing once the document is gone
+    if op == 'inc':
+        return {**state, "n": state["n"] + 1}
+    return {**state, "read": True}
+
+def read_journal(path, acked):
+    """Apply the acknowledged operations in path to acked, returning
+    {doc id: operation} for those still in flight."""
+    pending = {}
+    for line in path.read_bytes().splitlines():
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            continue  # Cut short by the kill
+        if 'begin' in entry:
+            pending[entry['begin']] = entry['op']
+        elif entry.get('ack') in pending:
+            doc_id = entry['ack']
+            acked[doc_id] = apply_operation(acked.get(doc_id), pending.pop(doc_id))
+    return pending
+
+def tear_log(log_path, rng):
+    """Append a record a power cut could leave: cut short, or with a bad CRC."""
+    line = encode_record({"op": "insert", "key": 10**9, "v": 10**9,
+                          "doc": {"id": "torn", "read": False, "n": 0}})
+    if rng.random() < 0.5:
+        tail = line[:rng.randrange(1, len(line) - 1)]
+    else:
+        tail = line[:-3] + (b'00\n' if line[-3:-1] != b'00' else b'11\n')
+    with open(log_path, 'ab') as f:
+        f.write(tail)
+    return 'short' if tail[-1:] != b'\n' else 'bad crc'
+
+def check_files(data_dir):
+    """Return problems with the contacts files as left on disk."""
+    problems = []
+    snapshot = data_dir / 'contacts.json'
+    if snapshot.exists():
+        try:
+            json.loads(snapshot.read_bytes() or b'[]')
+        except ValueError:
+            problems.append("contacts.json is torn")
+    log_path = data_dir / 'contacts.jsonl'
+    lines = log_path.read_bytes().split(b'\n') if log_path.exists() else []
+    corrupt = None
+    for number, line in enumerate(lines, 1):
+        valid = decode_record(line) is not None
+        if not valid and line and corrupt is None:
+            corrupt = number
+        elif valid and corrupt is not None:
+            problems.append(f"contacts.jsonl line {number} is valid but follows corrupt line {corrupt}")
+            break
+    return problems
+
+async def verify(data_dir, acked, pending):
+    """Compare a fresh MockDB's contacts with the journals. Returns a list of
+    problems and brings acked up to what was found."""
+    db = MockDB(data_dir)
+    docs = await db.contacts.find().to_list()
+    problems = []
+    found = {}
+    for doc in docs:
+        if doc["id"] in found:
+            problems.append(f"{doc['id']} is stored twice")
+        found[doc["id"]] = {"n": doc.get("n"), "read": doc.get("read")}
+    for doc_id in acked.keys() | found.keys():
+        state = found.get(doc_id)
+        allowed = [acked.get(doc_id)]
+        if doc_id in pending:
+            allowed.append(apply_operation(acked.get(doc_id), pending[doc_id]))
+        if state not in allowed:
+            problems.append(f"{doc_id}: found {state}, acknowledged {acked.get(doc_id)}")
+        acked[doc_id] = state
+    for counter, (maintained, recounted) in (await db.check_counters()).items():
+        problems.append(f"counter {counter}: maintained {maintained}, recounted {recounted}")
+    return problems, len(docs)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rounds', type=int, default=20)
+    parser.add_argument('--workers', type=int, default=3)
+    parser.add_argument('--tasks', type=int, default=8, help="concurrent writers per worker")
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+    seed = args.seed if args.seed is not None else random.randrange(10**6)
+    rng = random.Random(seed)
+    context = multiprocessing.get_context('spawn')
+    failures = 0
+    acked = {}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = Path(tmp) / 'data'
+        data_dir.mkdir()
+        for round_number in range(args.rounds):
+            kill_at = rng.randrange(1, KILL_POINTS)
+            journals = [Path(tmp) / f'journal-{round_number}-{w}.txt' for w in range(args.workers)]
+            processes = [
+                context.Process(target=worker_main, args=(
+                    str(data_dir), str(journals[w]), f"r{round_number}-w{w}", args.tasks,
+                    rng.randrange(10**6), kill_at if w == 0 else 0))
+                for w in range(args.workers)
+            ]
+            for process in processes:
+                process.start()
+            # Spawned workers take a moment to start: time the round from their first writes
+            deadline = time.monotonic() + STARTUP_SECONDS
+            while time.monotonic() < deadline and not all(
+                    journal.exists() and journal.stat().st_size for journal in journals):
+                time.sleep(0.01)
+            time.sleep(rng.uniform(0.1, ROUND_SECONDS))
+            # Workers write until killed, so one already gone hit its kill point
+            fired = "fired" if not processes[0].is_alive() else "-"
+            for process in processes:
+                if process.is_alive():
+                    os.kill(process.pid, signal.SIGKILL)
+                process.join()
+
+            pending = {}
+            for journal in journals:
+                if journal.exists():
+                    pending.update(read_journal(journal, acked))
+            torn = tear_log(data_dir / 'contacts.jsonl', rng) if rng.random() < 0.5 else "-"
+            problems = check_files(data_dir)
+            found_problems, found = asyncio.run(verify(data_dir, acked, pending))
+            problems += found_problems
+            failures += bool(problems)
+            print(f"round {round_number:>3}: kill point {kill_at:>3} {fired:<5}, torn tail {torn:<7}, "
+                  f"{len(pending):>2} in flight, {found:>5} contacts, {'FAILED' if problems else 'ok'}")
+            for problem in problems[:10]:
+                print(f"    {problem}")
+
+    if failures:
+        print(f"FAILED: {failures} of {args.rounds} rounds lost or corrupted data (seed {seed})")
+        sys.exit(1)
+    print(f"OK: every acknowledged write survived {args.rounds} rounds of kills (seed {seed})")
+
+if __name__ == "__main__":
+    main()
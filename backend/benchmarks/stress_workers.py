@@ -0,0 +1,88 @@
+"""Check that several worker processes sharing mock_data lose no contact submissions.
+
+Each process opens its own MockDB on the same directory, the way uvicorn
+--workers N does, and runs concurrent POST /api/contact inserts while
+reading the inbox. Enough data is written for compaction to run several
+times under load. Afterwards a fresh MockDB must see every submission
+exactly once. Exits non-zero if any went missing or were duplicated.
+
+    python benchmarks/stress_workers.py --workers 4 --contacts 500
+"""
+import argparse
+import asyncio
+import multiprocessing
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from mock_db import MockDB
+
+async def submit(db, worker, start, count):
+    for i in range(start, start + count):
+        await db.contacts.insert_one({
+            "id": f"contact-{worker}-{i}",
+            "name": "Load Test",
+            "email": "load@test.dev",
+            "message": "Hello there " * 10,
+            "read": False,
+        })
+
+async def browse(db, stop):
+    while not stop.is_set():
+        await db.contacts.find().sort("created_at", -1).limit(10).to_list()
+        await db.contacts.count_documents({"read": False})
+        await asyncio.sleep(0.001)
+
+async def run_worker(data_dir, worker, contacts, tasks):
+    db = MockDB(data_dir)
+    stop = asyncio.Event()
+    reader = asyncio.create_task(browse(db, stop))
+    per_task = contacts // tasks
+    await asyncio.gather(*(submit(db, worker, t * per_task, per_task) for t in range(tasks)))
+    stop.set()
+    await reader
+
+def worker_main(data_dir, worker, contacts, tasks):
+    asyncio.run(run_worker(data_dir, worker, contacts, tasks))
+
+async def verify(data_dir, expected):
+    docs = await MockDB(data_dir).contacts.find().to_list()
+    ids = [doc["id"] for doc in docs]
+    missing = expected - set(ids)
+    duplicated = len(ids) - len(set(ids))
+    return len(ids), missing, duplicated
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--contacts', type=int, default=500, help="submissions per worker")
+    parser.add_argument('--tasks', type=int, default=10, help="concurrent submitters per worker")
+    args = parser.parse_args()
+    contacts = args.contacts // args.tasks * args.tasks
+
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        processes = [multiprocessing.Process(target=worker_main, args=(tmp, w, contacts, args.tasks))
+                     for w in range(args.workers)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        elapsed = time.perf_counter() - start
+
+        expected = {f"contact-{w}-{i}" for w in range(args.workers) for i in range(contacts)}
+        found, missing, duplicated = asyncio.run(verify(tmp, expected))
+
+    print(f"{args.workers} workers wrote {len(expected)} contacts in {elapsed:.2f}s "
+          f"({len(expected) / elapsed:.0f}/s), found {found}")
+    failed = [p.exitcode for p in processes if p.exitcode != 0]
+    if failed or missing or duplicated:
+        print(f"FAILED: {len(missing)} missing, {duplicated} duplicated, worker exit codes {failed}")
+        sys.exit(1)
+    print("OK: no submissions lost")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""Change events published by collections, and the watch() stream over them.
+
+Every change to a collection moves its version, an integer that only ever
+grows. Callbacks registered with collection.subscribe() run synchronously
+as each change is applied, before any reader can see it, so a cache they
+invalidate is never served stale. They must be quick and must not raise.
+collection.watch() wraps a subscription in an async iterator for
+consumers that do slower work, such as server-sent event feeds.
+
+Event types:
+
+    insert  document is the new document
+    update  document is the updated document, previous the one it
+            replaced, and fields the top-level fields the update set
+    delete  previous is the deleted document
+    reload  the collection was reread as a whole, or a watcher fell too far
+            behind, so individual changes are unknown. Rebuild from scratch.
+"""
+import asyncio
+from collections import deque
+
+# Events a watch() stream buffers before dropping them for a single reload
+WATCH_QUEUE_SIZE = 1000
+
+# How often an idle watch() stream checks for other workers' changes, in seconds
+WATCH_POLL_INTERVAL = 0.1
+
+class ChangeEvent:
+    __slots__ = ('op', 'collection', 'version', 'document', 'previous', 'fields')
+
+    def __init__(self, op, collection, version, document=None, previous=None, fields=None):
+        self.op = op
+        self.collection = collection
+        self.version = version
+        self.document = document
+        self.previous = previous
+        self.fields = fields
+
+    @property
+    def document_id(self):
+        doc = self.document if self.document is not None else self.previous
+        return None if doc is None else doc.get('_id', doc.get('id'))
+
+    def __repr__(self):
+        return f'ChangeEvent({self.op!r}, {self.collection!r}, {self.version}, id={self.document_id!r})'
+
+class Subscribers:
+    """The callbacks subscribed to one collection's changes."""
+
+    def __init__(self, logger):
+        self._callbacks = []
+        self._logger = logger
+
+    def __bool__(self):
+        return bool(self._callbacks)
+
+    def add(self, callback):
+        """Call callback(event) on every change. Returns a function that unsubscribes."""
+        self._callbacks.append(callback)
+
+        def unsubscribe():
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+        return unsubscribe
+
+    def publish(self, event):
+        for callback in list(self._callbacks):
+            try:
+                callback(event)
+            except Exception:
+                # A broken subscriber must not fail the write that fed it
+                self._logger.exception("Change subscriber failed on %r", event)
+
+class ChangeStream:
+    """Async iterator over a collection's change events, from watch().
+
+    Events are buffered up to max_queue. A consumer that falls further
+    behind loses the backlog and gets one reload event in its place. While
+    idle, the stream checks for changes made by other worker processes
+    every WATCH_POLL_INTERVAL seconds.
+    """
+
+    def __init__(self, collection, max_queue=WATCH_QUEUE_SIZE):
+        self.collection = collection
+        self._queue = deque()
+        self._max_queue = max_queue
+        self._wakeup = asyncio.Event()
+        self._closed = False
+        self._unsubscribe = collection.subscribe(self._push)
+
+    def _push(self, event):
+        if len(self._queue) >= self._max_queue:
+            self._queue.clear()
+            event = ChangeEvent('reload', event.collection, event.version)
+        self._queue.append(event)
+        self._wakeup.set()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        while not self._queue:
+            if self._closed:
+                raise StopAsyncIteration
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), WATCH_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                # Reading the version pulls in other workers' changes, which
+                # reach this stream through its subscription
+                await self.collection.get_version()
+        return self._queue.popleft()
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self._unsubscribe()
+            self._wakeup.set()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.close()
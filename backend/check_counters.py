@@ -0,0 +1,45 @@
+"""Recount every maintained counter from scratch and compare.
+
+Uses the same storage backend as the server (STORAGE_BACKEND, SQLITE_PATH).
+Exits with status 1 if any counter disagrees with a full recount.
+
+    python check_counters.py [--data-dir mock_data]
+"""
+import argparse
+import asyncio
+import os
+import sys
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+async def check(db):
+    counters = await db.counters()
+    mismatches = await db.check_counters()
+    for collection, values in sorted(counters.items()):
+        for name, count in sorted(values.items()):
+            key = f'{collection}.{name}'
+            if key in mismatches:
+                maintained, recounted = mismatches[key]
+                print(f"❌ {key}: maintained {maintained}, recounted {recounted}")
+            else:
+                print(f"✅ {key}: {count}")
+    return not mismatches
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--data-dir', default=None, help="JSON storage directory")
+    args = parser.parse_args()
+    if os.getenv('STORAGE_BACKEND', 'json').lower() == 'sqlite':
+        from sqlite_db import SqliteDB
+        db = SqliteDB(os.getenv('SQLITE_PATH') or None)
+    else:
+        from mock_db import MockDB
+        db = MockDB(args.data_dir)
+    sys.exit(0 if asyncio.run(check(db)) else 1)
+
+if __name__ == "__main__":
+    main()
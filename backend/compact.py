@@ -0,0 +1,23 @@
+"""Fold every collection's write log into its JSON snapshot.
+
+Writes land in mock_data/*.jsonl first and reach the *.json files only
+when a log grows large enough or the server shuts down. Run this before
+copying, committing or backing up mock_data/ while the server is running
+(or after it was killed), so the JSON files hold every write.
+
+    python compact.py [--data-dir mock_data]
+"""
+import argparse
+import asyncio
+
+from mock_db import MockDB
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--data-dir', default=None, help="JSON storage directory")
+    args = parser.parse_args()
+    asyncio.run(MockDB(args.data_dir).compact())
+    print("✅ Write logs folded into the JSON files")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+"""Conditional GET for the public routes.
+
+A route decorated with @versioned(*collections) declares that its
+response depends only on the request and those collections' contents.
+ConditionalGetMiddleware reads the collection versions, with the epochs
+they count in, before the route runs and derives from them a strong ETag,
+which changes with every write to any of them. The epochs keep a fresh
+data directory or another backend, whose versions start over, from
+reusing the ETags of different contents. A request whose If-None-Match
+holds that ETag gets a 304 without the route running: no documents are
+read and no models built. Other responses carry the ETag and a
+Cache-Control allowing browsers and CDNs to serve a stale copy while
+revalidating.
+
+The middleware also keeps each URL's last 200 response, status, headers
+and encoded body, along with its ETag. While the ETag still holds, the
+next request for the URL is answered with those bytes, again without the
+route running. A write moves the ETag on, and the first request after it
+renders and stores the response afresh. Bodies of GZIP_MIN_BYTES or more
+are compressed once, when stored, and the gzip copy is sent to every
+client that accepts it, under its own ETag.
+
+No Last-Modified is sent: two writes within one second would share it,
+and a client revalidating with If-Modified-Since would get a 304 for the
+second. Browsers send If-None-Match whenever they hold an ETag.
+"""
+import gzip
+import hashlib
+from collections import OrderedDict
+
+from starlette.routing import Match
+
+# Revalidate on every use, but a copy up to this many seconds stale may be
+# shown while the revalidation runs
+STALE_WHILE_REVALIDATE = 60
+CACHE_CONTROL = f"public, max-age=0, stale-while-revalidate={STALE_WHILE_REVALIDATE}"
+
+# Bytes of response bodies kept per worker; least recently used go first
+RESPONSE_CACHE_BYTES = 32 * 1024 * 1024
+
+# Bodies at least this long are also kept gzipped, for clients accepting it
+GZIP_MIN_BYTES = 1024
+GZIP_LEVEL = 6
+
+def versioned(*collections, extra=None):
+    """Mark a route's response as determined by collections' versions.
+
+    extra, if given, is called with the database for anything else the
+    response depends on, and its result becomes part of the ETag.
+    """
+    def decorate(endpoint):
+        endpoint.versioned = (collections, extra)
+        return endpoint
+    return decorate
+
+def etag_matches(header, etag):
+    # If-None-Match compares weakly: W/"x" matches "x"
+    tags = {tag.strip() for tag in header.split(',')}
+    return '*' in tags or etag in tags or f'W/{etag}' in tags
+
+def accepts_gzip(header):
+    for coding in header.split(','):
+        name, _, params = coding.partition(';')
+        if name.strip().lower() == 'gzip':
+            return params.replace(' ', '').lower() not in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000')
+    return False
+
+def gzip_etag(etag):
+    # A strong ETag names one encoding of the response, so gzip gets its own
+    return f'{etag[:-1]}-gzip"'
+
+class Rendered:
+    """A route's 200 response, encoded, and its gzip encoding if worth one."""
+
+    def __init__(self, etag, headers, body):
+        self.etag = etag
+        # Content-Length is set per encoding when sent
+        self.headers = [(name, value) for name, value in headers if name.lower() != b'content-length']
+        self.body = body
+        self.gzipped = gzip.compress(body, GZIP_LEVEL, mtime=0) if len(body) >= GZIP_MIN_BYTES else None
+
+    def compressed(self, accepts_gzip):
+        """Whether a client that accepts_gzip or not is sent the gzip copy."""
+        return accepts_gzip and self.gzipped is not None
+
+    @property
+    def size(self):
+        return len(self.body) + len(self.gzipped or b'')
+
+    async def send(self, send, gzipped, cache_headers):
+        body = self.gzipped if gzipped else self.body
+        headers = [*self.headers, (b'content-length', str(len(body)).encode()), *cache_headers]
+        if gzipped:
+            headers.append((b'content-encoding', b'gzip'))
+        await send({'type': 'http.response.start', 'status': 200, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': body})
+
+class ResponseCache:
+    """The latest Rendered response per key."""
+
+    def __init__(self, max_bytes=RESPONSE_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+
+    def get(self, key, etag):
+        """Return the response stored for key if rendered under etag, or None."""
+        rendered = self._entries.get(key)
+        if rendered is None or rendered.etag != etag:
+            return None
+        self._entries.move_to_end(key)
+        return rendered
+
+    def put(self, key, rendered):
+        self.discard(key)
+        if rendered.size > self.max_bytes:
+            return
+        self._entries[key] = rendered
+        self._bytes += rendered.size
+        while self._bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted.size
+
+    def discard(self, key):
+        rendered = self._entries.pop(key, None)
+        if rendered is not None:
+            self._bytes -= rendered.size
+
+class ConditionalGetMiddleware:
+    def __init__(self, app, db, cache_bytes=RESPONSE_CACHE_BYTES):
+        self.app = app
+        self.db = db
+        self.responses = ResponseCache(cache_bytes)
+
+    def _endpoint(self, scope):
+        for route in scope['app'].router.routes:
+            match, child_scope = route.matches(scope)
+            if match == Match.FULL:
+                return child_scope.get('endpoint')
+        return None
+
+    async def _etag(self, versioned):
+        collections, extra = versioned
+        parts = [await self.db.get_collection(name).get_epoch_and_version() for name in collections]
+        if extra is not None:
+            parts.append(await extra(self.db))
+        digest = hashlib.blake2b(repr(parts).encode(), digest_size=12).hexdigest()
+        return f'"{digest}"'
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or scope['method'] not in ('GET', 'HEAD'):
+            return await self.app(scope, receive, send)
+        versioned = getattr(self._endpoint(scope), 'versioned', None)
+        if versioned is None:
+            return await self.app(scope, receive, send)
+        # Read before the route runs: a write landing meanwhile changes the
+        # next ETag, so the response is at worst revalidated once more
+        etag = await self._etag(versioned)
+        request_headers = dict(scope['headers'])
+        gzipped = accepts_gzip(request_headers.get(b'accept-encoding', b'').decode('latin-1'))
+
+        def cache_headers(compressed):
+            return [
+                (b'etag', (gzip_etag(etag) if compressed else etag).encode()),
+                (b'cache-control', CACHE_CONTROL.encode()),
+                (b'vary', b'Accept-Encoding'),
+            ]
+
+        key = (scope['method'], scope['path'], scope['query_string'])
+        rendered = self.responses.get(key, etag)
+        if_none_match = request_headers.get(b'if-none-match', b'').decode('latin-1')
+        # Either encoding's tag means the client holds the current version
+        if if_none_match and (etag_matches(if_none_match, etag) or etag_matches(if_none_match, gzip_etag(etag))):
+            # The 304 names the encoding a 200 would be sent in: the stored
+            # response's, or else whichever the client holds
+            if rendered is not None:
+                compressed = rendered.compressed(gzipped)
+            else:
+                compressed = not etag_matches(if_none_match, etag)
+            await send({'type': 'http.response.start', 'status': 304, 'headers': cache_headers(compressed)})
+            await send({'type': 'http.response.body', 'body': b''})
+            return
+
+        if rendered is not None:
+            compressed = rendered.compressed(gzipped)
+            return await rendered.send(send, compressed, cache_headers(compressed))
+
+        # A 200 is held back until complete, then stored and sent in the
+        # encoding the client takes; anything else passes straight through
+        start, chunks = None, []
+
+        async def capture(message):
+            nonlocal start
+            if message['type'] == 'http.response.start':
+                if message['status'] != 200:
+                    return await send(message)
+                start = message
+            elif start is None:
+                await send(message)
+            else:
+                chunks.append(message.get('body', b''))
+                if not message.get('more_body', False):
+                    rendered = Rendered(etag, start.get('headers', []), b''.join(chunks))
+                    self.responses.put(key, rendered)
+                    compressed = rendered.compressed(gzipped)
+                    await rendered.send(send, compressed, cache_headers(compressed))
+
+        await self.app(scope, receive, capture)
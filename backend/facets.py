@@ -0,0 +1,134 @@
+"""Tag, category and technology filters over the public projects and blogs,
+for GET /api/projects, GET /api/blogs and GET /api/facets.
+
+FacetIndex maps each value of a facet field to the set of ids of the
+documents holding it. A list field such as tags contributes one entry
+per element. A selection like {"tags": ["react"], "category": "Design"}
+is answered by intersecting those sets, smallest first, and the page is
+cut from the intersection in the list routes' created_at order. The
+documents are read by id only for the page itself. A value's count is
+the size of its set, so it stays current as documents come and go.
+
+Like SearchIndex, the index keeps the collection versions it reflects
+and reindexes what changes_since() reports before each use.
+"""
+import asyncio
+import heapq
+
+# The faceted lists, each with the filter of its list route and its facet fields
+FACET_COLLECTIONS = {
+    "projects": (None, ("tags", "category", "technologies")),
+    "blogs": ({"published": True}, ("tags", "category")),
+}
+
+# Documents indexed between yields to the event loop
+INDEX_CHUNK = 500
+
+def facet_values(doc, field):
+    """Return the set of string values doc holds in field."""
+    value = doc.get(field)
+    if isinstance(value, list):
+        return {item for item in value if isinstance(item, str)}
+    return {value} if isinstance(value, str) else set()
+
+def sort_key(doc):
+    # The list routes' CREATED_ORDER; a missing created_at sorts first, as in the ordered index
+    created_at = doc.get('created_at')
+    return (created_at if isinstance(created_at, str) else '', doc['id'])
+
+class FacetIndex:
+    def __init__(self, db, collections=FACET_COLLECTIONS):
+        self.db = db
+        self.collections = collections
+        self._versions = dict.fromkeys(collections)
+        # Per collection: id -> (sort key, {field: values}), and field -> value -> ids
+        self._documents = {name: {} for name in collections}
+        self._postings = {name: {field: {} for field in fields} for name, (_, fields) in collections.items()}
+        self._lock = asyncio.Lock()
+
+    def _add(self, name, doc):
+        self._remove(name, doc['id'])
+        fields = self.collections[name][1]
+        values = {field: facet_values(doc, field) for field in fields}
+        self._documents[name][doc['id']] = (sort_key(doc), values)
+        postings = self._postings[name]
+        for field, field_values in values.items():
+            for value in field_values:
+                try:
+                    postings[field][value].add(doc['id'])
+                except KeyError:
+                    postings[field][value] = {doc['id']}
+
+    def _remove(self, name, doc_id):
+        entry = self._documents[name].pop(doc_id, None)
+        if entry is None:
+            return
+        postings = self._postings[name]
+        for field, field_values in entry[1].items():
+            for value in field_values:
+                ids = postings[field][value]
+                ids.discard(doc_id)
+                if not ids:
+                    del postings[field][value]
+
+    async def refresh(self):
+        """Bring the index up to date with the collections."""
+        async with self._lock:
+            for name, (filter_dict, _) in self.collections.items():
+                collection = self.db.get_collection(name)
+                since = self._versions[name]
+                changes = None if since is None else await collection.changes_since(since, filter_dict)
+                if changes is None:
+                    # Read the version first: documents written meanwhile are reindexed next time
+                    version = await collection.get_version()
+                    self._documents[name].clear()
+                    for field_postings in self._postings[name].values():
+                        field_postings.clear()
+                    documents, deleted = await collection.find(filter_dict).to_list(), []
+                else:
+                    documents, deleted, version = changes
+                for doc_id in deleted:
+                    self._remove(name, doc_id)
+                for position, doc in enumerate(documents, 1):
+                    if doc.get('id') is not None:
+                        self._add(name, doc)
+                    if position % INDEX_CHUNK == 0:
+                        await asyncio.sleep(0)
+                self._versions[name] = version
+
+    async def counts(self):
+        """Return {collection: {field: {value: documents}}}, most common values first."""
+        await self.refresh()
+        return {
+            name: {
+                field: dict(sorted(((value, len(ids)) for value, ids in field_postings.items()),
+                                   key=lambda item: (-item[1], item[0])))
+                for field, field_postings in postings.items()
+            }
+            for name, postings in self._postings.items()
+        }
+
+    async def select(self, name, selection, limit, after=None):
+        """Return (keys, total): the (created_at, id) sort keys of up to limit
+        documents of collection name matching every value in selection, a
+        {field: value or list of values} dict, in order starting after the
+        key `after` if given, and the number of documents matching."""
+        await self.refresh()
+        postings = self._postings[name]
+        sets = []
+        for field, values in selection.items():
+            if values is None:
+                continue
+            for value in [values] if isinstance(values, str) else values:
+                sets.append(postings[field].get(value, set()))
+        if not sets:
+            matches = self._documents[name].keys()
+        else:
+            sets.sort(key=len)
+            matches = sets[0].intersection(*sets[1:])
+        documents = self._documents[name]
+        keys = (documents[doc_id][0] for doc_id in matches)
+        if after is not None:
+            after = tuple(after)
+            keys = (key for key in keys if key > after)
+        return heapq.nsmallest(limit, keys), len(matches)
@@ -0,0 +1,45 @@
+"""Copy every collection in mock_data/ into the SQLite database.
+
+Reads through MockDB, so records still in the JSON write logs are included.
+Collections that already hold documents in SQLite are left alone unless
+--replace is given.
+
+    python import_sqlite.py [--data-dir mock_data] [--sqlite-path mock_data/portfolio.sqlite3] [--replace]
+"""
+import argparse
+import asyncio
+import os
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+from mock_db import MockDB
+from sqlite_db import SqliteDB
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+async def import_collections(source, target, replace):
+    names = sorted(path.stem for path in source.data_dir.glob('*.json'))
+    for name in names:
+        docs = await source.get_collection(name).find().to_list()
+        collection = target.get_collection(name)
+        existing = await collection.count_documents()
+        if existing and not replace:
+            print(f"⏭️  {name}: {existing} documents already in SQLite, skipped (use --replace)")
+            continue
+        await collection._transact(collection._insert_all, docs, replace)
+        print(f"✅ {name}: {len(docs)} documents imported")
+    for collection in target._collections.values():
+        await collection.compact()
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--data-dir', default=None)
+    parser.add_argument('--sqlite-path', default=os.getenv('SQLITE_PATH') or None)
+    parser.add_argument('--replace', action='store_true', help="overwrite collections already in SQLite")
+    args = parser.parse_args()
+    asyncio.run(import_collections(MockDB(args.data_dir), SqliteDB(args.sqlite_path), args.replace))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,1673 @@
+import asyncio
+import copy
+import hashlib
+import heapq
+import json
+import logging
+import mmap
+import os
+import time
+import uuid
+import zlib
+from bisect import bisect_left, bisect_right, insort
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import AsyncExitStack, asynccontextmanager
+from itertools import islice
+from pathlib import Path
+from datetime import datetime
+
+from changes import WATCH_QUEUE_SIZE, ChangeEvent, ChangeStream, Subscribers
+from query import (COMPARISONS, apply_update, compile_filter, compile_projection, compile_update,
+                   field_conditions, filter_fields, is_operator_dict, keyset_filter, merge_filters,
+                   sort_value)
+from schedule import EffectiveView
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, so run a single worker there
+    fcntl = None
+
+ROOT_DIR = Path(__file__).parent
+logger = logging.getLogger(__name__)
+
+# Fold the write log into the snapshot once it is this big relative to the
+# snapshot, but never for logs smaller than COMPACT_MIN_BYTES
+COMPACT_RATIO = 0.5
+COMPACT_MIN_BYTES = 64 * 1024
+
+# Size of the thread pool that MockDB runs file reads and writes on
+IO_THREADS = 4
+
+# Group commit: log records queued within COMMIT_INTERVAL seconds of each
+# other (up to COMMIT_MAX_RECORDS) are written and fsynced together
+COMMIT_INTERVAL = 0.002
+COMMIT_MAX_RECORDS = 1000
+
+# Other workers' writes are noticed through the shared generation counter.
+# Files edited by hand are only noticed by the stat check, run at most this
+# often (in seconds) on the read path and on every write.
+STAT_INTERVAL = 1.0
+
+# How long to sleep between attempts to take a collection's file lock
+LOCK_POLL_INTERVAL = 0.001
+
+# Documents a cursor hands out per batch under ``async for``
+BATCH_SIZE = 100
+
+# Deletions each collection remembers for changes_since(). A client that
+# last synced before the oldest one still remembered has to resync in full.
+TOMBSTONE_LIMIT = 1000
+
+# Mock database using JSON files
+class MockResult:
+    def __init__(self, modified_count=0, deleted_count=0, inserted_id=None, inserted_ids=None,
+                 matched_count=0, upserted_ids=None):
+        self.modified_count = modified_count
+        self.deleted_count = deleted_count
+        self.inserted_id = inserted_id
+        self.inserted_ids = inserted_ids or []
+        self.matched_count = matched_count
+        self.upserted_ids = upserted_ids or []
+
+    @property
+    def inserted_count(self):
+        return len(self.inserted_ids)
+
+    @property
+    def upserted_id(self):
+        return self.upserted_ids[0] if self.upserted_ids else None
+
+    @property
+    def upserted_count(self):
+        return len(self.upserted_ids)
+
+def merge_results(results):
+    """Sum the results of the operations in a bulk_write()."""
+    merged = MockResult()
+    for result in results:
+        merged.modified_count += result.modified_count
+        merged.deleted_count += result.deleted_count
+        merged.matched_count += result.matched_count
+        merged.inserted_ids += result.inserted_ids
+        merged.upserted_ids += result.upserted_ids
+    return merged
+
+# Operations for bulk_write(), named after their pymongo counterparts
+class InsertOne:
+    def __init__(self, document):
+        self.document = document
+
+class UpdateOne:
+    multi = False
+
+    def __init__(self, filter_dict, update_dict, upsert=False):
+        self.filter_dict = filter_dict
+        self.update_dict = update_dict
+        self.upsert = upsert
+
+class UpdateMany(UpdateOne):
+    multi = True
+
+class DeleteOne:
+    multi = False
+
+    def __init__(self, filter_dict):
+        self.filter_dict = filter_dict
+
+class DeleteMany(DeleteOne):
+    multi = True
+
+class ReturnDocument:
+    """Which document find_one_and_update() returns, as in pymongo."""
+    BEFORE = False
+    AFTER = True
+
+class Transaction:
+    """Writes to several collections that take effect together, or not at all.
+
+    Start one with db.transaction(), stage operations on it naming their
+    collection (a collection object or its name), then await commit().
+    Nothing is read or written before commit(). Each collection's
+    operations run in the order staged, as in bulk_write().
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self.operations = {}
+
+    def add(self, collection, operation):
+        name = getattr(collection, 'name', collection)
+        self.operations.setdefault(name, []).append(operation)
+        return self
+
+    def insert_one(self, collection, document):
+        return self.add(collection, InsertOne(document))
+
+    def update_one(self, collection, filter_dict, update_dict, upsert=False):
+        return self.add(collection, UpdateOne(filter_dict, update_dict, upsert))
+
+    def update_many(self, collection, filter_dict, update_dict, upsert=False):
+        return self.add(collection, UpdateMany(filter_dict, update_dict, upsert))
+
+    def delete_one(self, collection, filter_dict):
+        return self.add(collection, DeleteOne(filter_dict))
+
+    def delete_many(self, collection, filter_dict):
+        return self.add(collection, DeleteMany(filter_dict))
+
+    async def commit(self):
+        """Apply every staged operation. Returns {collection name: results summed}."""
+        return await self.db.commit(self.operations)
+
+def to_document(document):
+    """Return a model or dict as a dict, with datetime values as ISO strings."""
+    doc_dict = document.model_dump() if hasattr(document, 'model_dump') else document
+    for key, value in doc_dict.items():
+        if isinstance(value, datetime):
+            doc_dict[key] = value.isoformat()
+    return doc_dict
+
+def document_id(doc):
+    return doc.get('_id', doc.get('id'))
+
+def declare_schema(db):
+    """Give a MockDB or SqliteDB its collections, indexes, counters and views."""
+    # Define collections as attributes for compatibility
+    db.admins = db.get_collection('admins')
+    db.services = db.get_collection('services')
+    db.projects = db.get_collection('projects')
+    db.testimonials = db.get_collection('testimonials')
+    db.blogs = db.get_collection('blogs')
+    db.contacts = db.get_collection('contacts')
+    db.profiles = db.get_collection('profiles')
+    db.media_settings = db.get_collection('media_settings')
+    db.site_settings = db.get_collection('site_settings')
+    db.offers = db.get_collection('offers')
+    db.hero_section = db.get_collection('hero_section')
+
+    # Secondary indexes on the fields routes filter by equality
+    for collection in db._collections.values():
+        collection.create_index('id')
+    db.admins.create_index('email')
+    db.profiles.create_index('admin_id')
+    db.services.create_index('active')
+    db.testimonials.create_index('approved')
+    db.blogs.create_index('published')
+    db.contacts.create_index('read')
+    db.offers.create_index('active')
+    # List routes page through these in created_at order
+    db.contacts.create_index('created_at', ordered=True)
+    db.blogs.create_index('created_at', ordered=True)
+    db.services.create_index('created_at', ordered=True)
+    db.projects.create_index('created_at', ordered=True)
+    db.testimonials.create_index('created_at', ordered=True)
+
+    # Live counts for the admin dashboard
+    db.projects.create_counter('total')
+    db.services.create_counter('active', {"active": True})
+    db.testimonials.create_counter('approved', {"approved": True})
+    db.contacts.create_counter('total')
+    db.contacts.create_counter('unread', {"read": False})
+    db.blogs.create_counter('total')
+    db.blogs.create_counter('published', {"published": True})
+
+    # Offers in effect right now, by their starts_at/ends_at window
+    db.active_offers = EffectiveView(db.offers, {"active": True})
+
+class MockDB:
+    def __init__(self, data_dir=None, commit_interval=COMMIT_INTERVAL, commit_max_records=COMMIT_MAX_RECORDS,
+                 stat_interval=STAT_INTERVAL):
+        self.data_dir = Path(data_dir) if data_dir else ROOT_DIR / 'mock_data'
+        self.commit_interval = commit_interval
+        self.commit_max_records = commit_max_records
+        self.stat_interval = stat_interval
+        self.data_dir.mkdir(exist_ok=True)
+        # Names this data directory, so versions counted in another one never pass for ours
+        self.epoch = store_epoch(self.data_dir / 'epoch')
+        # Transactions being committed, one file each (see commit())
+        self.intent_dir = self.data_dir / 'intents'
+        # File I/O runs here so a slow disk never stalls the event loop
+        self.executor = ThreadPoolExecutor(max_workers=IO_THREADS, thread_name_prefix='mock-db')
+        self._collections = {}
+
+        declare_schema(self)
+
+    async def counters(self):
+        """Return {collection: {counter: count}} for every collection with counters."""
+        return {name: await collection.counters()
+                for name, collection in self._collections.items() if collection._counters}
+
+    async def check_counters(self):
+        """Recount every counter, returning {"collection.counter": (maintained, recounted)}
+        for those that disagree."""
+        return {f'{name}.{counter}': values
+                for name, collection in self._collections.items()
+                for counter, values in (await collection.check_counters()).items()}
+
+    async def compact(self):
+        """Fold every collection's write log into its snapshot, so the JSON
+        files hold every write on their own."""
+        # Logs on disk too, which other workers may have written
+        for path in sorted(self.data_dir.glob('*.jsonl')):
+            self.get_collection(path.stem)
+        for collection in list(self._collections.values()):
+            await collection.compact()
+
+    def get_collection(self, name):
+        # One instance per file, so every caller shares its cache and lock
+        if name not in self._collections:
+            self._collections[name] = MockCollection(
+                self.data_dir / f'{name}.json', self.executor,
+                self.commit_interval, self.commit_max_records, self.stat_interval, self.intent_dir, self.epoch)
+        return self._collections[name]
+
+    def transaction(self):
+        """Start a Transaction: writes to several collections, applied together by its commit()."""
+        return Transaction(self)
+
+    def _run(self, func, *args):
+        return asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+    @asynccontextmanager
+    async def _write_locks(self, names):
+        """Hold the write locks of the named collections, taken in name order
+        so two transactions can never wait on each other."""
+        async with AsyncExitStack() as stack:
+            for name in sorted(names):
+                await stack.enter_async_context(self.get_collection(name)._write_lock())
+            yield
+
+    async def commit(self, operations):
+        """Apply {collection name: [operations]} all or nothing. Returns
+        {collection name: results summed}.
+
+        Under the write locks of every collection involved, each one plans
+        its operations and applies them to its cache, holding back their
+        change events. An error at this stage drops those caches and
+        nothing is written. Otherwise the records of all collections are
+        written to one intent file, then appended to each collection's log
+        with one flush per collection, and the intent file is removed
+        before the locks are let go. If the worker dies in between, the
+        next writer to take one of those collections' locks finds the
+        intent and completes that collection's part (see
+        MockCollection._roll_forward()), and recover() completes the rest.
+        Every record is tagged with the transaction id, so counting them in
+        a collection's snapshot and log tells how much of it landed there.
+        """
+        names = sorted(name for name, collection_operations in operations.items() if collection_operations)
+        if not names:
+            return {}
+        txn = uuid.uuid4().hex
+        intent_path = self.intent_dir / f'{txn}.json'
+        async with self._write_locks(names):
+            collections = [self.get_collection(name) for name in names]
+            staged = {}
+            written = None
+            try:
+                for collection in collections:
+                    staged[collection.name] = collection._stage_transaction(operations[collection.name], txn)
+                intent = {'txn': txn, 'collections': {name: records for name, (records, _, _) in staged.items()}}
+                written = self._run(write_intent, intent_path, intent)
+                await written
+            except BaseException:
+                if written is not None:
+                    # If the wait was cancelled the write is still running: let it finish first
+                    await asyncio.wait([written])
+                    await self._run(remove_intent, intent_path)
+                for collection in collections:
+                    await collection._discard_transaction()
+                raise
+            durables = [collection._queue(staged[collection.name][1]) for collection in collections]
+            try:
+                await asyncio.gather(*durables)
+            finally:
+                for collection in collections:
+                    collection._publish_held()
+            # Removed under the locks, so an intent seen by a lock holder is always abandoned
+            await self._run(remove_intent, intent_path)
+        return {name: result for name, (_, _, result) in staged.items()}
+
+    async def recover(self):
+        """Complete every transaction a worker died while committing.
+
+        Taking the write locks of an intent's collections completes each
+        one's part, after which the intent can go. Run at startup.
+        """
+        for path in intent_paths(self.intent_dir):
+            intent = await self._run(read_intent, path)
+            if intent is None:
+                continue
+            async with self._write_locks(intent['collections']):
+                await self._run(remove_intent, path)
+
+class CorruptCollectionError(Exception):
+    """A collection file is unreadable and no earlier generation could be recovered."""
+
+def encode_snapshot(docs):
+    return json.dumps(docs, indent=2, ensure_ascii=False).encode('utf-8')
+
+def encode_record(record):
+    # One JSON document per line followed by a tab and its CRC32. JSON never
+    # contains a raw tab, so the checksum column can't be confused with data.
+    body = json.dumps(record, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return b'%s\t%08x\n' % (body, zlib.crc32(body))
+
+def decode_record(line):
+    """Parse a log line, returning None if it is torn or fails its checksum."""
+    body, tab, crc = line.rpartition(b'\t')
+    if not tab:
+        body = line  # Written before records carried a checksum
+    else:
+        try:
+            if int(crc, 16) != zlib.crc32(body):
+                return None
+        except ValueError:
+            return None
+    try:
+        record = json.loads(body)
+    except ValueError:
+        return None
+    return record if isinstance(record, dict) else None
+
+def fsync_dir(path):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+def write_atomic(path, data):
+    """Replace path with data via temp file, fsync and rename. Returns its stat."""
+    # Per process, so workers recovering the same file can't clobber each other
+    tmp_path = path.with_name(f'{path.name}.{os.getpid()}.tmp')
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+        stat = os.fstat(f.fileno())
+    os.replace(tmp_path, path)
+    fsync_dir(path.parent)
+    return stat
+
+def store_epoch(path):
+    """Return the epoch stored at path, creating it on first use.
+
+    Each worker links its own candidate into place, and the first link
+    wins, so every worker ends up reading back the same one.
+    """
+    try:
+        return path.read_text().strip()
+    except FileNotFoundError:
+        pass
+    tmp_path = path.with_name(f'{path.name}.{os.getpid()}.tmp')
+    with open(tmp_path, 'w') as f:
+        f.write(uuid.uuid4().hex)
+        f.flush()
+        os.fsync(f.fileno())
+    try:
+        os.link(tmp_path, path)
+        fsync_dir(path.parent)
+    except FileExistsError:
+        pass
+    finally:
+        tmp_path.unlink()
+    return path.read_text().strip()
+
+def snapshot_epoch(store_epoch, size, crc):
+    # Every worker derives the same one from the same snapshot, and another from any other
+    return hashlib.blake2b(f'{store_epoch}:{size}:{crc:08x}'.encode(), digest_size=16).hexdigest()
+
+def intent_paths(intent_dir):
+    """Return the transaction intent files in intent_dir, usually none."""
+    try:
+        with os.scandir(intent_dir) as entries:
+            return [Path(entry.path) for entry in entries if entry.name.endswith('.json')]
+    except FileNotFoundError:
+        return []
+
+def write_intent(path, intent):
+    path.parent.mkdir(exist_ok=True)
+    write_atomic(path, json.dumps(intent, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+
+def read_intent(path):
+    """Parse an intent file, or return None if it is gone or unreadable."""
+    try:
+        return json.loads(path.read_bytes())
+    except FileNotFoundError:
+        return None
+    except ValueError:
+        logger.error("Transaction intent %s is unreadable and was left in place", path)
+        return None
+
+def remove_intent(path):
+    # Durably, so a completed transaction is never completed twice
+    try:
+        path.unlink()
+    except FileNotFoundError:
+        return
+    fsync_dir(path.parent)
+
+def keep_generation(path):
+    """Hard link path to path.prev so it survives being replaced."""
+    prev_path = path.with_name(path.name + '.prev')
+    tmp_path = path.with_name(path.name + '.prev.tmp')
+    try:
+        if tmp_path.exists():
+            tmp_path.unlink()
+        os.link(path, tmp_path)
+        os.replace(tmp_path, prev_path)
+    except FileNotFoundError:
+        pass
+
+class MockCursor:
+    """A lazy query: sort(), limit(), skip(), after() and batch_size() each
+    return a new cursor, and nothing runs until to_list() or ``async for``.
+
+    ``async for`` hands out BATCH_SIZE documents at a time, yielding to the
+    event loop between batches, so only one batch of copies exists at once.
+    after() continues from the last document of a previous page by its
+    sort key values, which stays cheap however deep the page is.
+    """
+
+    def __init__(self, collection, filter_dict=None, limit_count=None, sort_keys=None, projection=None):
+        self.collection = collection
+        self.filter_dict = filter_dict
+        self.limit_count = limit_count
+        self.sort_keys = sort_keys
+        self.projection = projection
+        self.skip_count = 0
+        self.batch_count = BATCH_SIZE
+        self.after_values = None
+
+    def _clone(self, **changes):
+        cursor = copy.copy(self)
+        cursor.__dict__.update(changes)
+        return cursor
+
+    def sort(self, key_or_list, direction=1):
+        # Accept both sort("created_at", -1) and sort([("created_at", -1)])
+        if isinstance(key_or_list, str):
+            sort_keys = [(key_or_list, direction)]
+        else:
+            sort_keys = list(key_or_list)
+        return self._clone(sort_keys=sort_keys)
+
+    def limit(self, count):
+        return self._clone(limit_count=count)
+
+    def skip(self, count):
+        return self._clone(skip_count=count)
+
+    def batch_size(self, count):
+        return self._clone(batch_count=max(1, count))
+
+    def after(self, values):
+        """Start after the document whose sort key values are values."""
+        return self._clone(after_values=list(values))
+
+    def _limit(self, limit=None):
+        limits = [n for n in (self.limit_count, limit) if n]
+        return min(limits) if limits else None
+
+    def _filter(self):
+        if self.after_values is None:
+            return self.filter_dict
+        return merge_filters(self.filter_dict, keyset_filter(self.sort_keys, self.after_values))
+
+    async def to_list(self, limit=None):
+        project = compile_projection(self.projection)
+        await self.collection._load()
+        data = self.collection._select(self._filter(), self.sort_keys, self._limit(limit), self.skip_count)
+        # Hand out copies so callers can't mutate the cached documents
+        return [project(item) for item in data]
+
+    async def __aiter__(self):
+        project = compile_projection(self.projection)
+        await self.collection._load()
+        # References to the cached documents; each is copied as it's handed out
+        data = self.collection._select(self._filter(), self.sort_keys, self._limit(), self.skip_count)
+        for start in range(0, len(data), self.batch_count):
+            if start:
+                await asyncio.sleep(0)
+            for item in data[start:start + self.batch_count]:
+                yield project(item)
+
+class MockCollection:
+    """A JSON file backed collection: a snapshot plus a write log, cached in
+    memory and shared between worker processes."""
+
+    def __init__(self, file_path, executor=None, commit_interval=COMMIT_INTERVAL,
+                 commit_max_records=COMMIT_MAX_RECORDS, stat_interval=STAT_INTERVAL, intent_dir=None,
+                 store_epoch=None):
+        self.file_path = Path(file_path)
+        self.name = self.file_path.stem
+        self._executor = executor
+        self._commit_interval = commit_interval
+        self._commit_max_records = commit_max_records
+        self._stat_interval = stat_interval
+        self.log_path = self.file_path.with_suffix('.jsonl')
+        self.lock_path = self.file_path.with_suffix('.lock')
+        # Keyed by position in the snapshot, then by order of logged inserts
+        self._docs = None
+        self._next_key = 0
+        self._snapshot_stamp = None
+        self._snapshot_size = 0
+        self._snapshot_crc = 0
+        self._log_inode = None
+        self._log_size = 0
+        self._log_valid = False
+        self._header_size = 0
+        self._indexes = {}
+        self._sorted_indexes = {}
+        self._counters = {}
+        self._subscribers = Subscribers(logger)
+        self._version = 0
+        self._base_version = 0
+        self._store_epoch = store_epoch
+        self._epoch = None
+        # Whether _epoch was picked for a log not written yet
+        self._new_epoch = False
+        # Ordered by version, oldest first, so recent changes are at the end
+        self._doc_versions = {}
+        self._tombstones = deque()
+        # The oldest version changes_since() can answer from
+        self._sync_floor = 0
+        self._intent_dir = intent_dir
+        # Records of each MockDB transaction in the snapshot and log, by transaction id
+        self._txns = {}
+        # Change events of a transaction being committed, published once it is durable
+        self._held_events = None
+        self._rollback_version = 0
+        self._lock = asyncio.Lock()
+        self._compaction = None
+        self._pending = []
+        self._batch_full = asyncio.Event()
+        self._flusher = None
+        self._flushing = False
+        self._file_locked = False
+        self._generation = None
+        self._next_stat = 0
+
+        # flock() locks belong to the open file, so each process keeps one
+        self._lock_fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        if os.fstat(self._lock_fd).st_size < 8:
+            os.ftruncate(self._lock_fd, 8)  # Only ever extends with zeros
+        self._generation_map = mmap.mmap(self._lock_fd, 8)
+
+    def create_index(self, field, ordered=False):
+        """Maintain an index on ``field``.
+
+        The default hash index serves equality filters. ``ordered=True``
+        keeps the field sorted instead, for sort() + limit() queries.
+        """
+        indexes = self._sorted_indexes if ordered else self._indexes
+        if field not in indexes:
+            indexes[field] = None
+            if self._docs is not None:
+                self._rebuild_indexes()
+
+    def create_counter(self, name, filter_dict=None):
+        """Keep a live count of the documents matching filter_dict under name."""
+        self._counters[name] = {
+            'filter': filter_dict or {},
+            'match': compile_filter(filter_dict),
+            'fields': filter_fields(filter_dict),
+            'count': 0,
+        }
+        if self._docs is not None:
+            self._recount()
+
+    def _recount(self):
+        for counter in self._counters.values():
+            match = counter['match']
+            counter['count'] = sum(1 for doc in self._docs.values() if match(doc))
+
+    def _adjust_counters(self, old, new, fields=None):
+        """Move counters from document old to new; either may be None.
+
+        fields, if given, are the only ones that changed, and counters that
+        don't read any of them are skipped.
+        """
+        for counter in self._counters.values():
+            if fields is not None and counter['fields'].isdisjoint(fields):
+                continue
+            match = counter['match']
+            counter['count'] += (new is not None and match(new)) - (old is not None and match(old))
+
+    def _indexed_fields(self):
+        return self._indexes.keys() | self._sorted_indexes.keys()
+
+    def _rebuild_indexes(self):
+        self._recount()
+        for field in self._indexes:
+            self._indexes[field] = {}
+        for key, doc in self._docs.items():
+            self._index_doc(key, doc, self._indexes)
+        for field in self._sorted_indexes:
+            self._sorted_indexes[field] = sorted(
+                (sort_value(doc.get(field)), key) for key, doc in self._docs.items())
+
+    def _index_doc(self, key, doc, fields):
+        for field in fields:
+            if field in self._sorted_indexes:
+                entries = self._sorted_indexes[field]
+                if entries is not None:
+                    insort(entries, (sort_value(doc.get(field)), key))
+            if field in self._indexes and field in doc:
+                try:
+                    self._indexes[field].setdefault(doc[field], set()).add(key)
+                except TypeError:
+                    pass  # Unhashable values never equal a filter value we could look up
+
+    def _unindex_doc(self, key, doc, fields):
+        for field in fields:
+            if field in self._sorted_indexes:
+                entries = self._sorted_indexes[field]
+                if entries is not None:
+                    entry = (sort_value(doc.get(field)), key)
+                    i = bisect_left(entries, entry)
+                    if i < len(entries) and entries[i] == entry:
+                        del entries[i]
+            if field in self._indexes and field in doc:
+                try:
+                    bucket = self._indexes[field].get(doc[field])
+                except TypeError:
+                    continue
+                if bucket is not None:
+                    bucket.discard(key)
+                    if not bucket:
+                        del self._indexes[field][doc[field]]
+
+    def _index_range(self, field, conditions):
+        """Return the (start, stop) slice of field's ordered index that
+        conditions' range operators allow, or None if they can't use it."""
+        entries = self._sorted_indexes.get(field)
+        if entries is None or not conditions.keys() & COMPARISONS.keys():
+            return None
+        start, stop = 0, len(entries)
+        for op, operand in conditions.items():
+            # (v,) sorts before every (v, key) entry and (v, inf) after them.
+            # Values of other types fall outside the slice or fail the match.
+            value = sort_value(operand)
+            if op == '$gt':
+                start = max(start, bisect_right(entries, (value, float('inf'))))
+            elif op == '$gte':
+                start = max(start, bisect_left(entries, (value,)))
+            elif op == '$lt':
+                stop = min(stop, bisect_left(entries, (value,)))
+            elif op == '$lte':
+                stop = min(stop, bisect_right(entries, (value, float('inf'))))
+        return start, max(start, stop)
+
+    def _field_candidates(self, field, value):
+        """Return the keys an index says may satisfy one field's condition, or None."""
+        conditions = field_conditions(value)
+        best = None
+        index = self._indexes.get(field)
+        for op, operand in conditions.items():
+            try:
+                if op == '$eq' and index is not None:
+                    keys = index.get(operand, ())
+                elif op == '$in' and index is not None:
+                    keys = set().union(*(index.get(item, ()) for item in operand))
+                else:
+                    continue
+            except TypeError:
+                continue  # Unhashable values are never in a hash index
+            if best is None or len(keys) < len(best):
+                best = keys
+        span = self._index_range(field, conditions)
+        if span is not None and (best is None or span[1] - span[0] < len(best)):
+            best = {key for _, key in self._sorted_indexes[field][span[0]:span[1]]}
+        return best
+
+    def _candidates(self, filter_dict):
+        """Return a set of keys covering every match of filter_dict, or None to scan.
+
+        Conjunctions use their most selective indexed condition. A $or uses
+        the union of its branches, as long as every branch has one.
+        """
+        best = None
+        for field, value in filter_dict.items():
+            if field == '$and':
+                found = [keys for keys in map(self._candidates, value) if keys is not None]
+                keys = min(found, key=len) if found else None
+            elif field == '$or':
+                branches = [self._candidates(sub) for sub in value]
+                keys = None if None in branches else set().union(*branches)
+            else:
+                keys = self._field_candidates(field, value)
+            if keys is not None and (best is None or len(keys) < len(best)):
+                best = keys
+        return best
+
+    def _find(self, filter_dict):
+        """Yield (key, document) pairs matching filter_dict in insertion order."""
+        docs = self._docs
+        if not filter_dict:
+            yield from docs.items()
+            return
+
+        match = compile_filter(filter_dict)
+        keys = self._candidates(filter_dict)
+        if keys is None:
+            candidates = docs.items()
+        else:
+            # Keys grow with insertion order, so sorting keeps scan order
+            candidates = ((key, docs[key]) for key in sorted(keys))
+        for key, item in candidates:
+            if match(item):
+                yield key, item
+
+    def _select(self, filter_dict, sort_keys=None, limit=None, skip=0):
+        """Return the cached documents a cursor reads, without copying them."""
+        stop = skip + limit if limit else None
+        if sort_keys:
+            return self._sorted(filter_dict, sort_keys, stop)[skip:]
+        return [item for _, item in islice(self._find(filter_dict), skip, stop)]
+
+    @staticmethod
+    def _order(pairs, sort_keys):
+        """Sort (key, document) pairs by sort_keys, ties in insertion order."""
+        pairs = sorted(pairs, key=lambda pair: pair[0])
+        for field, order in reversed(sort_keys):
+            pairs.sort(key=lambda pair: sort_value(pair[1].get(field)), reverse=order == -1)
+        return pairs
+
+    def _sorted(self, filter_dict, sort_keys, limit=None):
+        """Return documents matching filter_dict ordered by sort_keys.
+
+        With a limit, a query whose first sort key has an ordered index is
+        answered by walking it (O(limit) for an unfiltered query); further
+        keys only reorder the documents tied on the first. Otherwise a
+        single key uses a bounded heap over the matches (O(n log limit)).
+        Ties are broken by insertion order, following the direction of a
+        single sort key.
+        """
+        docs = self._docs
+        field, order = sort_keys[0]
+        entries = self._sorted_indexes.get(field)
+        if limit and entries is not None:
+            # A range on the sort field narrows the walk to its slice
+            span = None
+            if filter_dict and field in filter_dict:
+                span = self._index_range(field, field_conditions(filter_dict[field]))
+            start, stop = span or (0, len(entries))
+            # A small candidate set from the other fields beats walking the
+            # index past misses. $and/$or are left to the match: a keyset's
+            # $or only repeats the range the slice already applies.
+            rest = {key: value for key, value in (filter_dict or {}).items()
+                    if key != field and not key.startswith('$')}
+            keys = self._candidates(rest) if rest else None
+            if keys is None or len(keys) * 2 >= stop - start:
+                match = compile_filter(filter_dict) if filter_dict else None
+                result = []
+                boundary = None
+                walk = range(stop - 1, start - 1, -1) if order == -1 else range(start, stop)
+                for value, key in map(entries.__getitem__, walk):
+                    if len(result) >= limit and (len(sort_keys) == 1 or value != boundary):
+                        break
+                    item = docs[key]
+                    if match is None or match(item):
+                        result.append((key, item))
+                        boundary = value
+                if len(sort_keys) > 1:
+                    result = self._order(result, sort_keys)
+                return [item for _, item in result[:limit]]
+
+        if len(sort_keys) == 1:
+            sort_key = lambda pair: (sort_value(pair[1].get(field)), pair[0])
+            if limit:
+                select = heapq.nlargest if order == -1 else heapq.nsmallest
+                pairs = select(limit, self._find(filter_dict), key=sort_key)
+            else:
+                pairs = sorted(self._find(filter_dict), key=sort_key, reverse=order == -1)
+        else:
+            pairs = self._order(self._find(filter_dict), sort_keys)
+        return [item for _, item in islice(pairs, limit)]
+
+    def _stamp(self):
+        try:
+            stat = self.file_path.stat()
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _log_stamp(self):
+        try:
+            stat = self.log_path.stat()
+        except FileNotFoundError:
+            return (None, 0)
+        return (stat.st_ino, stat.st_size)
+
+    def _read_generation(self):
+        return int.from_bytes(self._generation_map[:8], 'little')
+
+    def _bump_generation(self):
+        """Tell other workers the files changed. The caller must hold the file lock."""
+        self._generation = self._read_generation() + 1
+        self._generation_map[:8] = self._generation.to_bytes(8, 'little')
+
+    async def _lock_file(self, shared=False):
+        """Take the file lock, polling so a wait never ties up a pool thread."""
+        if fcntl is None:
+            return
+        operation = fcntl.LOCK_SH if shared else fcntl.LOCK_EX
+        while True:
+            try:
+                fcntl.flock(self._lock_fd, operation | fcntl.LOCK_NB)
+                return
+            except BlockingIOError:
+                await asyncio.sleep(LOCK_POLL_INTERVAL)
+
+    def _unlock_file(self):
+        if fcntl is not None:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+
+    def _release_file_lock(self):
+        # Dropped by whichever finishes last: the holder of self._lock or
+        # the flusher writing the records queued under it
+        if self._file_locked and self._flusher is None:
+            self._file_locked = False
+            self._unlock_file()
+
+    @asynccontextmanager
+    async def _write_lock(self):
+        """Hold self._lock and the exclusive file lock, with the cache up to date."""
+        # The flock on <name>.lock orders writers across worker processes.
+        # It is held until the flusher has written what was queued under it,
+        # so one flush per turn still covers many writes.
+        async with self._lock:
+            try:
+                if not self._file_locked:
+                    await self._lock_file()
+                    self._file_locked = True
+                await self._load_locked(full=True)
+                await self._roll_forward()
+                yield
+            finally:
+                self._release_file_lock()
+
+    @asynccontextmanager
+    async def _read_lock(self):
+        """Keep other workers from compacting while the files are read in full."""
+        if self._file_locked:
+            yield  # Our exclusive lock already covers it
+            return
+        await self._lock_file(shared=True)
+        try:
+            yield
+        finally:
+            self._unlock_file()
+
+    def _is_fresh(self, full=True):
+        """Check whether the cache matches the files.
+
+        Other workers' writes show up in the generation counter. The two
+        stat calls that catch hand edits are skipped for full=False until
+        stat_interval has passed since they last ran.
+        """
+        if self._docs is None or self._generation != self._read_generation():
+            return False
+        now = time.monotonic()
+        if not full and now < self._next_stat:
+            return True
+        self._next_stat = now + self._stat_interval
+        if self._stamp() != self._snapshot_stamp:
+            return False
+        # While our own flush is running the log is expected to grow
+        return self._flushing or self._log_stamp() == (self._log_inode, self._log_size)
+
+    async def _load(self):
+        """Return the cached documents, refreshing them from disk if needed."""
+        if self._docs is not None and (self._lock.locked() or self._is_fresh(full=False)):
+            # A writer holding the lock brings the cache up to date itself,
+            # so readers never queue behind a disk write
+            return self._docs
+        async with self._lock:
+            try:
+                return await self._load_locked()
+            finally:
+                self._release_file_lock()
+
+    async def _load_locked(self, full=False):
+        """Refresh the cache from disk. The caller must hold self._lock."""
+        # Read before the files, so a write landing meanwhile bumps it again
+        generation = self._read_generation()
+        if self._is_fresh(full):
+            return self._docs
+        if self._docs is not None and self._stamp() == self._snapshot_stamp:
+            log_inode, log_size = self._log_stamp()
+            if log_inode == self._log_inode and log_size >= self._log_size:
+                # Only the log grew, if anything: replay just the new records
+                chunk = b''
+                offset = self._log_size
+                if log_size > offset:
+                    chunk, log_inode = await self._run(self._read_log, self.log_path, offset)
+                if self._docs is not None and self._log_size != offset:
+                    # Our flusher appended meanwhile, cutting off any torn
+                    # tail, and only it can write while it runs: what was
+                    # read is its records, already in the cache
+                    return self._docs
+                if self._docs is not None:
+                    self._replay_log(chunk, offset, log_inode)
+                    self._generation = generation
+                    return self._docs
+
+        async with self._read_lock():
+            raw, stamp, data = await self._run(self._read_snapshot)
+            if data is None:
+                raw, stamp, data = await self._recover_snapshot()
+            self._docs = dict(enumerate(data))
+            self._next_key = len(data)
+            self._rebuild_indexes()
+            self._snapshot_stamp = stamp
+            self._snapshot_size = len(raw)
+            self._snapshot_crc = zlib.crc32(raw)
+            self._log_size = 0
+            self._log_valid = False
+            chunk, log_inode = await self._run(self._read_log, self.log_path, 0)
+        version = self._version
+        self._replay_log(chunk, 0, log_inode)
+        self._generation = generation
+        if self._subscribers and self._version != version:
+            self._subscribers.publish(ChangeEvent('reload', self.name, self._version))
+        return self._docs
+
+    async def _recover_snapshot(self):
+        """Rebuild a torn snapshot from the generation compaction kept.
+
+        The previous snapshot plus the log that was folded into it replay to
+        exactly the documents the lost snapshot held. The current log's
+        header holds the lost snapshot's checksum, so re-encoding them must
+        reproduce it byte for byte. The rebuilt snapshot is written back
+        atomically.
+        """
+        logger.error("%s is unreadable, recovering from the previous generation", self.file_path)
+        prev_path = self.file_path.with_name(self.file_path.name + '.prev')
+        prev_log_path = self.log_path.with_name(self.log_path.name + '.prev')
+        raw, _, data = await self._run(self._read_snapshot, prev_path)
+        if data is None:
+            raise CorruptCollectionError(f"{self.file_path} and its previous generation are unreadable")
+
+        self._docs = dict(enumerate(data))
+        self._next_key = len(data)
+        self._rebuild_indexes()
+        self._snapshot_size = len(raw)
+        self._snapshot_crc = zlib.crc32(raw)
+        self._log_valid = False
+        chunk, log_inode = await self._run(self._read_log, prev_log_path, 0)
+        self._replay_log(chunk, 0, log_inode)
+
+        data = list(self._docs.values())
+        raw = encode_snapshot(data)
+        chunk, _ = await self._run(self._read_log, self.log_path, 0)
+        header = decode_record(chunk.partition(b'\n')[0]) or {}
+        if (header.get('size'), header.get('crc')) != (len(raw), zlib.crc32(raw)):
+            logger.error("%s: recovered documents predate the current log, which is discarded", self.file_path)
+        stat = await self._run(write_atomic, self.file_path, raw)
+        return raw, (stat.st_mtime_ns, stat.st_size), data
+
+    def _run(self, func, *args):
+        """Run blocking file I/O on the storage thread pool."""
+        return asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    def _read_snapshot(self, path=None):
+        """Read and parse a snapshot. data is None if the file is torn or corrupt."""
+        raw = b''
+        stamp = None
+        try:
+            with open(path or self.file_path, 'rb') as f:
+                raw = f.read()
+                stat = os.fstat(f.fileno())
+                stamp = (stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            pass
+
+        try:
+            data = json.loads(raw) if raw.strip() else []
+        except ValueError:
+            data = None
+        if not isinstance(data, (list, type(None))):
+            data = None
+        return raw, stamp, data
+
+    def _read_log(self, path, offset):
+        try:
+            with open(path, 'rb') as f:
+                inode = os.fstat(f.fileno()).st_ino
+                f.seek(offset)
+                return f.read(), inode
+        except FileNotFoundError:
+            return b'', None
+
+    def _replay_log(self, chunk, offset, inode):
+        self._log_inode = inode
+        # Replay stops at the first torn or corrupt line. It and anything
+        # after it are left out of _log_size and cut off before the next append.
+        pos = 0
+        records = []
+        previous_version = self._version
+        stale_version = 0
+        header = {}
+        if offset == 0:
+            self._version = 0
+            self._header_size = 0
+            self._txns = {}
+        while True:
+            end = chunk.find(b'\n', pos)
+            if end == -1:
+                break
+            record = decode_record(chunk[pos:end])
+            if record is None:
+                break
+            if offset == 0 and pos == 0:
+                self._log_valid = (record.get('op') == 'base'
+                                   and record.get('size') == self._snapshot_size
+                                   and record.get('crc') == self._snapshot_crc)
+                self._version = record.get('version', 0)
+                self._header_size = end + 1
+                header = record
+                self._txns.update(record.get('txns', {}))
+            elif self._log_valid:
+                records.append(record)
+            else:
+                stale_version = max(stale_version, record.get('v', 0))
+                # Folded into the snapshot, so its transactions are too
+                self._count_txn(record)
+            pos = end + 1
+        if offset == 0:
+            if chunk and not self._log_valid:
+                # A log that doesn't match the snapshot was either folded into
+                # it by a compaction that died before resetting the log, or
+                # the snapshot was edited by hand. Either way its state is past
+                # every version the log reached.
+                self._version = max(self._version, stale_version) + 1
+            # Within a process the version never goes back, even if files do
+            exact = self._log_valid
+            if self._version < previous_version:
+                self._version = previous_version + 1
+                exact = False
+            self._base_version = self._version
+            self._load_sync_state(header if exact else {})
+            # Versions only count within one history, its epoch. A log's
+            # header names the epoch it started, so every worker agrees on
+            # it. A snapshot without a valid log gets one derived from the
+            # store and its checksum, so a fresh data directory or a snapshot
+            # replaced by hand never reuses the versions of what it replaced.
+            self._epoch = header.get('epoch') or snapshot_epoch(
+                self._store_epoch, self._snapshot_size, self._snapshot_crc)
+            self._new_epoch = False
+        # A full reload publishes one reload event rather than replaying history
+        self._apply_many(records, publish=offset > 0)
+        self._log_size = offset + pos
+
+    def _load_sync_state(self, header):
+        """Set document versions and tombstones for a freshly read snapshot
+        from the header of its log. Without a header that lists them, every
+        document counts as written at the snapshot's version."""
+        versions = header.get('versions')
+        if versions is None or len(versions) != len(self._docs):
+            self._doc_versions = dict.fromkeys(self._docs, self._version)
+            self._tombstones = deque()
+            self._sync_floor = self._version
+            return
+        self._doc_versions = {key: versions[key] for key in sorted(self._docs, key=versions.__getitem__)}
+        self._tombstones = deque(tuple(tombstone) for tombstone in header.get('tombstones', ()))
+        self._sync_floor = header.get('floor', 0)
+
+    def _sync_header(self):
+        """Return the document versions and tombstones for a log header,
+        with versions listed in the order the documents are snapshotted.
+        Record counts are carried over for transactions whose intent is
+        still on disk."""
+        live = {path.stem for path in intent_paths(self._intent_dir)} if self._intent_dir else set()
+        return {
+            'versions': [self._doc_versions[key] for key in self._docs],
+            'tombstones': list(self._tombstones),
+            'floor': self._sync_floor,
+            'txns': {txn: count for txn, count in self._txns.items() if txn in live},
+        }
+
+    def _count_txn(self, record):
+        txn = record.get('txn')
+        if txn is not None:
+            self._txns[txn] = self._txns.get(txn, 0) + 1
+
+    def _touch(self, key):
+        # Moving the key to the end keeps _doc_versions ordered by version
+        self._doc_versions.pop(key, None)
+        self._doc_versions[key] = self._version
+
+    def _bury(self, key, doc):
+        self._doc_versions.pop(key, None)
+        # Clients address documents by their id field
+        if doc.get('id') is not None:
+            self._tombstones.append((self._version, doc['id']))
+            if len(self._tombstones) > TOMBSTONE_LIMIT:
+                self._sync_floor = self._tombstones.popleft()[0]
+
+    def _apply(self, record, reindex=True, publish=True):
+        op = record.get('op')
+        key = record.get('key')
+        indexed = self._indexed_fields() if reindex else ()
+        # Records from before versioning count one each
+        self._version = record.get('v') or self._version + 1
+        event = None
+        if op == 'insert':
+            old = self._docs.get(key)
+            self._docs[key] = record['doc']
+            self._next_key = max(self._next_key, key + 1)
+            self._index_doc(key, record['doc'], indexed)
+            self._touch(key)
+            if reindex:
+                self._adjust_counters(old, record['doc'])
+            event = ChangeEvent('insert', self.name, self._version, record['doc'], old)
+        elif op == 'set':
+            # Documents are replaced rather than mutated so a snapshot being
+            # written in the background never sees a half-applied update
+            if key in self._docs:
+                old = self._docs[key]
+                removed = record.get('unset', ())
+                changed = [*record['fields'], *removed]
+                fields = [field for field in changed if field in indexed]
+                self._unindex_doc(key, old, fields)
+                new = {**old, **record['fields']}
+                for field in removed:
+                    new.pop(field, None)
+                self._docs[key] = new
+                self._index_doc(key, new, fields)
+                self._touch(key)
+                if reindex:
+                    self._adjust_counters(old, new, changed)
+                event = ChangeEvent('update', self.name, self._version, new, old, changed)
+        elif op == 'delete':
+            if key in self._docs:
+                old = self._docs.pop(key)
+                self._unindex_doc(key, old, indexed)
+                self._bury(key, old)
+                if reindex:
+                    self._adjust_counters(old, None)
+                event = ChangeEvent('delete', self.name, self._version, None, old)
+        self._count_txn(record)
+        if not publish or event is None:
+            return
+        if self._held_events is not None:
+            self._held_events.append(event)
+        elif self._subscribers:
+            self._subscribers.publish(event)
+
+    def _apply_many(self, records, publish=True):
+        # Keeping an ordered index current costs O(n) per record, so past
+        # about log2(n) records one rebuild at the end is cheaper
+        rebuild = self._sorted_indexes and len(records) > len(self._docs).bit_length()
+        for record in records:
+            self._apply(record, reindex=not rebuild, publish=publish)
+        if rebuild:
+            self._rebuild_indexes()
+
+    def _log_header(self, size, crc, version, sync=None):
+        return encode_record({'op': 'base', 'size': size, 'crc': crc, 'version': version,
+                              'epoch': self._epoch, **(sync or {})})
+
+    def _append_log(self, data, expected_size):
+        """Append to the log, or start a new one if expected_size is None."""
+        # <name>.json is a snapshot, rewritten only by compaction. Every write
+        # appends a JSON Lines record (insert, set or delete) to <name>.jsonl
+        # instead, each line with its own CRC32, so a write costs the same
+        # however large the collection is. The first line is the 'base'
+        # header with the size and CRC32 of the snapshot the log applies to;
+        # a log whose header doesn't match the snapshot on disk is ignored.
+        if expected_size is None:
+            return write_atomic(self.log_path, data).st_ino
+        with open(self.log_path, 'ab') as f:
+            end = f.seek(0, os.SEEK_END)
+            if end < expected_size:
+                # Truncating would pad with zeros, hiding what follows from replay
+                raise CorruptCollectionError(f"{self.log_path} is shorter than its replayed records")
+            if end != expected_size:
+                f.truncate(expected_size)
+            f.write(data)
+            os.fsync(f.fileno())
+            return os.fstat(f.fileno()).st_ino
+
+    def _commit(self, record):
+        return self._commit_many([record])
+
+    def _commit_many(self, records):
+        """Apply records to the cache and queue them for the next flush.
+
+        The caller must hold the write lock. Returns a future that resolves
+        once every record is durable. Records committed together are
+        written by the same flush.
+        """
+        return self._queue(self._stage(records))
+
+    def _stage(self, records, txn=None):
+        """Number records and apply them to the cache. Returns their log lines."""
+        if not self._log_valid and not self._new_epoch:
+            # These records start a new log, and with it a new history
+            self._epoch = uuid.uuid4().hex
+            self._new_epoch = True
+        for version, record in enumerate(records, self._version + 1):
+            record['v'] = version
+            if txn is not None:
+                record['txn'] = txn
+        # Encode first, so a document that can't be stored leaves the cache untouched
+        lines = [encode_record(record) for record in records]
+        self._apply_many(records)
+        return lines
+
+    def _queue(self, lines):
+        """Queue log lines for the next flush, returning a future resolved once they are durable."""
+        loop = asyncio.get_running_loop()
+        durable = loop.create_future()
+        if not lines:
+            durable.set_result(None)
+            return durable
+        self._pending.extend((line, durable) for line in lines)
+        if len(self._pending) >= self._commit_max_records:
+            self._batch_full.set()
+        if self._flusher is None:
+            self._flusher = loop.create_task(self._flush_pending())
+        return durable
+
+    async def _flush_pending(self):
+        # Group commit: mutations reach the cache at once and queue their
+        # records, and this writes everything queued within one commit
+        # window with a single append and fsync. Callers resolve only once
+        # their records are durable, so the cost follows the number of
+        # flushes rather than writes; readers may see a write before that.
+        try:
+            while self._pending:
+                # Let the commit window fill before writing
+                if len(self._pending) < self._commit_max_records:
+                    try:
+                        await asyncio.wait_for(self._batch_full.wait(), self._commit_interval)
+                    except asyncio.TimeoutError:
+                        pass
+                self._batch_full.clear()
+                batch, self._pending = self._pending, []
+                data = b''.join(line for line, _ in batch)
+
+                self._flushing = True
+                try:
+                    if self._log_valid:
+                        self._log_inode = await self._run(self._append_log, data, self._log_size)
+                        self._log_size += len(data)
+                    else:
+                        header = self._log_header(self._snapshot_size, self._snapshot_crc, self._base_version)
+                        data = header + data
+                        self._header_size = len(header)
+                        self._log_inode = await self._run(self._append_log, data, None)
+                        self._log_size = len(data)
+                        self._log_valid = True
+                except Exception as exc:
+                    # The cache holds writes that never reached disk. Fail
+                    # them and everything queued after them, then drop the
+                    # cache so the next access reloads what is on disk.
+                    batch, self._pending = batch + self._pending, []
+                    self._docs = None
+                    for _, durable in batch:
+                        if not durable.done():
+                            durable.set_exception(exc)
+                    return
+                finally:
+                    self._flushing = False
+                    self._bump_generation()
+
+                for _, durable in batch:
+                    if not durable.done():
+                        durable.set_result(None)
+            self._maybe_compact()
+        finally:
+            self._flusher = None
+            if not self._lock.locked():
+                self._release_file_lock()
+
+    def _maybe_compact(self):
+        if self._compaction is not None:
+            return
+        # The header lists every document's version, so only records count
+        if self._log_size - self._header_size < max(COMPACT_MIN_BYTES, COMPACT_RATIO * self._snapshot_size):
+            return
+        self._compaction = asyncio.get_running_loop().create_task(self.compact())
+
+    def _write_snapshot(self, docs, version, sync):
+        raw = encode_snapshot(docs)
+        crc = zlib.crc32(raw)
+        header = self._log_header(len(raw), crc, version, sync)
+
+        # Keep the current snapshot and log as the previous generation,
+        # which _recover_snapshot() can rebuild a torn snapshot from
+        keep_generation(self.file_path)
+        keep_generation(self.log_path)
+
+        # Swap the snapshot in first. If we die before the log is reset,
+        # its header no longer matches and it gets ignored.
+        stat = write_atomic(self.file_path, raw)
+        log_stat = write_atomic(self.log_path, header)
+        return (stat.st_mtime_ns, stat.st_size), len(raw), crc, log_stat.st_ino, len(header)
+
+    async def compact(self):
+        """Fold the write log into a fresh snapshot."""
+        try:
+            async with self._write_lock():
+                # Queued records are already in the cache, so let them reach
+                # the log before the log is folded away
+                if self._flusher is not None:
+                    await self._flusher
+                await self._load_locked(full=True)
+                # A header alone, or no log at all, leaves nothing to fold
+                if self._log_size == self._header_size:
+                    return
+                docs = list(self._docs.values())
+                sync = self._sync_header()
+                # Writers wait on the lock; readers keep using the cache
+                stamp, size, crc, log_inode, log_size = await self._run(
+                    self._write_snapshot, docs, self._version, sync)
+                self._txns = dict(sync['txns'])
+                positions = {key: position for position, key in enumerate(self._docs)}
+                self._doc_versions = {positions[key]: version for key, version in self._doc_versions.items()}
+                self._docs = dict(enumerate(docs))
+                self._next_key = len(docs)
+                self._rebuild_indexes()
+                self._snapshot_stamp = stamp
+                self._snapshot_size = size
+                self._snapshot_crc = crc
+                self._log_inode = log_inode
+                self._log_size = log_size
+                self._header_size = log_size
+                self._log_valid = True
+                self._base_version = self._version
+                self._bump_generation()
+        finally:
+            if self._compaction is asyncio.current_task():
+                self._compaction = None
+
+    def find(self, filter_dict=None, projection=None):
+        return MockCursor(self, filter_dict, projection=projection)
+
+    async def find_async(self, filter_dict=None, limit=None):
+        data = list((await self._load()).values())
+        if limit:
+            data = data[:limit]
+        return [dict(item) for item in data]
+
+    async def find_one(self, filter_dict, projection=None):
+        project = compile_projection(projection)
+        await self._load()
+        for _, item in self._find(filter_dict):
+            return project(item)
+        return None
+
+    def _plan_insert(self, documents):
+        records = [{'op': 'insert', 'key': self._next_key + i, 'doc': dict(to_document(document))}
+                   for i, document in enumerate(documents)]
+        return records, MockResult(inserted_ids=[document_id(record['doc']) for record in records])
+
+    def _plan_update(self, filter_dict, update_dict, upsert, multi):
+        update = compile_update(update_dict)
+        matches = self._find(filter_dict)
+        keys = [key for key, _ in (matches if multi else islice(matches, 1))]
+        if not keys:
+            if not upsert:
+                return [], MockResult()
+            new_doc = apply_update(filter_dict.copy(), update)
+            # Add a unique ID for the new document
+            new_doc['_id'] = str(uuid.uuid4())
+            record = {'op': 'insert', 'key': self._next_key, 'doc': new_doc}
+            return [record], MockResult(upserted_ids=[new_doc['_id']])
+
+        # The log gets the resulting field values, so replaying a record
+        # twice is harmless. Documents the update wouldn't change are
+        # matched but not rewritten.
+        records = []
+        for key in keys:
+            fields, removed = update(self._docs[key])
+            if fields or removed:
+                record = {'op': 'set', 'key': key, 'fields': fields}
+                if removed:
+                    record['unset'] = removed
+                records.append(record)
+        return records, MockResult(matched_count=len(keys), modified_count=len(records))
+
+    def _plan_delete(self, filter_dict, multi):
+        matches = self._find(filter_dict)
+        keys = [key for key, _ in (matches if multi else islice(matches, 1))]
+        return [{'op': 'delete', 'key': key} for key in keys], MockResult(deleted_count=len(keys))
+
+    def _plan_operation(self, operation):
+        if isinstance(operation, InsertOne):
+            return self._plan_insert([operation.document])
+        if isinstance(operation, UpdateOne):
+            return self._plan_update(operation.filter_dict, operation.update_dict,
+                                     operation.upsert, operation.multi)
+        if isinstance(operation, DeleteOne):
+            return self._plan_delete(operation.filter_dict, operation.multi)
+        raise TypeError(f"Unsupported bulk operation: {operation!r}")
+
+    async def _write(self, operations):
+        """Plan and commit operations in order, as one flush. Returns their results."""
+        async with self._write_lock():
+            results, durables = [], []
+            for operation in operations:
+                # Each plan sees the cache with the previous operations applied
+                records, result = self._plan_operation(operation)
+                durables.append(self._commit_many(records))
+                results.append(result)
+        await asyncio.gather(*durables)
+        return results
+
+    def _stage_transaction(self, operations, txn):
+        """Plan and apply a MockDB transaction's operations on this collection,
+        holding back their change events. The caller must hold the write lock.
+
+        Returns the records, their log lines and the results summed.
+        """
+        self._held_events = []
+        self._rollback_version = self._version
+        records, lines, results = [], [], []
+        for operation in operations:
+            planned, result = self._plan_operation(operation)
+            lines += self._stage(planned, txn)
+            records += planned
+            results.append(result)
+        return records, lines, merge_results(results)
+
+    async def _discard_transaction(self):
+        """Undo _stage_transaction() by dropping the cache, to be reread from disk."""
+        if self._held_events is None:
+            return
+        # Records queued by earlier writes are in the cache but maybe not
+        # on disk yet, so let them land before rereading
+        if self._flusher is not None:
+            await self._flusher
+        self._docs = None
+        self._version = self._rollback_version
+        self._held_events = None
+
+    def _publish_held(self):
+        events, self._held_events = self._held_events, None
+        if self._subscribers:
+            for event in events or ():
+                self._subscribers.publish(event)
+
+    async def _roll_forward(self):
+        """Complete this collection's part of transactions abandoned mid-commit.
+
+        A committing MockDB holds the write locks of all its collections
+        until the intent is removed, so an intent naming this collection
+        that is found under its lock belongs to a worker that died (or a
+        flush that failed). Records of it missing from the log are
+        committed now, numbered after the current version. The caller
+        must hold the write lock.
+        """
+        if self._intent_dir is None:
+            return
+        for path in intent_paths(self._intent_dir):
+            intent = await self._run(read_intent, path)
+            records = (intent or {}).get('collections', {}).get(self.name)
+            if not records:
+                continue
+            done = self._txns.get(intent['txn'], 0)
+            if done < len(records):
+                logger.warning("%s: completing transaction %s, abandoned mid-commit", self.name, intent['txn'])
+                await self._queue(self._stage(records[done:], intent['txn']))
+
+    async def insert_one(self, document):
+        await self._write([InsertOne(document)])
+        return None
+
+    async def insert_many(self, documents):
+        # Planned as one batch, so the indexes are updated once for all of them
+        async with self._write_lock():
+            records, result = self._plan_insert(documents)
+            durable = self._commit_many(records)
+        await durable
+        return result
+
+    async def update_one(self, filter_dict, update_dict, upsert=False):
+        (result,) = await self._write([UpdateOne(filter_dict, update_dict, upsert)])
+        # Routes read modified_count as "found", so a match counts even if nothing changed
+        result.modified_count = 1 if result.matched_count or result.upserted_ids else 0
+        return result
+
+    async def update_many(self, filter_dict, update_dict, upsert=False):
+        (result,) = await self._write([UpdateMany(filter_dict, update_dict, upsert)])
+        return result
+
+    async def find_one_and_update(self, filter_dict, update_dict, projection=None, upsert=False,
+                                  return_document=ReturnDocument.BEFORE):
+        """Update the first document matching filter_dict and return it.
+
+        Returns the document as it was before the update, or with
+        return_document=ReturnDocument.AFTER as it is after, or None if
+        nothing matched (and nothing was upserted). The read and the write
+        happen under one lock, so no other write lands between them.
+        """
+        async with self._write_lock():
+            match = next(self._find(filter_dict), None)
+            records, _ = self._plan_update(filter_dict, update_dict, upsert, False)
+            durable = self._commit_many(records)
+            if return_document:
+                # Documents are replaced, never mutated, so this stays as committed
+                if records:
+                    key = records[0]['key']
+                else:
+                    key = match[0] if match else None
+                doc = None if key is None else self._docs.get(key)
+            else:
+                doc = match[1] if match else None
+        await durable
+        return None if doc is None else compile_projection(projection)(doc)
+
+    async def delete_one(self, filter_dict):
+        (result,) = await self._write([DeleteOne(filter_dict)])
+        return result
+
+    async def delete_many(self, filter_dict):
+        (result,) = await self._write([DeleteMany(filter_dict)])
+        return result
+
+    async def bulk_write(self, operations):
+        """Apply InsertOne, UpdateOne, UpdateMany, DeleteOne and DeleteMany operations in order.
+
+        Every operation sees the ones before it, and all of them reach disk
+        in one flush. Returns their counts summed.
+        """
+        return merge_results(await self._write(operations))
+
+    async def count_documents(self, filter_dict=None):
+        docs = await self._load()
+        if filter_dict is None or not filter_dict:
+            return len(docs)
+        if len(filter_dict) == 1:
+            # A hash bucket holds exactly the documents equal to its value
+            (field, value), = filter_dict.items()
+            index = self._indexes.get(field)
+            if index is not None and not is_operator_dict(value):
+                try:
+                    return len(index.get(value, ()))
+                except TypeError:
+                    pass
+        return sum(1 for _ in self._find(filter_dict))
+
+    async def counters(self):
+        """Return the current value of every counter, by name."""
+        await self._load()
+        return {name: counter['count'] for name, counter in self._counters.items()}
+
+    async def check_counters(self):
+        """Recount every counter from scratch.
+
+        Returns {name: (maintained, recounted)} for the counters that
+        disagree, so an empty dict means they are all correct.
+        """
+        docs = await self._load()
+        mismatches = {}
+        for name, counter in self._counters.items():
+            match = compile_filter(counter['filter'])
+            recounted = sum(1 for doc in docs.values() if match(doc))
+            if recounted != counter['count']:
+                mismatches[name] = (counter['count'], recounted)
+        return mismatches
+
+    async def changes_since(self, since, filter_dict=None, projection=None, epoch=None):
+        """Return what changed after version since, as seen through filter_dict.
+
+        Returns (documents, deleted, version): copies of the documents
+        written after since that match filter_dict, the ids of documents
+        deleted after it or written so that they no longer match, and the
+        version this brings a client up to. Returns None if since is older
+        than the deletions still remembered, or from another history than
+        epoch, if given, and the client has to refetch everything.
+        """
+        docs = await self._load()
+        if epoch is not None and epoch != self._epoch:
+            return None
+        if not self._sync_floor <= since <= self._version:
+            return None
+        match = compile_filter(filter_dict)
+        project = compile_projection(projection)
+        changed = []
+        for key, version in reversed(self._doc_versions.items()):
+            if version <= since:
+                break
+            changed.append(docs[key])
+        changed.reverse()
+        matched = [doc for doc in changed if match(doc)]
+        live = {doc.get('id') for doc in matched}
+        # Documents that stopped matching are gone as far as the client knows
+        deleted = dict.fromkeys(doc['id'] for doc in changed
+                                if doc.get('id') is not None and doc['id'] not in live)
+        for version, doc_id in reversed(self._tombstones):
+            if version <= since:
+                break
+            # A document deleted and then written again under the same id is live
+            if doc_id not in live:
+                deleted[doc_id] = None
+        return [project(doc) for doc in matched], list(deleted), self._version
+
+    async def get_version(self):
+        """Return the collection's version, which every change increments."""
+        await self._load()
+        return self._version
+
+    async def get_epoch_and_version(self):
+        """Return (epoch, version): the version along with the history it
+        counts in. Versions of different epochs are unrelated."""
+        await self._load()
+        return self._epoch, self._version
+
+    def subscribe(self, callback):
+        """Call callback(event) with a ChangeEvent for every change applied.
+
+        Returns a function that cancels the subscription.
+        """
+        return self._subscribers.add(callback)
+
+    def watch(self, max_queue=WATCH_QUEUE_SIZE):
+        """Return a ChangeStream of this collection's changes from now on."""
+        return ChangeStream(self, max_queue)
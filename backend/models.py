@@ -152,11 +152,11 @@ class TestimonialUpdate(BaseModel):
     approved: Optional[bool] = None
 
 # Blog Models
-class BlogPost(BaseModel):
+# A blog post without its content, for list views
+class BlogPostSummary(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     title: str
     excerpt: str
-    content: str
     image: str
     category: str
     tags: List[str]
@@ -166,6 +166,9 @@ class BlogPost(BaseModel):
     read_time: str
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
+class BlogPost(BlogPostSummary):
+    content: str
+
 class BlogPostCreate(BaseModel):
     title: str
     excerpt: str
@@ -0,0 +1,100 @@
+"""Cursor pagination for the list routes.
+
+A page is at most `limit` documents in the route's sort order. The response
+carries the number of documents matching the route's filter in
+X-Total-Count and, if more follow, an opaque token in X-Next-Cursor. Pass
+that token back as `cursor` for the next page. It encodes the last
+document's sort key values, so the next page starts there through the
+ordered index instead of skipping everything before it.
+"""
+import base64
+import binascii
+import json
+from typing import Optional
+
+from fastapi import HTTPException, Query, Response
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+# Oldest first, the order documents were created in; id settles ties
+CREATED_ORDER = [("created_at", 1), ("id", 1)]
+NEWEST_FIRST = [("created_at", -1), ("id", -1)]
+# Search hits: best score first, then collection and id
+SEARCH_ORDER = [("score", -1), ("collection", 1), ("id", 1)]
+
+def encode_cursor(values):
+    data = json.dumps(values, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(data).decode().rstrip('=')
+
+def decode_cursor(token, sort_keys):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        values = None
+    if not isinstance(values, list) or len(values) != len(sort_keys):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
+
+class PageParams:
+    """Query parameters of a paginated list route, for use with Depends()."""
+
+    def __init__(
+        self,
+        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+        cursor: Optional[str] = None,
+    ):
+        self.limit = limit
+        self.cursor = cursor
+
+async def paginate(collection, response: Response, page: PageParams, filter_dict=None,
+                   sort_keys=CREATED_ORDER, projection=None):
+    """Return one page of collection and set the pagination headers on response."""
+    query = collection.find(filter_dict, projection).sort(sort_keys)
+    if page.cursor:
+        query = query.after(decode_cursor(page.cursor, sort_keys))
+    # One extra document tells whether another page follows
+    docs = await query.limit(page.limit + 1).to_list()
+    response.headers["X-Total-Count"] = str(await collection.count_documents(filter_dict or {}))
+    if len(docs) > page.limit:
+        docs = docs[:page.limit]
+        response.headers["X-Next-Cursor"] = encode_cursor([docs[-1].get(field) for field, _ in sort_keys])
+    return docs
+
+async def paginate_search(index, query, response: Response, page: PageParams):
+    """Return one page of (score, collection, id) hits from a SearchIndex and
+    set the pagination headers on response."""
+    after = None
+    if page.cursor:
+        after = decode_cursor(page.cursor, SEARCH_ORDER)
+        score, collection, _ = after
+        if not isinstance(score, (int, float)) or isinstance(score, bool) or not isinstance(collection, str):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    # One extra hit tells whether another page follows
+    hits, total = await index.search(query, page.limit + 1, after)
+    response.headers["X-Total-Count"] = str(total)
+    if len(hits) > page.limit:
+        hits = hits[:page.limit]
+        response.headers["X-Next-Cursor"] = encode_cursor(list(hits[-1]))
+    return hits
+
+async def paginate_facets(index, collection, response: Response, page: PageParams, selection,
+                          filter_dict=None, projection=None):
+    """Return one page of collection's documents matching selection through
+    a FacetIndex, in CREATED_ORDER, and set the pagination headers on response."""
+    after = None
+    if page.cursor:
+        after = decode_cursor(page.cursor, CREATED_ORDER)
+        if not all(isinstance(value, str) for value in after):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    # One extra document tells whether another page follows
+    keys, total = await index.select(collection.name, selection, page.limit + 1, after)
+    response.headers["X-Total-Count"] = str(total)
+    if len(keys) > page.limit:
+        keys = keys[:page.limit]
+        response.headers["X-Next-Cursor"] = encode_cursor(list(keys[-1]))
+    id_filter = {"id": {"$in": [doc_id for _, doc_id in keys]}}
+    found = await collection.find({**filter_dict, **id_filter} if filter_dict else id_filter, projection).to_list()
+    by_id = {doc["id"]: doc for doc in found}
+    # A document deleted since the index last refreshed is left out
+    return [by_id[doc_id] for _, doc_id in keys if doc_id in by_id]
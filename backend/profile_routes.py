@@ -2,6 +2,7 @@ from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel
 from typing import Optional
 from auth import get_current_admin
+from mock_db import ReturnDocument
 # MongoDB import removed - using mock database
 import os
 from dotenv import load_dotenv
@@ -90,16 +91,14 @@ async def get_profile(current_admin: dict = Depends(get_current_admin)):
 async def update_profile(profile_data: ProfileData, current_admin: dict = Depends(get_current_admin)):
     update_data = profile_data.dict()
     
-    # Update profile in database
-    result = await db.profiles.update_one(
+    # Update (or create) the profile and read it back in one operation
+    profile = await db.profiles.find_one_and_update(
         {"admin_id": current_admin["id"]},
         {"$set": update_data},
-        upsert=True
+        upsert=True,
+        return_document=ReturnDocument.AFTER
     )
     
-    # Get updated profile
-    profile = await db.profiles.find_one({"admin_id": current_admin["id"]})
-    
     # Return in format expected by frontend
     return {
         "admin": {
@@ -1,7 +1,13 @@
-from fastapi import APIRouter, HTTPException
-from typing import List
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from typing import List, Optional
 from models import *
-from datetime import datetime
+from conditional import versioned
+from facets import FACET_COLLECTIONS
+from pagination import CREATED_ORDER, PageParams, paginate, paginate_facets, paginate_search
+from sync import SYNC_COLLECTIONS, collect_changes
 # MongoDB import removed - using mock database
 import os
 from dotenv import load_dotenv
@@ -11,42 +17,93 @@ from pathlib import Path
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# Database will be injected from server.py
+# Database, search and facet indexes will be injected from server.py
 db = None
+search_index = None
+facet_index = None
+
+# Search results come in the shape of their list route: projection and model
+SEARCH_RESULTS = {"blogs": ({"content": 0}, BlogPostSummary), "projects": (None, Project)}
 
 public_router = APIRouter(prefix="/api", tags=["public"])
 
 # Public Routes for Frontend
 @public_router.get("/services", response_model=List[Service])
-async def get_public_services():
-    services = await db.services.find({"active": True}).to_list()
+@versioned("services")
+async def get_public_services(response: Response, page: PageParams = Depends()):
+    services = await paginate(db.services, response, page, {"active": True})
     return [Service(**service) for service in services]
 
 @public_router.get("/projects", response_model=List[Project])
-async def get_public_projects():
-    projects = await db.projects.find().to_list()
+@versioned("projects")
+async def get_public_projects(response: Response, page: PageParams = Depends(),
+                              tag: Optional[List[str]] = Query(None), category: Optional[str] = None,
+                              technology: Optional[List[str]] = Query(None)):
+    # Each tag, category and technology given narrows the list; the facet index answers them
+    selection = {"tags": tag, "category": category, "technologies": technology}
+    if any(selection.values()):
+        projects = await paginate_facets(facet_index, db.projects, response, page, selection)
+    else:
+        projects = await paginate(db.projects, response, page)
     return [Project(**project) for project in projects]
 
 @public_router.get("/testimonials", response_model=List[Testimonial])
-async def get_public_testimonials():
-    testimonials = await db.testimonials.find({"approved": True}).to_list()
+@versioned("testimonials")
+async def get_public_testimonials(response: Response, page: PageParams = Depends()):
+    testimonials = await paginate(db.testimonials, response, page, {"approved": True})
     return [Testimonial(**testimonial) for testimonial in testimonials]
 
-@public_router.get("/blogs", response_model=List[BlogPost])
-async def get_public_blogs():
-    blogs = await db.blogs.find({"published": True}).to_list()
-    return [BlogPost(**blog) for blog in blogs]
+@public_router.get("/blogs", response_model=List[BlogPostSummary])
+@versioned("blogs")
+async def get_public_blogs(response: Response, page: PageParams = Depends(),
+                           tag: Optional[List[str]] = Query(None), category: Optional[str] = None):
+    # The list leaves out content, the bulk of each post; /blogs/{blog_id} has it
+    selection = {"tags": tag, "category": category}
+    if any(selection.values()):
+        blogs = await paginate_facets(facet_index, db.blogs, response, page, selection,
+                                      {"published": True}, projection={"content": 0})
+    else:
+        blogs = await paginate(db.blogs, response, page, {"published": True}, projection={"content": 0})
+    return [BlogPostSummary(**blog) for blog in blogs]
 
 @public_router.get("/blogs/{blog_id}", response_model=BlogPost)
+@versioned("blogs")
 async def get_blog_by_id(blog_id: str):
     blog = await db.blogs.find_one({"id": blog_id, "published": True})
     if not blog:
         raise HTTPException(status_code=404, detail="Blog not found")
     return BlogPost(**blog)
 
+@public_router.get("/changes")
+@versioned(*SYNC_COLLECTIONS)
+async def get_changes(since: Optional[str] = None):
+    """Services, projects, testimonials, blogs and offers changed since a version token"""
+    return await collect_changes(db, since)
+
+@public_router.get("/facets")
+@versioned(*FACET_COLLECTIONS)
+async def get_facets():
+    """Project and blog tags, categories and technologies, each with its number of documents"""
+    return await facet_index.counts()
+
+@public_router.get("/search")
+@versioned(*SEARCH_RESULTS)
+async def search(q: str, response: Response, page: PageParams = Depends()):
+    """Published blogs and projects matching q, best match first"""
+    hits = await paginate_search(search_index, q, response, page)
+    documents = {}
+    for name, (projection, _) in SEARCH_RESULTS.items():
+        ids = [doc_id for _, hit_name, doc_id in hits if hit_name == name]
+        if ids:
+            for doc in await db.get_collection(name).find({"id": {"$in": ids}}, projection).to_list():
+                documents[name, doc["id"]] = doc
+    # A hit deleted since the index last refreshed is left out
+    return [{"collection": name, "score": score, "document": SEARCH_RESULTS[name][1](**documents[name, doc_id])}
+            for score, name, doc_id in hits if (name, doc_id) in documents]
+
 @public_router.get("/contacts", response_model=List[ContactInquiry])
-async def get_contacts():
-    contacts = await db.contacts.find().to_list()
+async def get_contacts(response: Response, page: PageParams = Depends()):
+    contacts = await paginate(db.contacts, response, page)
     return [ContactInquiry(**contact) for contact in contacts]
 
 @public_router.post("/contact", response_model=ContactInquiry)
@@ -57,6 +114,7 @@ async def submit_contact(contact_data: ContactCreate):
 
 # Public Profile/Contact Info API
 @public_router.get("/profile")
+@versioned("admins", "profiles")
 async def get_public_profile():
     try:
         # Get the most recent admin's profile (latest created/updated)
@@ -131,6 +189,7 @@ async def get_public_profile():
 
 # Public Media API
 @public_router.get("/media")
+@versioned("media_settings")
 async def get_media_settings():
     """Get public media settings"""
     try:
@@ -163,6 +222,7 @@ async def get_media_settings():
 # Enhanced Public Endpoints for New Features
 
 @public_router.get("/media-settings")
+@versioned("media_settings")
 async def get_public_media_settings():
     """Get public media settings with gallery"""
     try:
@@ -184,6 +244,7 @@ async def get_public_media_settings():
         )
 
 @public_router.get("/hero-section")
+@versioned("hero_section")
 async def get_public_hero_section():
     """Get public hero section data"""
     try:
@@ -201,6 +262,7 @@ async def get_public_hero_section():
         )
 
 @public_router.get("/site-settings")
+@versioned("site_settings")
 async def get_public_site_settings():
     """Get public site settings"""
     try:
@@ -235,49 +297,12 @@ async def get_public_site_settings():
         )
 
 @public_router.get("/offers/active")
+@versioned("offers", extra=lambda db: db.active_offers.next_change())
 async def get_active_offers():
     """Get currently active offers"""
     try:
-        # Get current time
-        now = datetime.utcnow()
-        
-        # Get all active offers (MockDB compatible)
-        all_offers = await db.offers.find({"active": True}).to_list()
-        
-        # Filter by time range in Python (MockDB compatible)
-        active_offers = []
-        for offer in all_offers:
-            # Parse datetime strings if they exist
-            starts_at = None
-            ends_at = None
-            
-            if offer.get('starts_at'):
-                if isinstance(offer['starts_at'], str):
-                    try:
-                        starts_at = datetime.fromisoformat(offer['starts_at'].replace('Z', '+00:00'))
-                    except:
-                        starts_at = None
-                else:
-                    starts_at = offer['starts_at']
-            
-            if offer.get('ends_at'):
-                if isinstance(offer['ends_at'], str):
-                    try:
-                        ends_at = datetime.fromisoformat(offer['ends_at'].replace('Z', '+00:00'))
-                    except:
-                        ends_at = None
-                else:
-                    ends_at = offer['ends_at']
-            
-            # Check if offer is within time range
-            is_active = True
-            if starts_at and now < starts_at:
-                is_active = False
-            if ends_at and now > ends_at:
-                is_active = False
-                
-            if is_active:
-                active_offers.append(offer)
+        # Kept current by storage as offers start and end, so no per-offer checks here
+        active_offers = await db.active_offers.current()
         
         # Sort by priority (higher priority first)
         active_offers.sort(key=lambda x: x.get('priority', 1), reverse=True)
@@ -290,6 +315,7 @@ async def get_active_offers():
         )
 
 @public_router.get("/offers")
+@versioned("offers")
 async def get_public_offers():
     """Get all public offers (for display purposes)"""
     try:
@@ -301,4 +327,78 @@ async def get_public_offers():
         raise HTTPException(
             status_code=500,
             detail=f"Failed to fetch offers: {str(e)}"
-        )
\ No newline at end of file
+        )
+
+# Landing page data in one response
+
+async def get_bootstrap_services():
+    services = await db.services.find({"active": True}).sort(CREATED_ORDER).to_list()
+    return [Service(**service) for service in services]
+
+async def get_bootstrap_testimonials():
+    testimonials = await db.testimonials.find({"approved": True}).sort(CREATED_ORDER).to_list()
+    return [Testimonial(**testimonial) for testimonial in testimonials]
+
+# Each section with the collections it's read from and what reads it
+BOOTSTRAP_SECTIONS = {
+    "site_settings": (("site_settings",), get_public_site_settings),
+    "hero_section": (("hero_section",), get_public_hero_section),
+    "media_settings": (("media_settings",), get_public_media_settings),
+    "profile": (("admins", "profiles"), get_public_profile),
+    "offers": (("offers",), get_active_offers),
+    "services": (("services",), get_bootstrap_services),
+    "testimonials": (("testimonials",), get_bootstrap_testimonials),
+}
+
+def to_json(value):
+    # Pydantic's own serializer is far quicker on models than jsonable_encoder
+    if isinstance(value, list):
+        return [to_json(item) for item in value]
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    return jsonable_encoder(value)
+
+def select_fields(value, fields):
+    """Keep only fields of a section's dict, or of each dict in its list."""
+    if isinstance(value, list):
+        return [select_fields(item, fields) for item in value]
+    if isinstance(value, dict):
+        return {field: value[field] for field in fields if field in value}
+    return value
+
+def bootstrap_collections(names=BOOTSTRAP_SECTIONS):
+    """Return the collections the named sections are read from."""
+    return list(dict.fromkeys(name for section in names for name in BOOTSTRAP_SECTIONS[section][0]))
+
+async def collect_bootstrap(names, selected=None):
+    """Return {section: JSON-ready data} for the named sections, read
+    concurrently and trimmed to the fields selected for each, if any."""
+    selected = selected or {}
+    results = await asyncio.gather(*(BOOTSTRAP_SECTIONS[name][1]() for name in names))
+    payload = {}
+    for name, result in zip(names, results):
+        result = to_json(result)
+        payload[name] = select_fields(result, selected[name]) if name in selected else result
+    return payload
+
+@public_router.get("/bootstrap")
+@versioned(*bootstrap_collections(), extra=lambda db: db.active_offers.next_change())
+async def get_bootstrap(sections: Optional[str] = None, fields: Optional[str] = None):
+    """What the landing page needs on first paint, in one response.
+
+    sections picks some of BOOTSTRAP_SECTIONS, comma-separated; all by
+    default. fields, as comma-separated section.field names, trims the
+    sections it names to those fields.
+    """
+    names = [name.strip() for name in sections.split(',') if name.strip()] if sections else list(BOOTSTRAP_SECTIONS)
+    selected = {}
+    for item in (fields.split(',') if fields else []):
+        section, _, field = item.strip().partition('.')
+        if not field:
+            raise HTTPException(status_code=400, detail=f"Expected section.field, got {item.strip()!r}")
+        selected.setdefault(section, []).append(field)
+    unknown = (set(names) | set(selected)) - BOOTSTRAP_SECTIONS.keys()
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown section: {', '.join(sorted(unknown))}")
+    # Already JSON-ready, so skip FastAPI encoding it all over again
+    return JSONResponse(await collect_bootstrap(names, selected))
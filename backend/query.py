@@ -0,0 +1,394 @@
+"""MongoDB-style filters compiled to Python predicates.
+
+Supported: equality ({"f": v} or {"f": {"$eq": v}}), $ne, $gt, $gte, $lt,
+$lte, $in, $nin, $exists, $and, $or, and dotted paths into nested
+documents and lists ("author.name", "tags.0"). A missing field equals
+nothing, not even None, and $ne and $nin match it. Only scalars are
+ordered, and ordering comparisons between values that Python can't order
+(a string and a number, say) are false.
+
+A filter is split into its shape (its structure with the values taken
+out) and its values. Each shape is compiled to Python source once and
+cached, so queries that differ only in their values skip both the parse
+and the compile.
+
+sort_value() orders values of any type the way SQLite does, for sort().
+keyset_filter() turns "documents after this one in sort order" into a
+filter, for paginating with a cursor instead of a growing skip.
+
+Projections pick top-level fields to return: {"content": 0} drops
+content, {"id": 1, "title": 1} keeps only id and title. Mixing the two
+styles is an error.
+
+Updates: $set, $unset, $inc, $push and $addToSet (one value or
+{"$each": [...]}), $pull (a value, or a condition such as {"$lt": 3}) and
+$bit ({"and" | "or" | "xor": n}, which also flips booleans with
+{"xor": True}). Apart from $set they take top-level fields only, and a
+field can appear under one operator only. compile_update() turns an
+update into the top-level fields it changes, so storage writes just those.
+"""
+import json
+from functools import lru_cache
+
+MISSING = object()
+
+COMPARISONS = {'$gt': '>', '$gte': '>=', '$lt': '<', '$lte': '<='}
+FIELD_OPERATORS = {'$eq', '$ne', '$in', '$nin', '$exists', *COMPARISONS}
+UPDATE_OPERATORS = ('$set', '$unset', '$inc', '$push', '$addToSet', '$pull', '$bit')
+BITWISE = {'and': lambda x, y: x & y, 'or': lambda x, y: x | y, 'xor': lambda x, y: x ^ y}
+
+class QueryError(ValueError):
+    """A filter or update uses an unsupported operator or a malformed operand."""
+
+def is_operator_dict(value):
+    """True if value is a {"$op": operand} condition rather than a literal to match."""
+    return isinstance(value, dict) and bool(value) and all(str(key).startswith('$') for key in value)
+
+def field_conditions(value):
+    """Return a field's condition as a dict of operators."""
+    return value if is_operator_dict(value) else {'$eq': value}
+
+def lookup(doc, parts):
+    """Follow a dotted path through nested dicts and lists."""
+    for part in parts:
+        if isinstance(doc, dict):
+            doc = doc.get(part, MISSING)
+        elif isinstance(doc, list) and part.isdigit() and int(part) < len(doc):
+            doc = doc[int(part)]
+        else:
+            return MISSING
+        if doc is MISSING:
+            break
+    return doc
+
+def _compare(op):
+    def compare(x, y):
+        if isinstance(x, (dict, list)) or isinstance(y, (dict, list)):
+            return False
+        try:
+            return op(x, y)
+        except TypeError:
+            return False
+    return compare
+
+def _contains(values, x):
+    try:
+        return x in values
+    except TypeError:  # An unhashable field value against a set of operands
+        return any(x == value for value in values)
+
+_helpers = {
+    'M': MISSING,
+    'lookup': lookup,
+    'contains': _contains,
+    '$gt': _compare(lambda x, y: x > y),
+    '$gte': _compare(lambda x, y: x >= y),
+    '$lt': _compare(lambda x, y: x < y),
+    '$lte': _compare(lambda x, y: x <= y),
+}
+
+def split_filter(filter_dict):
+    """Return (shape, values) for a filter. The shape is hashable."""
+    values = []
+
+    def operand(op, value):
+        if op in ('$in', '$nin'):
+            if not isinstance(value, (list, tuple, set, frozenset)):
+                raise QueryError(f"{op} needs a list, got {value!r}")
+            try:
+                value = frozenset(value)
+            except TypeError:
+                value = tuple(value)
+        values.append(value)
+        return len(values) - 1
+
+    def walk(node):
+        if not isinstance(node, dict):
+            raise QueryError(f"Filter must be a dict, got {node!r}")
+        shape = []
+        for key, value in node.items():
+            if key in ('$and', '$or'):
+                if not isinstance(value, (list, tuple)):
+                    raise QueryError(f"{key} needs a list of filters")
+                shape.append((key, tuple(walk(sub) for sub in value)))
+            elif key.startswith('$'):
+                raise QueryError(f"Unsupported operator {key}")
+            else:
+                conditions = []
+                for op, arg in field_conditions(value).items():
+                    if op not in FIELD_OPERATORS:
+                        raise QueryError(f"Unsupported operator {op} on {key}")
+                    # $exists is part of the shape: it picks the code, not a value
+                    conditions.append((op, bool(arg) if op == '$exists' else operand(op, arg)))
+                shape.append((key, tuple(conditions)))
+        return tuple(shape)
+
+    return walk(filter_dict), values
+
+def filter_fields(filter_dict):
+    """Return the top-level fields a filter reads."""
+    fields = set()
+    for key, value in (filter_dict or {}).items():
+        if key in ('$and', '$or'):
+            for sub in value:
+                fields |= filter_fields(sub)
+        else:
+            fields.add(key.split('.')[0])
+    return fields
+
+def _condition_source(op, arg):
+    if op == '$exists':
+        return 'x is not M' if arg else 'x is M'
+    if op == '$eq':
+        return f'x is not M and x == v[{arg}]'
+    if op == '$ne':
+        return f'(x is M or x != v[{arg}])'
+    if op == '$in':
+        return f'x is not M and contains(v[{arg}], x)'
+    if op == '$nin':
+        return f'(x is M or not contains(v[{arg}], x))'
+    return f'x is not M and H[{op!r}](x, v[{arg}])'
+
+@lru_cache(maxsize=512)
+def compile_shape(shape):
+    """Compile a filter shape to a function of (document, values)."""
+    functions = []
+
+    def emit(node):
+        # Every dict in the filter becomes one function; $and/$or call the nested ones
+        name = f'f{len(functions)}'
+        functions.append(None)
+        body = []
+        for key, conditions in node:
+            if key in ('$and', '$or'):
+                calls = [f'{emit(sub)}(doc, v)' for sub in conditions]
+                joined = (' and ' if key == '$and' else ' or ').join(calls) or str(key == '$and')
+                body.append(f'    if not ({joined}): return False')
+                continue
+            parts = key.split('.')
+            if len(parts) == 1:
+                body.append(f'    x = doc.get({key!r}, M)')
+            else:
+                body.append(f'    x = lookup(doc, {tuple(parts)!r})')
+            test = ' and '.join(_condition_source(op, arg) for op, arg in conditions) or 'True'
+            body.append(f'    if not ({test}): return False')
+        body.append('    return True')
+        functions[int(name[1:])] = f'def {name}(doc, v):\n' + '\n'.join(body)
+        return name
+
+    emit(shape)
+    namespace = dict(_helpers, H=_helpers)
+    exec('\n\n'.join(functions), namespace)
+    return namespace['f0']
+
+def compile_filter(filter_dict):
+    """Return a predicate taking a document, True if it matches filter_dict."""
+    filter_dict = filter_dict or {}
+    if any(isinstance(value, dict) or key.startswith('$') for key, value in filter_dict.items()):
+        shape, values = split_filter(filter_dict)
+    else:
+        # Plain equality on every field, the common case: skip the walk
+        shape = tuple((key, (('$eq', i),)) for i, key in enumerate(filter_dict))
+        values = list(filter_dict.values())
+    function = compile_shape(shape)
+    return lambda doc: function(doc, values)
+
+def split_projection(projection):
+    """Return (include, fields) for a projection, or None to keep every field."""
+    if not projection:
+        return None
+    if not isinstance(projection, dict):
+        raise QueryError(f"Projection must be a dict, got {projection!r}")
+    modes = set()
+    for field, flag in projection.items():
+        if not isinstance(field, str) or not field or field.startswith('$') or '.' in field:
+            raise QueryError(f"Projection fields must be top-level field names, got {field!r}")
+        modes.add(bool(flag))
+    if len(modes) > 1:
+        raise QueryError("A projection can't mix included and excluded fields")
+    return modes.pop(), tuple(projection)
+
+@lru_cache(maxsize=128)
+def _projector(include, fields):
+    if include:
+        return lambda doc: {field: doc[field] for field in fields if field in doc}
+    excluded = frozenset(fields)
+    # Excluded values are never touched, let alone copied
+    return lambda doc: {key: value for key, value in doc.items() if key not in excluded}
+
+def compile_projection(projection):
+    """Return a function making a projected copy of a document."""
+    split = split_projection(projection)
+    return dict if split is None else _projector(*split)
+
+def sort_value(value):
+    """Return a key ordering field values as SQLite does: missing and None
+    first, then numbers (booleans as 0 and 1), then strings. Lists and
+    objects sort among the strings as their JSON text."""
+    if value is None or value is MISSING:
+        return (0, 0)
+    if isinstance(value, (int, float)):
+        return (1, value)
+    if isinstance(value, str):
+        return (2, value)
+    return (2, json.dumps(value, ensure_ascii=False, separators=(',', ':')))
+
+def keyset_filter(sort_keys, values):
+    """Return a filter matching the documents that sort strictly after values.
+
+    values holds one value per sort key, taken from the last document of
+    the previous page. The sort keys should end with a unique field (id)
+    so that no two documents share a position.
+    """
+    if not sort_keys or len(values) != len(sort_keys):
+        raise QueryError("A keyset needs one value per sort key")
+    branches = []
+    for i, (field, order) in enumerate(sort_keys):
+        # Equal on every earlier key, past this one
+        branch = {earlier: {'$eq': value} for (earlier, _), value in zip(sort_keys[:i], values)}
+        branch[field] = {'$lt' if order == -1 else '$gt': values[i]}
+        branches.append(branch)
+    first, order = sort_keys[0]
+    # The bound on the first key alone is redundant, but an ordered index can use it
+    return {first: {'$lte' if order == -1 else '$gte': values[0]}, '$or': branches}
+
+def merge_filters(filter_dict, extra):
+    """Return a filter matching both filter_dict and extra."""
+    if not filter_dict:
+        return extra
+    if filter_dict.keys() & extra.keys():
+        return {'$and': [filter_dict, extra]}
+    return {**filter_dict, **extra}
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+def _each(operand):
+    # $push and $addToSet take one value, or several as {"$each": [...]}
+    if isinstance(operand, dict) and list(operand) == ['$each']:
+        if not isinstance(operand['$each'], list):
+            raise QueryError(f"$each needs a list, got {operand['$each']!r}")
+        return operand['$each']
+    return [operand]
+
+def _array(doc, field, op):
+    value = doc.get(field, [])
+    if not isinstance(value, list):
+        raise QueryError(f"{op} needs {field} to be a list, got {value!r}")
+    return value
+
+def _puller(operand):
+    if is_operator_dict(operand):
+        match = compile_filter({'x': operand})
+        return lambda item: match({'x': item})
+    return lambda item: item == operand
+
+def _validate_update(update_dict):
+    if not isinstance(update_dict, dict):
+        raise QueryError(f"Update must be a dict, got {update_dict!r}")
+    seen = set()
+    for op, spec in update_dict.items():
+        if op not in UPDATE_OPERATORS:
+            raise QueryError(f"Unsupported update operator {op}")
+        if not isinstance(spec, dict):
+            raise QueryError(f"{op} needs a dict of fields, got {spec!r}")
+        for field, operand in spec.items():
+            if not isinstance(field, str) or not field or field.startswith('$'):
+                raise QueryError(f"Invalid field {field!r} in {op}")
+            if op != '$set' and '.' in field:
+                raise QueryError(f"{op} takes top-level fields only, got {field!r}")
+            if field in seen:
+                raise QueryError(f"Conflicting updates to {field}")
+            seen.add(field)
+            if op == '$inc' and not _is_number(operand):
+                raise QueryError(f"$inc needs a number, got {operand!r}")
+            if op == '$bit' and (not isinstance(operand, dict) or len(operand) != 1
+                                 or next(iter(operand)) not in BITWISE
+                                 or not isinstance(next(iter(operand.values())), int)):
+                raise QueryError(f"$bit needs one of and, or, xor with an integer, got {operand!r}")
+
+# Each returns a function computing a field's new value from the document,
+# or MISSING to leave the field alone. Array operators build new lists, so
+# cached documents are never mutated.
+
+def _inc(field, amount):
+    def compute(doc):
+        value = doc.get(field, 0)
+        if not _is_number(value):
+            raise QueryError(f"$inc needs {field} to be a number, got {value!r}")
+        return value + amount
+    return compute
+
+def _bit(field, operand):
+    (name, mask), = operand.items()
+    operation = BITWISE[name]
+    default = False if isinstance(mask, bool) else 0
+
+    def compute(doc):
+        value = doc.get(field, default)
+        if not isinstance(value, int):
+            raise QueryError(f"$bit needs {field} to be an integer, got {value!r}")
+        return operation(value, mask)
+    return compute
+
+def _push(field, operand):
+    items = _each(operand)
+    return lambda doc: _array(doc, field, '$push') + items
+
+def _add_to_set(field, operand):
+    def compute(doc):
+        items = list(_array(doc, field, '$addToSet'))
+        for item in _each(operand):
+            if item not in items:
+                items.append(item)
+        return items
+    return compute
+
+def _pull(field, operand):
+    match = _puller(operand)
+
+    def compute(doc):
+        if field not in doc:
+            return MISSING
+        return [item for item in _array(doc, field, '$pull') if not match(item)]
+    return compute
+
+_COMPUTED = {'$inc': _inc, '$bit': _bit, '$push': _push, '$addToSet': _add_to_set, '$pull': _pull}
+
+def compile_update(update_dict):
+    """Return a function computing what update_dict does to a document.
+
+    The function returns (fields, removed): the new value of each top-level
+    field the update changes, and the fields it deletes. It leaves the
+    document untouched, and fields that would keep their value appear in
+    neither, so an update that changes nothing returns two empty results.
+    """
+    _validate_update(update_dict)
+    sets = list(update_dict.get('$set', {}).items())
+    computed = [(field, _COMPUTED[op](field, operand))
+                for op, spec in update_dict.items() if op in _COMPUTED
+                for field, operand in spec.items()]
+    unset = list(update_dict.get('$unset', {}))
+
+    def update(doc):
+        fields = {}
+        for field, value in sets:
+            old = doc.get(field, MISSING)
+            # True == 1, but they are stored differently
+            if old is MISSING or old != value or type(old) is not type(value):
+                fields[field] = value
+        for field, compute in computed:
+            value = compute(doc)
+            old = doc.get(field, MISSING)
+            if value is not MISSING and (old is MISSING or old != value or type(old) is not type(value)):
+                fields[field] = value
+        return fields, [field for field in unset if field in doc]
+    return update
+
+def apply_update(doc, update):
+    """Return a copy of doc with update, from compile_update(), applied."""
+    fields, removed = update(doc)
+    doc = {**doc, **fields}
+    for field in removed:
+        doc.pop(field, None)
+    return doc
@@ -0,0 +1,243 @@
+"""Time-bounded documents and short-lived records, kept current by a min-heap.
+
+Schedule is a min-heap of keys ordered by the instant each is next due.
+Rescheduling or cancelling a key leaves its old heap entry in place; it is
+skipped when it reaches the top. Popping what is due costs O(log n) per
+key, and nothing is looked at before its instant.
+
+EffectiveView keeps the documents of a collection that are in effect now:
+those matching a filter whose start field is unset or past and whose end
+field is unset or not yet past. Bounds are ISO 8601 timestamps, with or
+without an offset, or dates. Each document is placed once, when it is read
+or changed: its bounds are parsed then into naive UTC ISO strings, which
+compare correctly as strings, and it is scheduled for the instant its state
+next flips. Reading the view costs O(documents in effect) and parses no
+timestamps.
+It follows the collection through subscribe(). A reload event, the only
+kind SqliteCollection publishes, makes the next read rebuild it.
+
+ExpiringDict is a dict whose entries expire a fixed time after they were
+set. A timer on the event loop evicts them as they come due, so entries
+nobody reads again don't pile up.
+"""
+import asyncio
+import heapq
+import time
+from datetime import datetime, timezone
+from itertools import count
+
+from query import compile_filter
+
+class Schedule:
+    """Keys by the instant they are next due, earliest first."""
+
+    def __init__(self):
+        self._heap = []
+        self._due = {}
+        self._order = count()
+
+    def __len__(self):
+        return len(self._due)
+
+    def add(self, key, instant):
+        """Schedule key at instant, replacing any earlier schedule for it."""
+        self._due[key] = instant
+        # The counter keeps keys themselves from ever being compared
+        heapq.heappush(self._heap, (instant, next(self._order), key))
+
+    def cancel(self, key):
+        self._due.pop(key, None)
+
+    def _skip_stale(self):
+        heap = self._heap
+        while heap and self._due.get(heap[0][2]) != heap[0][0]:
+            heapq.heappop(heap)
+
+    def next_instant(self):
+        """Return the earliest instant scheduled, or None."""
+        self._skip_stale()
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now):
+        """Remove and return the keys due at or before now, earliest first."""
+        due = []
+        self._skip_stale()
+        while self._heap and self._heap[0][0] <= now:
+            _, _, key = heapq.heappop(self._heap)
+            del self._due[key]
+            due.append(key)
+            self._skip_stale()
+        return due
+
+    def clear(self):
+        self._heap.clear()
+        self._due.clear()
+
+def utc_timestamp(value):
+    """Return ISO 8601 timestamp value as a naive UTC ISO string. An offset is
+    converted to UTC and a date alone stands for its midnight. Raises
+    ValueError if value isn't a timestamp."""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    elif not isinstance(value, datetime):
+        raise ValueError(f"Not a timestamp: {value!r}")
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value.isoformat()
+
+# Schedule instants for EffectiveView. A document starts at its start bound
+# and ends just after its end bound, so (bound, 0) and (bound, 1) compared
+# with (now, 0) give "start <= now" and "end < now".
+STARTS = 0
+ENDS = 1
+
+class EffectiveView:
+    """The documents of a collection matching filter_dict whose
+    [start_field, end_field] window contains the current time."""
+
+    def __init__(self, collection, filter_dict=None, start_field='starts_at', end_field='ends_at'):
+        self.collection = collection
+        self.filter_dict = filter_dict or {}
+        self.start_field = start_field
+        self.end_field = end_field
+        self._matches = compile_filter(self.filter_dict)
+        self._waiting = {}
+        self._effective = {}
+        self._schedule = Schedule()
+        self._now = None
+        self._stale = True
+        self._rebuilding = False
+        self._unsubscribe = collection.subscribe(self._on_change)
+
+    def _bound(self, doc, field):
+        """Return the bound in field, None if there is none, or False if it isn't a timestamp."""
+        value = doc.get(field)
+        if value is None or value == '':
+            return None
+        try:
+            return utc_timestamp(value)
+        except ValueError:
+            return False
+
+    def _place(self, key, doc):
+        """File the document under key by where self._now falls in its window."""
+        self._waiting.pop(key, None)
+        self._effective.pop(key, None)
+        self._schedule.cancel(key)
+        if doc is None or not self._matches(doc):
+            return
+        start = self._bound(doc, self.start_field)
+        end = self._bound(doc, self.end_field)
+        if start is False or end is False:
+            return  # Like the filter it replaces: such a bound never matches
+        if start is not None and (start, STARTS) > self._now:
+            self._waiting[key] = doc
+            self._schedule.add(key, (start, STARTS))
+        elif end is None or (end, ENDS) > self._now:
+            self._effective[key] = doc
+            if end is not None:
+                self._schedule.add(key, (end, ENDS))
+        # Otherwise it has ended, until a write changes it
+
+    def _on_change(self, event):
+        if event.op == 'reload' or self._rebuilding:
+            # Changes landing during a rebuild may be missing from what it read
+            self._stale = True
+        elif not self._stale:
+            key = event.document_id
+            self._place(key, event.document)
+
+    async def _rebuild(self):
+        while self._stale:
+            self._stale = False
+            self._rebuilding = True
+            try:
+                documents = await self.collection.find(self.filter_dict).to_list()
+            finally:
+                self._rebuilding = False
+            if self._stale:
+                continue
+            self._waiting.clear()
+            self._effective.clear()
+            self._schedule.clear()
+            for doc in documents:
+                self._place(doc.get('_id', doc.get('id')), doc)
+
+    async def _advance(self, now):
+        # Reading the version pulls in other workers' changes, which reach
+        # the view through its subscription
+        await self.collection.get_version()
+        self._now = (utc_timestamp(now) if now else datetime.utcnow().isoformat(), STARTS)
+        await self._rebuild()
+        for key in self._schedule.pop_due(self._now):
+            self._place(key, self._waiting.get(key) or self._effective.get(key))
+
+    async def current(self, now=None):
+        """Return copies of the documents in effect at now, an ISO timestamp
+        defaulting to the current UTC time."""
+        await self._advance(now)
+        return [dict(doc) for doc in self._effective.values()]
+
+    async def next_change(self, now=None):
+        """Return the instant after now at which a document next starts or
+        ends, or None. Until then, or a write, current() stays the same."""
+        await self._advance(now)
+        return self._schedule.next_instant()
+
+    def close(self):
+        self._unsubscribe()
+
+class ExpiringDict:
+    """A dict whose entries are dropped ttl seconds after they were last set."""
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._data = {}
+        self._schedule = Schedule()
+        self._timer = None
+
+    def __setitem__(self, key, value):
+        self._data[key] = value
+        self._schedule.add(key, time.monotonic() + self.ttl)
+        self._start_timer()
+
+    def __getitem__(self, key):
+        self.evict()
+        return self._data[key]
+
+    def __delitem__(self, key):
+        del self._data[key]
+        self._schedule.cancel(key)
+
+    def __contains__(self, key):
+        self.evict()
+        return key in self._data
+
+    def __len__(self):
+        self.evict()
+        return len(self._data)
+
+    def get(self, key, default=None):
+        self.evict()
+        return self._data.get(key, default)
+
+    def evict(self):
+        """Drop every entry that has expired."""
+        for key in self._schedule.pop_due(time.monotonic()):
+            del self._data[key]
+
+    def _start_timer(self):
+        if self._timer is not None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return  # No event loop: expired entries go on the next access
+        # Entries expire in the order they were set, so the earliest is next
+        self._timer = loop.call_later(max(0, self._schedule.next_instant() - time.monotonic()), self._on_timer)
+
+    def _on_timer(self):
+        self._timer = None
+        self.evict()
+        if len(self._schedule):
+            self._start_timer()
@@ -0,0 +1,205 @@
+"""Full-text search over the public blogs and projects, for GET /api/search.
+
+SearchIndex is an in-memory inverted index: each term maps to the
+documents containing it and its weighted count in each. Text is
+lowercased and split into word tokens. A match in the title counts
+FIELD_WEIGHTS["title"] times, in tags, category or technologies twice,
+anywhere else once. Results are ranked by BM25 and ordered by score, then
+collection and id.
+
+Every query term matches whole words. The last one also matches as a
+prefix, unless the query ends in a space, so results follow along as
+someone types. A prefix stands for its PREFIX_EXPANSIONS most common
+completions, each document scoring by the best of them.
+
+The index keeps the collection versions it reflects. Before each search
+it asks each collection for changes_since() that version and reindexes
+just those documents, so writes from the admin routes and from other
+workers show up on the next search. It is rebuilt in full only when a
+collection can't answer that, as on the first search.
+"""
+import asyncio
+import heapq
+import math
+import re
+from bisect import bisect_left, insort
+from collections import Counter
+
+# The searchable lists, each with the filter of its list route and the fields indexed
+SEARCH_COLLECTIONS = {
+    "blogs": ({"published": True}, ("title", "excerpt", "content", "tags", "category")),
+    "projects": (None, ("title", "description", "tags", "category", "technologies")),
+}
+
+FIELD_WEIGHTS = {"title": 3, "tags": 2, "category": 2, "technologies": 2}
+
+# BM25 parameters: term frequency saturation and document length normalization
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+PREFIX_EXPANSIONS = 20
+
+# Documents indexed between yields to the event loop, so a full build
+# doesn't stall the requests arriving meanwhile
+INDEX_CHUNK = 500
+
+TOKEN_PATTERN = re.compile(r'\w+')
+
+def tokenize(text):
+    return TOKEN_PATTERN.findall(text.lower())
+
+def document_terms(doc, fields):
+    """Return a Counter of the document's terms, weighted by field."""
+    terms = Counter()
+    for field in fields:
+        value = doc.get(field)
+        if isinstance(value, list):
+            value = ' '.join(item for item in value if isinstance(item, str))
+        if not isinstance(value, str):
+            continue
+        weight = FIELD_WEIGHTS.get(field, 1)
+        if weight == 1:
+            terms.update(tokenize(value))
+        else:
+            for token, count in Counter(tokenize(value)).items():
+                terms[token] += count * weight
+    return terms
+
+class SearchIndex:
+    def __init__(self, db, collections=SEARCH_COLLECTIONS):
+        self.db = db
+        self.collections = collections
+        self._versions = dict.fromkeys(collections)
+        # Documents are numbered by slot, which postings refer to
+        self._slots = {}
+        self._keys = []
+        self._free = []
+        self._lengths = []
+        self._terms = []
+        self._postings = {}
+        self._vocabulary = []
+        self._total_length = 0
+        self._lock = asyncio.Lock()
+
+    def __len__(self):
+        return len(self._slots)
+
+    def _add(self, key, terms):
+        self._remove(key)
+        if not terms:
+            return
+        slot = self._free.pop() if self._free else len(self._keys)
+        if slot == len(self._keys):
+            self._keys.append(None)
+            self._lengths.append(0)
+            self._terms.append(None)
+        length = sum(terms.values())
+        self._slots[key] = slot
+        self._keys[slot] = key
+        self._lengths[slot] = length
+        self._terms[slot] = terms
+        self._total_length += length
+        postings = self._postings
+        for term, count in terms.items():
+            try:
+                postings[term][slot] = count
+            except KeyError:
+                postings[term] = {slot: count}
+                insort(self._vocabulary, term)
+
+    def _remove(self, key):
+        slot = self._slots.pop(key, None)
+        if slot is None:
+            return
+        for term in self._terms[slot]:
+            postings = self._postings[term]
+            del postings[slot]
+            if not postings:
+                del self._postings[term]
+                del self._vocabulary[bisect_left(self._vocabulary, term)]
+        self._total_length -= self._lengths[slot]
+        self._keys[slot] = self._terms[slot] = None
+        self._free.append(slot)
+
+    def _clear(self, name):
+        for key in [key for key in self._slots if key[0] == name]:
+            self._remove(key)
+
+    async def refresh(self):
+        """Bring the index up to date with the collections."""
+        async with self._lock:
+            for name, (filter_dict, fields) in self.collections.items():
+                collection = self.db.get_collection(name)
+                since = self._versions[name]
+                changes = None if since is None else await collection.changes_since(since, filter_dict)
+                if changes is None:
+                    # Read the version first: documents written meanwhile are reindexed next time
+                    version = await collection.get_version()
+                    self._clear(name)
+                    documents, deleted = await collection.find(filter_dict).to_list(), []
+                else:
+                    documents, deleted, version = changes
+                for doc_id in deleted:
+                    self._remove((name, doc_id))
+                for position, doc in enumerate(documents, 1):
+                    if doc.get('id') is not None:
+                        self._add((name, doc['id']), document_terms(doc, fields))
+                    if position % INDEX_CHUNK == 0:
+                        await asyncio.sleep(0)
+                self._versions[name] = version
+
+    def _expand(self, prefix):
+        """Return the PREFIX_EXPANSIONS terms starting with prefix found in the most documents."""
+        start = bisect_left(self._vocabulary, prefix)
+        end = bisect_left(self._vocabulary, prefix + '\U0010ffff', start)
+        terms = self._vocabulary[start:end]
+        if len(terms) > PREFIX_EXPANSIONS:
+            terms = heapq.nlargest(PREFIX_EXPANSIONS, terms, key=lambda term: len(self._postings[term]))
+        return terms
+
+    def _score(self, query):
+        """Return {slot: BM25 score} for every document matching query."""
+        tokens = tokenize(query)
+        if not tokens:
+            return {}
+        count = len(self._slots)
+        average = self._total_length / count if count else 1
+        # Per posting, the length normalization is a + c * length
+        a = BM25_K1 * (1 - BM25_B)
+        c = BM25_K1 * BM25_B / average
+        lengths = self._lengths
+        scores = {}
+        prefix_last = not query[-1].isspace()
+        tokens = list(dict.fromkeys(tokens))
+        for position, token in enumerate(tokens):
+            if prefix_last and position == len(tokens) - 1:
+                terms = self._expand(token)
+            else:
+                terms = [token] if token in self._postings else []
+            best = {}
+            for term in terms:
+                postings = self._postings[term]
+                idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+                weight = idf * (BM25_K1 + 1)
+                for slot, tf in postings.items():
+                    score = weight * tf / (tf + a + c * lengths[slot])
+                    if score > best.get(slot, 0):
+                        best[slot] = score
+            for slot, score in best.items():
+                scores[slot] = scores.get(slot, 0) + score
+        return scores
+
+    async def search(self, query, limit, after=None):
+        """Return (hits, total): up to limit (score, collection, id) hits for
+        query in ranked order, starting after the hit `after` if given, and
+        the number of documents matching."""
+        await self.refresh()
+        scores = self._score(query)
+        keys = self._keys
+        ranked = ((-score, *keys[slot]) for slot, score in scores.items())
+        if after is not None:
+            score, name, doc_id = after
+            start = (-score, name, doc_id)
+            ranked = (entry for entry in ranked if entry > start)
+        hits = [(-score, name, doc_id) for score, name, doc_id in heapq.nsmallest(limit, ranked)]
+        return hits, len(scores)
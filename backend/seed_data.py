@@ -1,82 +1,44 @@
 import asyncio
 import os
-import json
 from dotenv import load_dotenv
 from pathlib import Path
 from models import *
 from auth import hash_password
-from datetime import datetime
+from mock_db import MockDB
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# Mock database using JSON files
-class MockDB:
-    def __init__(self):
-        self.data_dir = ROOT_DIR / 'mock_data'
-        self.data_dir.mkdir(exist_ok=True)
-        
-    def get_collection(self, name):
-        return MockCollection(self.data_dir / f'{name}.json')
-
-class MockCollection:
-    def __init__(self, file_path):
-        self.file_path = file_path
-        
-    async def delete_many(self, filter_dict):
-        return None
-        
-    async def insert_one(self, document):
-        data = []
-        if self.file_path.exists():
-            with open(self.file_path, 'r', encoding='utf-8') as f:
-                try:
-                    data = json.load(f)
-                except:
-                    data = []
-        
-        # Convert datetime objects to strings
-        doc_dict = document.model_dump() if hasattr(document, 'model_dump') else document
-        for key, value in doc_dict.items():
-            if isinstance(value, datetime):
-                doc_dict[key] = value.isoformat()
-                
-        data.append(doc_dict)
-        
-        with open(self.file_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
-            
-        return None
-
 db = MockDB()
 
 async def seed_database():
     print("Starting database seeding...")
     
-    # Clear existing data (mock implementation)
+    # Replace the site content. Admins and visitor inquiries are real data,
+    # so they are never cleared, only seeded into an empty collection.
     admins_collection = db.get_collection('admins')
     services_collection = db.get_collection('services')
     projects_collection = db.get_collection('projects')
     testimonials_collection = db.get_collection('testimonials')
+    blogs_collection = db.get_collection('blogs')
+    contacts_collection = db.get_collection('contacts')
     
-    await admins_collection.delete_many({})
     await services_collection.delete_many({})
     await projects_collection.delete_many({})
     await testimonials_collection.delete_many({})
-    
-    blogs_collection = db.get_collection('blogs')
-    contacts_collection = db.get_collection('contacts')
     await blogs_collection.delete_many({})
-    await contacts_collection.delete_many({})
     
     # Seed Admin - CHANGE THESE CREDENTIALS IMMEDIATELY AFTER DEPLOYMENT
-    admin_data = Admin(
-        email="kuldeep@mmb.dev",
-        password=hash_password("MMB@2024!Secure"),
-        name="Kuldeep Parjapati"
-    )
-    await admins_collection.insert_one(admin_data)
-    print("✅ Admin user created")
+    if await admins_collection.count_documents({}):
+        print("⏭️  Admin users already exist, left unchanged")
+    else:
+        admin_data = Admin(
+            email="kuldeep@mmb.dev",
+            password=hash_password("MMB@2024!Secure"),
+            name="Kuldeep Parjapati"
+        )
+        await admins_collection.insert_one(admin_data)
+        print("✅ Admin user created")
     
     # Seed Services
     services_data = [
@@ -136,8 +98,7 @@ async def seed_database():
         )
     ]
     
-    for service in services_data:
-        await services_collection.insert_one(service)
+    await services_collection.insert_many(services_data)
     print("✅ Services created")
     
     # Seed Projects
@@ -235,8 +196,7 @@ async def seed_database():
         )
     ]
     
-    for project in projects_data:
-        await projects_collection.insert_one(project)
+    await projects_collection.insert_many(projects_data)
     print("✅ Projects created")
     
     # Seed Testimonials
@@ -270,8 +230,7 @@ async def seed_database():
         )
     ]
     
-    for testimonial in testimonials_data:
-        await testimonials_collection.insert_one(testimonial)
+    await testimonials_collection.insert_many(testimonials_data)
     print("✅ Testimonials created")
     
     # Seed Blog Posts
@@ -311,8 +270,7 @@ async def seed_database():
         )
     ]
     
-    for blog in blogs_data:
-        await blogs_collection.insert_one(blog)
+    await blogs_collection.insert_many(blogs_data)
     print("✅ Blog posts created")
     
     # Seed Sample Contacts
@@ -339,9 +297,16 @@ async def seed_database():
         )
     ]
     
-    for contact in contacts_data:
-        await contacts_collection.insert_one(contact)
-    print("✅ Contact inquiries created")
+    if await contacts_collection.count_documents({}):
+        print("⏭️  Contact inquiries already exist, left unchanged")
+    else:
+        await contacts_collection.insert_many(contacts_data)
+        print("✅ Contact inquiries created")
+    
+    # Fold the write logs so the seeded JSON files are complete on their own
+    for collection in [admins_collection, services_collection, projects_collection,
+                       testimonials_collection, blogs_collection, contacts_collection]:
+        await collection.compact()
     
     print("🎉 Database seeding completed successfully!")
 
@@ -0,0 +1,155 @@
+"""The React app's index.html, served with its first-paint data already in it.
+
+SpaShell renders the built index.html with two additions:
+- The bootstrap sections the app fetches on first paint, as an inline
+  JSON script. The frontend's utils/bootstrap.js reads it in place of
+  calling /api/bootstrap.
+- The title, description, theme color, favicon and Open Graph tags of the
+  route asked for, from the site settings, media settings and profile.
+
+A page is rendered once per route in SPA_ROUTES and kept with the
+versions of the collections behind it, and again only after one of them
+changes, the set of active offers moves on, or index.html is rebuilt.
+Paths outside SPA_ROUTES share one page with the site-wide tags.
+"""
+import gzip
+import hashlib
+import html
+import json
+import logging
+import re
+
+from fastapi import Request, Response
+
+from conditional import GZIP_LEVEL, accepts_gzip, etag_matches, gzip_etag
+from public_routes import bootstrap_collections, collect_bootstrap
+
+logger = logging.getLogger(__name__)
+
+# What frontend/src/utils/bootstrap.js asks /api/bootstrap for
+SHELL_SECTIONS = ["site_settings", "hero_section", "media_settings", "profile", "offers"]
+
+# The public routes of frontend/src/App.js, each with its page title
+SPA_ROUTES = {
+    "/": None,
+    "/about": "About",
+    "/services": "Services",
+    "/portfolio": "Portfolio",
+    "/testimonials": "Testimonials",
+    "/blog": "Blog",
+    "/contact": "Contact",
+    "/privacy": "Privacy Policy",
+    "/terms": "Terms of Service",
+}
+OTHER_ROUTES = "*"
+
+# The browser must check back before reusing a page, since its data changes
+CACHE_CONTROL = "no-cache"
+
+TITLE = re.compile(r'<title>.*?</title>', re.S)
+DESCRIPTION = re.compile(r'<meta name="description"[^>]*>')
+THEME_COLOR = re.compile(r'<meta name="theme-color"[^>]*>')
+
+def script_json(data):
+    # Nothing in the JSON may close the script element or open a comment
+    return (json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+            .replace('<', '\\u003c').replace('>', '\\u003e').replace('&', '\\u0026'))
+
+def meta_tags(route, data):
+    """Return (title, description, extra head tags) for route."""
+    settings = data.get("site_settings") or {}
+    media = data.get("media_settings") or {}
+    profile = data.get("profile") or {}
+    site_title = settings.get("site_title") or "MMB Portfolio"
+    page = SPA_ROUTES.get(route)
+    title = f"{page} | {site_title}" if page else site_title
+    description = (route == "/about" and profile.get("bio")) or settings.get("site_description") or ""
+    image = media.get("hero_image") or media.get("logo")
+    tags = [
+        ("meta", {"property": "og:type", "content": "website"}),
+        ("meta", {"property": "og:site_name", "content": site_title}),
+        ("meta", {"property": "og:title", "content": title}),
+        ("meta", {"property": "og:description", "content": description}),
+        ("meta", {"name": "twitter:card", "content": "summary_large_image" if image else "summary"}),
+    ]
+    if image:
+        tags.append(("meta", {"property": "og:image", "content": image}))
+    if media.get("favicon"):
+        tags.append(("link", {"rel": "icon", "href": media["favicon"]}))
+    return title, description, tags
+
+def tag_html(name, attributes):
+    return f'<{name} ' + ' '.join(f'{key}="{html.escape(str(value))}"' for key, value in attributes.items()) + '/>'
+
+class Page:
+    """One rendered index.html, plain and gzipped, and its ETag."""
+
+    def __init__(self, body):
+        self.body = body
+        self.gzipped = gzip.compress(body, GZIP_LEVEL, mtime=0)
+        self.etag = f'"{hashlib.blake2b(body, digest_size=12).hexdigest()}"'
+
+    def response(self, request: Request):
+        compressed = accepts_gzip(request.headers.get('accept-encoding', ''))
+        etag = gzip_etag(self.etag) if compressed else self.etag
+        headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL, "Vary": "Accept-Encoding"}
+        if_none_match = request.headers.get('if-none-match')
+        if if_none_match and (etag_matches(if_none_match, self.etag) or etag_matches(if_none_match, gzip_etag(self.etag))):
+            return Response(status_code=304, headers=headers)
+        if compressed:
+            headers["Content-Encoding"] = "gzip"
+        return Response(self.gzipped if compressed else self.body, media_type="text/html", headers=headers)
+
+class SpaShell:
+    def __init__(self, index_path, db):
+        self.index_path = index_path
+        self.db = db
+        self.collections = bootstrap_collections(SHELL_SECTIONS)
+        self._template = None
+        self._template_mtime = None
+        self._pages = {}
+
+    def _read_template(self):
+        mtime = self.index_path.stat().st_mtime_ns
+        if mtime != self._template_mtime:
+            self._template = self.index_path.read_text(encoding='utf-8')
+            self._template_mtime = mtime
+            self._pages.clear()
+        return self._template
+
+    async def _state(self):
+        versions = [await self.db.get_collection(name).get_epoch_and_version() for name in self.collections]
+        return versions, await self.db.active_offers.next_change()
+
+    def _render(self, template, route, data):
+        title, description, tags = meta_tags(route, data)
+        page = TITLE.sub(lambda _: f'<title>{html.escape(title)}</title>', template, count=1)
+        page = DESCRIPTION.sub(lambda _: tag_html("meta", {"name": "description", "content": description}),
+                               page, count=1)
+        color = (data.get("site_settings") or {}).get("primary_color")
+        if color:
+            page = THEME_COLOR.sub(lambda _: tag_html("meta", {"name": "theme-color", "content": color}),
+                                   page, count=1)
+        head = ''.join(tag_html(name, attributes) for name, attributes in tags)
+        head += f'<script id="bootstrap-data" type="application/json">{script_json(data)}</script>'
+        return page.replace('</head>', head + '</head>', 1)
+
+    async def page(self, path):
+        """Return the Page for path, rendering it if its data has changed."""
+        template = self._read_template()
+        route = '/' + path.strip('/')
+        route = route if route in SPA_ROUTES else OTHER_ROUTES
+        # Read before the data: a write landing meanwhile renders it again next time
+        state = await self._state()
+        cached = self._pages.get(route)
+        if cached is not None and cached[0] == state:
+            return cached[1]
+        try:
+            data = await collect_bootstrap(SHELL_SECTIONS)
+        except Exception:
+            # The app fetches the data itself when none is embedded
+            logger.exception("Serving index.html without bootstrap data")
+            return Page(template.encode())
+        page = Page(self._render(template, route, data).encode())
+        self._pages[route] = (state, page)
+        return page
@@ -0,0 +1,708 @@
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from pathlib import Path
+
+from changes import WATCH_QUEUE_SIZE, ChangeEvent, ChangeStream, Subscribers
+from query import (COMPARISONS, QueryError, apply_update, compile_projection, compile_update,
+                   field_conditions, filter_fields, split_projection)
+from mock_db import (TOMBSTONE_LIMIT, DeleteOne, InsertOne, MockCursor, MockResult, ReturnDocument, Transaction,
+                     UpdateOne, declare_schema, document_id, merge_results, to_document)
+
+ROOT_DIR = Path(__file__).parent
+logger = logging.getLogger(__name__)
+
+# Size of the thread pool, and so of the connection pool: each pool thread
+# keeps one connection open
+POOL_SIZE = 4
+
+# How long a writer waits for another process's transaction, in milliseconds
+BUSY_TIMEOUT_MS = 5000
+
+# SQLite storage with the same collection and cursor API as MockDB
+def quote_ident(name):
+    return '"' + name.replace('"', '""') + '"'
+
+def sql_literal(value):
+    if value is None:
+        return 'NULL'
+    if isinstance(value, bool):
+        return str(int(value))  # As sqlite3 binds them
+    if isinstance(value, (int, float)):
+        return repr(value)
+    return "'" + str(value).replace("'", "''") + "'"
+
+def inline_params(sql, params):
+    """Replace the ? placeholders in sql with params written as literals, for
+    statements such as CREATE TRIGGER that can't take parameters."""
+    params = iter(params)
+    parts = []
+    quote = None
+    for char in sql:
+        if quote:
+            quote = None if char == quote else quote
+        elif char in '\'"':
+            quote = char
+        elif char == '?':
+            char = sql_literal(next(params))
+        parts.append(char)
+    return ''.join(parts)
+
+def json_path(field):
+    """Return the JSON path of a dotted field as an SQL string literal."""
+    path = '$' + ''.join(f'[{part}]' if part.isdigit() else '.' + json.dumps(part)
+                         for part in field.split('.'))
+    return sql_literal(path)
+
+# json_type() values a comparison operand's Python type can be ordered against
+def comparable_types(value):
+    if isinstance(value, str):
+        return "('text')"
+    if isinstance(value, (int, float)):
+        # Python orders bools as the numbers 0 and 1
+        return "('integer', 'real', 'true', 'false')"
+    return None
+
+class SqliteDB:
+    """Documents in one SQLite database, a table per collection.
+
+    The database runs in WAL mode, so readers never block the writer and
+    several uvicorn workers can share the file. Queries run on a thread
+    pool whose threads each hold one connection.
+    """
+
+    def __init__(self, db_path=None, pool_size=POOL_SIZE):
+        self.db_path = Path(db_path) if db_path else ROOT_DIR / 'mock_data' / 'portfolio.sqlite3'
+        self.db_path.parent.mkdir(exist_ok=True)
+        self.executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix='sqlite-db')
+        self._local = threading.local()
+        self._collections = {}
+
+        with closing(self.connect()) as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            # Kept current by each collection's counter triggers
+            conn.execute('CREATE TABLE IF NOT EXISTS _counters (collection TEXT NOT NULL, '
+                         'name TEXT NOT NULL, count INTEGER NOT NULL, PRIMARY KEY (collection, name))')
+            # Each collection's version, bumped by every write transaction that changes it,
+            # and the oldest version changes_since() can still answer from
+            conn.execute('CREATE TABLE IF NOT EXISTS _versions (collection TEXT PRIMARY KEY, '
+                         'version INTEGER NOT NULL, floor INTEGER NOT NULL DEFAULT 0)')
+            if 'floor' not in {row[1] for row in conn.execute('PRAGMA table_info(_versions)')}:
+                conn.execute('ALTER TABLE _versions ADD COLUMN floor INTEGER NOT NULL DEFAULT 0')
+            # Ids of deleted documents, up to TOMBSTONE_LIMIT per collection
+            conn.execute('CREATE TABLE IF NOT EXISTS _tombstones (collection TEXT NOT NULL, '
+                         'version INTEGER NOT NULL, id)')
+            conn.execute('CREATE INDEX IF NOT EXISTS _tombstones_version ON _tombstones (collection, version)')
+            # Names this database, so versions counted in another one never pass for ours
+            conn.execute('CREATE TABLE IF NOT EXISTS _meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)')
+            conn.execute("INSERT OR IGNORE INTO _meta VALUES ('epoch', ?)", (uuid.uuid4().hex,))
+            self.epoch, = conn.execute("SELECT value FROM _meta WHERE key = 'epoch'").fetchone()
+
+        declare_schema(self)
+
+    def connect(self):
+        # Autocommit mode: writes open their own transactions with BEGIN IMMEDIATE
+        conn = sqlite3.connect(self.db_path, isolation_level=None, check_same_thread=False)
+        conn.execute(f'PRAGMA busy_timeout={BUSY_TIMEOUT_MS}')
+        # Callers resolve only once their write survives a power cut, as with MockDB
+        conn.execute('PRAGMA synchronous=FULL')
+        return conn
+
+    def connection(self):
+        """Return the calling pool thread's connection, opening it on first use."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = self.connect()
+        return conn
+
+    def _read_counters(self):
+        counters = {}
+        for collection, name, count in self.connection().execute('SELECT collection, name, count FROM _counters'):
+            counters.setdefault(collection, {})[name] = count
+        return counters
+
+    async def counters(self):
+        """Return {collection: {counter: count}}, read in one query."""
+        return await asyncio.get_running_loop().run_in_executor(self.executor, self._read_counters)
+
+    async def check_counters(self):
+        """Recount every counter, returning {"collection.counter": (maintained, recounted)}
+        for those that disagree."""
+        return {f'{name}.{counter}': values
+                for name, collection in self._collections.items()
+                for counter, values in (await collection.check_counters()).items()}
+
+    async def compact(self):
+        """Fold the write-ahead log back into the database file."""
+        for collection in self._collections.values():
+            await collection.compact()
+
+    def get_collection(self, name):
+        if name not in self._collections:
+            self._collections[name] = SqliteCollection(self, name)
+        return self._collections[name]
+
+    def transaction(self):
+        """Start a Transaction: writes to several collections, applied together by its commit()."""
+        return Transaction(self)
+
+    def _commit(self, operations):
+        conn = self.connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            committed = {}
+            for name, collection_operations in sorted(operations.items()):
+                if collection_operations:
+                    collection = self.get_collection(name)
+                    committed[name] = collection._stamped(conn, collection._bulk, collection_operations)
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+        return committed
+
+    async def commit(self, operations):
+        """Apply {collection name: [operations]} in one SQLite transaction.
+        Returns {collection name: results summed}."""
+        committed = await asyncio.get_running_loop().run_in_executor(self.executor, self._commit, operations)
+        results = {}
+        for name, (result, version) in committed.items():
+            self.get_collection(name)._seen_version(version)
+            results[name] = result
+        return results
+
+    async def recover(self):
+        """Nothing to do: SQLite rolls back an interrupted transaction by itself."""
+
+class SqliteCursor(MockCursor):
+    async def to_list(self, limit=None):
+        return await self.collection._select(self._filter(), self.sort_keys, self._limit(limit),
+                                             self.projection, self.skip_count)
+
+    async def __aiter__(self):
+        # One query per batch, so no more than a batch is decoded at a time
+        filter_dict, limit, skip = self._filter(), self._limit(), self.skip_count
+        while limit is None or limit > 0:
+            size = self.batch_count if limit is None else min(self.batch_count, limit)
+            docs = await self.collection._select(filter_dict, self.sort_keys, size, self.projection, skip)
+            for doc in docs:
+                yield doc
+            if len(docs) < size:
+                break
+            skip += size
+            if limit is not None:
+                limit -= size
+
+class SqliteCollection:
+    """A table of JSON documents keyed by an autoincrementing insertion order.
+
+    Fields declared with create_index() get a virtual generated column
+    extracting them from the document, plus an index on it. Filters, sorts,
+    limits and counts are compiled to SQL and use those columns where they
+    exist, so only matching documents ever leave the database. Projections
+    are applied in the SELECT, so dropped fields are never decoded in
+    Python. Each write method, including insert_many(), update_many() and
+    bulk_write() as a whole, runs in a single transaction. A hash index and
+    an ordered one are the same B-tree here; ordered is accepted for
+    compatibility with MockCollection.
+
+    The version moves once per write transaction rather than per document,
+    and subscribers only get reload events: one after each write made
+    through this object, and one whenever get_version() finds that another
+    process changed the table. Each row's version column holds the version
+    it was last written at, and deletes leave tombstones in _tombstones, for
+    changes_since(). Versions count in the database's epoch, made once when
+    the database is created.
+    """
+
+    def __init__(self, db, name):
+        self.db = db
+        self.name = name
+        self.table = quote_ident(name)
+        self._columns = {}
+        self._counters = {}
+        self._subscribers = Subscribers(logger)
+        with closing(db.connect()) as conn:
+            conn.execute(f'CREATE TABLE IF NOT EXISTS {self.table} (key INTEGER PRIMARY KEY AUTOINCREMENT, '
+                         'doc TEXT NOT NULL, version INTEGER NOT NULL DEFAULT 0)')
+            if 'version' not in {row[1] for row in conn.execute(f'PRAGMA table_xinfo({self.table})')}:
+                conn.execute(f'ALTER TABLE {self.table} ADD COLUMN version INTEGER NOT NULL DEFAULT 0')
+            conn.execute(f'CREATE INDEX IF NOT EXISTS {quote_ident(name + "__version")} '
+                         f'ON {self.table} (version)')
+            conn.execute('INSERT OR IGNORE INTO _versions (collection, version) VALUES (?, 0)', (name,))
+            self._version = self._read_version(conn)
+
+    def create_index(self, field, ordered=False):
+        if field in self._columns:
+            return
+        column = quote_ident(f'f_{field}')
+        with closing(self.db.connect()) as conn:
+            existing = {row[1] for row in conn.execute(f'PRAGMA table_xinfo({self.table})')}
+            if f'f_{field}' not in existing:
+                conn.execute(f'ALTER TABLE {self.table} ADD COLUMN {column} '
+                             f'GENERATED ALWAYS AS (json_extract(doc, {json_path(field)})) VIRTUAL')
+            index = quote_ident(f'{self.name}_{field}')
+            conn.execute(f'CREATE INDEX IF NOT EXISTS {index} ON {self.table} ({column})')
+        self._columns[field] = column
+
+    def create_counter(self, name, filter_dict=None):
+        """Keep a live count of the documents matching filter_dict under name.
+
+        Triggers adjust the count in the same transaction as every insert,
+        update and delete, so it stays right across processes. Registering
+        recounts from scratch and replaces the triggers, so a changed
+        filter takes effect on the next start.
+        """
+        params = []
+        condition = inline_params(self._condition(filter_dict, params), params) if filter_dict else '1'
+        row = f"collection = {sql_literal(self.name)} AND name = {sql_literal(name)}"
+        # Updates only matter when they touch a field the filter reads
+        paths = [json_path(field) for field in sorted(filter_fields(filter_dict))]
+        changed = ' OR '.join(f'json_type(OLD.doc, {path}) IS NOT json_type(NEW.doc, {path}) OR '
+                              f'json_extract(OLD.doc, {path}) IS NOT json_extract(NEW.doc, {path})'
+                              for path in paths)
+        events = [
+            ('insert', 'AFTER INSERT', '', '+', 'NEW'),
+            ('delete', 'BEFORE DELETE', '', '-', 'OLD'),
+            ('update_old', 'BEFORE UPDATE', changed, '-', 'OLD'),
+            ('update_new', 'AFTER UPDATE', changed, '+', 'NEW'),
+        ]
+        with closing(self.db.connect()) as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            for event, timing, when, sign, doc in events:
+                trigger = quote_ident(f'{self.name}_counter_{name}_{event}')
+                conn.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+                if event.startswith('update') and not paths:
+                    continue  # An unfiltered count never changes on update
+                conn.execute(
+                    f'CREATE TRIGGER {trigger} {timing} ON {self.table} '
+                    f'{f"WHEN {when} " if when else ""}BEGIN '
+                    f'UPDATE _counters SET count = count {sign} 1 WHERE {row} AND EXISTS '
+                    f'(SELECT 1 FROM {self.table} WHERE key = {doc}.key AND ({condition})); END')
+            conn.execute(f'INSERT OR REPLACE INTO _counters VALUES (?, ?, '
+                         f'(SELECT COUNT(*) FROM {self.table} WHERE {condition}))', (self.name, name))
+            conn.execute('COMMIT')
+        self._counters[name] = filter_dict or {}
+
+    def _run(self, func, *args):
+        """Run a query on the connection pool."""
+        return asyncio.get_running_loop().run_in_executor(self.db.executor, func, *args)
+
+    def _field(self, field):
+        return self._columns.get(field) or f'json_extract(doc, {json_path(field)})'
+
+    def _columns_sql(self, projection):
+        """Return the expression selecting a projected document, and its parameters."""
+        split = split_projection(projection)
+        if split is None:
+            return 'doc', []
+        include, fields = split
+        if include:
+            # Only the kept members are extracted and re-encoded
+            marks = ', '.join('?' * len(fields))
+            # json_each() hands booleans back as 1 and 0, so restore them from the type
+            value = "CASE type WHEN 'true' THEN json('true') WHEN 'false' THEN json('false') ELSE value END"
+            return (f'(SELECT json_group_object(key, {value}) FROM json_each(doc) '
+                    f'WHERE key IN ({marks}))'), list(fields)
+        # Excluded members are cut out in SQLite and never reach json.loads()
+        return f"json_remove(doc, {', '.join(json_path(field) for field in fields)})", []
+
+    def _where(self, filter_dict):
+        """Compile filter_dict to a WHERE clause and its parameters."""
+        if not filter_dict:
+            return '', []
+        params = []
+        return ' WHERE ' + self._condition(filter_dict, params), params
+
+    def _condition(self, filter_dict, params):
+        # Same operators and semantics as query.compile_filter()
+        clauses = []
+        for field, value in filter_dict.items():
+            if field in ('$and', '$or'):
+                subs = [f'({self._condition(sub, params)})' for sub in value]
+                clauses.append((' AND ' if field == '$and' else ' OR ').join(subs) or
+                               ('1' if field == '$and' else '0'))
+            elif field.startswith('$'):
+                raise QueryError(f"Unsupported operator {field}")
+            else:
+                for op, operand in field_conditions(value).items():
+                    clauses.append(self._operator(field, op, operand, params))
+        return ' AND '.join(f'({clause})' for clause in clauses) or '1'
+
+    def _equals(self, field, value, params):
+        if value is None:
+            # A null field matches, a missing one doesn't
+            return f"json_type(doc, {json_path(field)}) = 'null'"
+        if isinstance(value, (dict, list)):
+            params.append(json.dumps(value, ensure_ascii=False, separators=(',', ':')))
+            return f'{self._field(field)} = json(?)'
+        params.append(value)
+        return f'{self._field(field)} = ?'
+
+    def _operator(self, field, op, operand, params):
+        if op == '$exists':
+            return f"json_type(doc, {json_path(field)}) IS {'NOT ' if operand else ''}NULL"
+        if op in ('$eq', '$ne'):
+            sql = self._equals(field, operand, params)
+            # A missing field makes the comparison NULL, which $ne counts as a match
+            return sql if op == '$eq' else f'NOT IFNULL({sql}, 0)'
+        if op in ('$in', '$nin'):
+            if not isinstance(operand, (list, tuple, set, frozenset)):
+                raise QueryError(f"{op} needs a list, got {operand!r}")
+            scalars = [item for item in operand if item is not None and not isinstance(item, (dict, list))]
+            tests = [self._equals(field, item, params) for item in operand
+                     if item is None or isinstance(item, (dict, list))]
+            if scalars:
+                tests.append(f"{self._field(field)} IN ({', '.join('?' * len(scalars))})")
+                params.extend(scalars)
+            sql = ' OR '.join(f'({test})' for test in tests) or '0'
+            return sql if op == '$in' else f'NOT IFNULL({sql}, 0)'
+        if op in COMPARISONS:
+            types = comparable_types(operand)
+            if types is None:
+                return '0'
+            params.append(operand)
+            return (f'{self._field(field)} {COMPARISONS[op]} ? '
+                    f'AND json_type(doc, {json_path(field)}) IN {types}')
+        raise QueryError(f"Unsupported operator {op} on {field}")
+
+    def _query(self, filter_dict, sort_keys=None, limit=None, projection=None, skip=0):
+        columns, params = self._columns_sql(projection)
+        where, where_params = self._where(filter_dict)
+        params.extend(where_params)
+        order = []
+        for field, direction in sort_keys or ():
+            order.append(f"{self._field(field)} {'DESC' if direction == -1 else 'ASC'}")
+        # Ties keep insertion order, reversed for a single descending key
+        descending = sort_keys and len(sort_keys) == 1 and sort_keys[0][1] == -1
+        order.append('key DESC' if descending else 'key')
+        sql = f'SELECT {columns} FROM {self.table}{where} ORDER BY {", ".join(order)}'
+        if limit or skip:
+            # LIMIT -1 is no limit, for a skip on its own
+            sql += ' LIMIT ? OFFSET ?'
+            params.extend([limit or -1, skip])
+        return sql, params
+
+    def _fetch(self, sql, params):
+        rows = self.db.connection().execute(sql, params).fetchall()
+        return [json.loads(doc) for doc, in rows]
+
+    async def _select(self, filter_dict, sort_keys=None, limit=None, projection=None, skip=0):
+        return await self._run(self._fetch, *self._query(filter_dict, sort_keys, limit, projection, skip))
+
+    def _write(self, func, *args):
+        """Run func(conn, version, *args) in a write transaction, where version
+        is the one rows it writes are stamped with.
+
+        Returns its result and the collection's version after it.
+        """
+        conn = self.db.connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            result = self._stamped(conn, func, *args)
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+        return result
+
+    def _stamped(self, conn, func, *args):
+        """The body of _write(), for a transaction the caller opened."""
+        version = self._read_version(conn) + 1
+        changes = conn.total_changes
+        result = func(conn, version, *args)
+        if conn.total_changes != changes:
+            conn.execute('UPDATE _versions SET version = ? WHERE collection = ?', (version, self.name))
+        else:
+            version -= 1
+        return result, version
+
+    async def _transact(self, func, *args):
+        result, version = await self._run(self._write, func, *args)
+        self._seen_version(version)
+        return result
+
+    def _read_version(self, conn=None):
+        conn = conn or self.db.connection()
+        return conn.execute('SELECT version FROM _versions WHERE collection = ?', (self.name,)).fetchone()[0]
+
+    def _seen_version(self, version):
+        if version != self._version:
+            self._version = version
+            if self._subscribers:
+                self._subscribers.publish(ChangeEvent('reload', self.name, version))
+
+    def _keys(self, conn, filter_dict, multi):
+        where, params = self._where(filter_dict)
+        sql = f'SELECT key FROM {self.table}{where} ORDER BY key'
+        if not multi:
+            sql += ' LIMIT 1'
+        return [key for key, in conn.execute(sql, params)]
+
+    def _bury(self, conn, version, where, params):
+        """Leave tombstones for the documents matching where, about to be deleted."""
+        conn.execute(f"INSERT INTO _tombstones SELECT ?, ?, id FROM "
+                     f"(SELECT json_extract(doc, '$.id') AS id FROM {self.table}{where}) WHERE id IS NOT NULL",
+                     [self.name, version] + params)
+        # Past the limit, forget the oldest; clients synced before them must resync in full
+        row = conn.execute('SELECT rowid, version FROM _tombstones WHERE collection = ? '
+                           'ORDER BY rowid DESC LIMIT 1 OFFSET ?', (self.name, TOMBSTONE_LIMIT)).fetchone()
+        if row:
+            conn.execute('DELETE FROM _tombstones WHERE collection = ? AND rowid <= ?', (self.name, row[0]))
+            conn.execute('UPDATE _versions SET floor = MAX(floor, ?) WHERE collection = ?', (row[1], self.name))
+
+    def _insert_all(self, conn, version, docs, replace=False):
+        if replace:
+            self._bury(conn, version, '', [])
+            conn.execute(f'DELETE FROM {self.table}')
+        docs = [to_document(doc) for doc in docs]
+        conn.executemany(f'INSERT INTO {self.table} (doc, version) VALUES (?, ?)',
+                         ((json.dumps(doc, ensure_ascii=False), version) for doc in docs))
+        return MockResult(inserted_ids=[document_id(doc) for doc in docs])
+
+    def _patch(self, fields, removed):
+        """Return an expression for doc with fields set and removed deleted, and its parameters."""
+        sql = 'doc'
+        if fields:
+            sql = 'json_set(doc, ' + ', '.join(f'{json_path(field)}, json(?)' for field in fields) + ')'
+        if removed:
+            sql = f"json_remove({sql}, {', '.join(json_path(field) for field in removed)})"
+        return sql, [json.dumps(value, ensure_ascii=False) for value in fields.values()]
+
+    def _upsert(self, conn, version, filter_dict, update):
+        new_doc = apply_update(filter_dict.copy(), update)
+        # Add a unique ID for the new document
+        new_doc['_id'] = str(uuid.uuid4())
+        self._insert_all(conn, version, [new_doc])
+        return new_doc
+
+    def _update(self, conn, version, filter_dict, update_dict, upsert, multi):
+        update = compile_update(update_dict)
+        if set(update_dict) <= {'$set', '$unset'}:
+            # The result doesn't depend on the document, so SQLite patches
+            # it in place without it ever being decoded here
+            keys = self._keys(conn, filter_dict, multi)
+            patched, values = self._patch(update_dict.get('$set', {}), list(update_dict.get('$unset', {})))
+            sql = (f'UPDATE {self.table} SET doc = {patched}, version = ? '
+                   f'WHERE key = ? AND json(doc) IS NOT {patched}')
+            # Rows the update wouldn't change are matched but not rewritten
+            modified = sum(conn.execute(sql, values + [version, key] + values).rowcount
+                           for key in keys) if patched != 'doc' else 0
+        else:
+            where, params = self._where(filter_dict)
+            sql = f'SELECT key, doc FROM {self.table}{where} ORDER BY key'
+            rows = conn.execute(sql if multi else sql + ' LIMIT 1', params).fetchall()
+            keys = [key for key, _ in rows]
+            modified = 0
+            for key, doc in rows:
+                fields, removed = update(json.loads(doc))
+                if fields or removed:
+                    patched, values = self._patch(fields, removed)
+                    conn.execute(f'UPDATE {self.table} SET doc = {patched}, version = ? WHERE key = ?',
+                                 values + [version, key])
+                    modified += 1
+        if not keys:
+            if not upsert:
+                return MockResult()
+            new_doc = self._upsert(conn, version, filter_dict, update)
+            return MockResult(upserted_ids=[new_doc['_id']])
+        return MockResult(matched_count=len(keys), modified_count=modified)
+
+    def _find_and_update(self, conn, version, filter_dict, update_dict, projection, upsert, return_document):
+        update = compile_update(update_dict)
+        where, params = self._where(filter_dict)
+        row = conn.execute(f'SELECT key, doc FROM {self.table}{where} ORDER BY key LIMIT 1', params).fetchone()
+        before = None
+        if row is not None:
+            key, before = row[0], json.loads(row[1])
+            fields, removed = update(before)
+            if fields or removed:
+                patched, values = self._patch(fields, removed)
+                conn.execute(f'UPDATE {self.table} SET doc = {patched}, version = ? WHERE key = ?',
+                             values + [version, key])
+        elif upsert:
+            self._upsert(conn, version, filter_dict, update)
+            key = conn.execute('SELECT last_insert_rowid()').fetchone()[0]
+        else:
+            return None
+        if not return_document:
+            return None if before is None else compile_projection(projection)(before)
+        columns, params = self._columns_sql(projection)
+        doc, = conn.execute(f'SELECT {columns} FROM {self.table} WHERE key = ?', params + [key]).fetchone()
+        return json.loads(doc)
+
+    def _delete(self, conn, version, filter_dict, multi):
+        if multi:
+            where, params = self._where(filter_dict)
+            self._bury(conn, version, where, params)
+            return MockResult(deleted_count=conn.execute(f'DELETE FROM {self.table}{where}', params).rowcount)
+        deleted = 0
+        for key in self._keys(conn, filter_dict, multi):
+            self._bury(conn, version, ' WHERE key = ?', [key])
+            deleted += conn.execute(f'DELETE FROM {self.table} WHERE key = ?', (key,)).rowcount
+        return MockResult(deleted_count=deleted)
+
+    def _bulk(self, conn, version, operations):
+        results = []
+        for operation in operations:
+            if isinstance(operation, InsertOne):
+                results.append(self._insert_all(conn, version, [operation.document]))
+            elif isinstance(operation, UpdateOne):
+                results.append(self._update(conn, version, operation.filter_dict, operation.update_dict,
+                                            operation.upsert, operation.multi))
+            elif isinstance(operation, DeleteOne):
+                results.append(self._delete(conn, version, operation.filter_dict, operation.multi))
+            else:
+                raise TypeError(f"Unsupported bulk operation: {operation!r}")
+        return merge_results(results)
+
+    def _count(self, filter_dict):
+        where, params = self._where(filter_dict)
+        return self.db.connection().execute(f'SELECT COUNT(*) FROM {self.table}{where}', params).fetchone()[0]
+
+    def _check_counters(self):
+        conn = self.db.connection()
+        # One read transaction, so a concurrent write can't pass for drift
+        conn.execute('BEGIN')
+        try:
+            maintained = dict(conn.execute('SELECT name, count FROM _counters WHERE collection = ?',
+                                           (self.name,)))
+            mismatches = {}
+            for name, filter_dict in self._counters.items():
+                recounted = self._count(filter_dict)
+                if recounted != maintained.get(name):
+                    mismatches[name] = (maintained.get(name), recounted)
+            return mismatches
+        finally:
+            conn.execute('COMMIT')
+
+    def _checkpoint(self):
+        self.db.connection().execute('PRAGMA wal_checkpoint(TRUNCATE)')
+
+    async def compact(self):
+        """Fold the write-ahead log back into the database file."""
+        await self._run(self._checkpoint)
+
+    def find(self, filter_dict=None, projection=None):
+        return SqliteCursor(self, filter_dict, projection=projection)
+
+    async def find_async(self, filter_dict=None, limit=None):
+        return await self._select(None, None, limit)
+
+    async def find_one(self, filter_dict, projection=None):
+        docs = await self._select(filter_dict, None, 1, projection)
+        return docs[0] if docs else None
+
+    async def insert_one(self, document):
+        await self._transact(self._insert_all, [document])
+        return None
+
+    async def insert_many(self, documents):
+        return await self._transact(self._insert_all, documents)
+
+    async def update_one(self, filter_dict, update_dict, upsert=False):
+        result = await self._transact(self._update, filter_dict, update_dict, upsert, False)
+        # Routes read modified_count as "found", so a match counts even if nothing changed
+        result.modified_count = 1 if result.matched_count or result.upserted_ids else 0
+        return result
+
+    async def update_many(self, filter_dict, update_dict, upsert=False):
+        return await self._transact(self._update, filter_dict, update_dict, upsert, True)
+
+    async def find_one_and_update(self, filter_dict, update_dict, projection=None, upsert=False,
+                                  return_document=ReturnDocument.BEFORE):
+        """Update the first document matching filter_dict and return it, in one transaction.
+
+        Same as MockCollection.find_one_and_update().
+        """
+        return await self._transact(self._find_and_update, filter_dict, update_dict, projection,
+                                    upsert, return_document)
+
+    async def delete_one(self, filter_dict):
+        return await self._transact(self._delete, filter_dict, False)
+
+    async def delete_many(self, filter_dict):
+        return await self._transact(self._delete, filter_dict, True)
+
+    async def bulk_write(self, operations):
+        """Apply the operations in order, in one transaction. Returns their counts summed."""
+        return await self._transact(self._bulk, operations)
+
+    async def count_documents(self, filter_dict=None):
+        return await self._run(self._count, filter_dict)
+
+    async def counters(self):
+        """Return the current value of every counter, by name."""
+        counters = await self.db.counters()
+        return counters.get(self.name, {})
+
+    async def check_counters(self):
+        """Recount every counter from scratch.
+
+        Returns {name: (maintained, recounted)} for the counters that
+        disagree, so an empty dict means they are all correct.
+        """
+        return await self._run(self._check_counters)
+
+    def _changes(self, since, filter_dict, projection):
+        conn = self.db.connection()
+        # One read transaction, so the documents and tombstones agree
+        conn.execute('BEGIN')
+        try:
+            version, floor = conn.execute('SELECT version, floor FROM _versions WHERE collection = ?',
+                                          (self.name,)).fetchone()
+            if not floor <= since <= version:
+                return None
+            columns, params = self._columns_sql(projection)
+            condition = self._condition(filter_dict, params) if filter_dict else '1'
+            rows = conn.execute(f"SELECT {columns}, ({condition}), json_extract(doc, '$.id') "
+                                f'FROM {self.table} WHERE version > ? ORDER BY version, key',
+                                params + [since]).fetchall()
+            buried = conn.execute('SELECT id FROM _tombstones WHERE collection = ? AND version > ?',
+                                  (self.name, since)).fetchall()
+        finally:
+            conn.execute('COMMIT')
+        documents = [json.loads(doc) for doc, matched, _ in rows if matched]
+        live = {doc_id for _, matched, doc_id in rows if matched}
+        # Documents that stopped matching are gone as far as the client knows
+        deleted = dict.fromkeys(doc_id for _, matched, doc_id in rows
+                                if not matched and doc_id is not None and doc_id not in live)
+        # A document deleted and then written again under the same id is live
+        deleted.update(dict.fromkeys(doc_id for doc_id, in buried if doc_id not in live))
+        return documents, list(deleted), version
+
+    async def changes_since(self, since, filter_dict=None, projection=None, epoch=None):
+        """Return what changed after version since, as seen through filter_dict.
+
+        Same as MockCollection.changes_since(): (documents, deleted, version),
+        or None if the client has to refetch everything.
+        """
+        if epoch is not None and epoch != self.db.epoch:
+            return None
+        return await self._run(self._changes, since, filter_dict, projection)
+
+    async def get_version(self):
+        """Return the collection's version, which every write transaction increments."""
+        version = await self._run(self._read_version)
+        self._seen_version(version)
+        return version
+
+    async def get_epoch_and_version(self):
+        """Return (epoch, version), as MockCollection.get_epoch_and_version() does."""
+        return self.db.epoch, await self.get_version()
+
+    def subscribe(self, callback):
+        """Call callback(event) with a reload ChangeEvent whenever the table changes.
+
+        Returns a function that cancels the subscription.
+        """
+        return self._subscribers.add(callback)
+
+    def watch(self, max_queue=WATCH_QUEUE_SIZE):
+        """Return a ChangeStream of this collection's changes from now on."""
+        return ChangeStream(self, max_queue)
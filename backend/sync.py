@@ -0,0 +1,68 @@
+"""Delta sync of the public lists, for GET /api/changes.
+
+The first call, without `since`, returns every list in full along with a
+version token. Passing that token back as `since` returns, per list, only
+the documents written after it and the ids of those deleted (or no longer
+public) since, plus a new token. A list the server can no longer diff
+against the token comes back in full with "reset" set, and the client
+replaces its copy. That includes a list whose epoch has changed since the
+token was issued, as after a fresh data directory or a backend switch,
+where versions start over.
+"""
+from fastapi import HTTPException
+
+from models import BlogPostSummary, Project, Service, Testimonial
+from pagination import CREATED_ORDER, decode_cursor, encode_cursor
+
+# The synced lists, each with the filter, projection and model of its list route
+SYNC_COLLECTIONS = {
+    "services": ({"active": True}, None, Service),
+    "projects": (None, None, Project),
+    "testimonials": ({"approved": True}, None, Testimonial),
+    "blogs": ({"published": True}, {"content": 0}, BlogPostSummary),
+    "offers": ({"active": True}, None, None),
+}
+
+def is_version(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+def decode_versions(token):
+    """Return the [epoch, version] pairs of a token, in SYNC_COLLECTIONS
+    order. A bare version, as tokens held before epochs, becomes None and
+    its list resyncs in full."""
+    entries = decode_cursor(token, list(SYNC_COLLECTIONS))
+    versions = []
+    for entry in entries:
+        if is_version(entry):
+            versions.append(None)
+        elif (isinstance(entry, list) and len(entry) == 2
+              and isinstance(entry[0], str) and is_version(entry[1])):
+            versions.append(entry)
+        else:
+            raise HTTPException(status_code=400, detail="Invalid version")
+    return versions
+
+async def collect_changes(db, since=None):
+    """Return the changes to every synced list after the version token since."""
+    versions = decode_versions(since) if since else [None] * len(SYNC_COLLECTIONS)
+    collections, latest = {}, []
+    for (name, (filter_dict, projection, model)), last in zip(SYNC_COLLECTIONS.items(), versions):
+        collection = db.get_collection(name)
+        changes = None
+        if last is not None:
+            epoch, version = last
+            changes = await collection.changes_since(version, filter_dict, projection, epoch)
+        reset = changes is None
+        if reset:
+            # Read the version first: documents written meanwhile are resent next time
+            epoch, version = await collection.get_epoch_and_version()
+            documents = await collection.find(filter_dict, projection).sort(CREATED_ORDER).to_list()
+            changes = documents, [], version
+        documents, deleted, version = changes
+        collections[name] = {
+            "reset": reset,
+            "documents": [model(**doc) for doc in documents] if model else documents,
+            "deleted": deleted,
+        }
+        latest.append([epoch, version])
+    return {"version": encode_cursor(latest), "collections": collections}
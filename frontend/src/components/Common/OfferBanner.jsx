@@ -1,7 +1,7 @@
 import React, { useState, useEffect } from 'react';
 import { Button } from '../ui/button';
 import { X, Gift, Clock, Percent, ExternalLink } from 'lucide-react';
-import axios from 'axios';
+import { fetchBootstrap } from '../../utils/bootstrap';
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL || '';
 const API = BACKEND_URL ? `${BACKEND_URL}/api` : '/api';
@@ -31,18 +31,17 @@ const OfferBanner = () => {
   const fetchOfferData = async () => {
     try {
       console.log('🔄 Fetching offer data...');
-      const [offersResponse, settingsResponse] = await Promise.all([
-        axios.get(`${API}/offers/active`),
-        axios.get(`${API}/site-settings`)
+      const [activeOffers, settings] = await Promise.all([
+        fetchBootstrap(API, 'offers'),
+        fetchBootstrap(API, 'site_settings')
       ]);
       
-      console.log('📝 Site Settings:', settingsResponse.data);
-      console.log('🎁 Active Offers:', offersResponse.data);
+      console.log('📝 Site Settings:', settings);
+      console.log('🎁 Active Offers:', activeOffers);
       
-      setSiteSettings(settingsResponse.data);
+      setSiteSettings(settings);
       
       // Get the highest priority active offer
-      const activeOffers = offersResponse.data;
       if (activeOffers && activeOffers.length > 0) {
         console.log('✅ Setting offer:', activeOffers[0]);
         setOffer(activeOffers[0]); // Already sorted by priority
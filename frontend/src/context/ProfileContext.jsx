@@ -1,5 +1,5 @@
 import React, { createContext, useContext, useState, useEffect } from 'react';
-import axios from 'axios';
+import { fetchBootstrap } from '../utils/bootstrap';
 
 const ProfileContext = createContext();
 
@@ -22,10 +22,10 @@ export const ProfileProvider = ({ children }) => {
       setError(null);
       
       const backendUrl = process.env.REACT_APP_BACKEND_URL || '';
-      const apiUrl = backendUrl ? `${backendUrl}/api/profile` : '/api/profile';
-      const response = await axios.get(apiUrl);
+      const api = backendUrl ? `${backendUrl}/api` : '/api';
+      const profileData = await fetchBootstrap(api, 'profile');
       
-      setProfile(response.data);
+      setProfile(profileData);
     } catch (err) {
       console.error('Error fetching profile:', err);
       setError('Failed to fetch profile data');
@@ -1,5 +1,5 @@
 import React, { createContext, useContext, useState, useEffect } from 'react';
-import axios from 'axios';
+import { fetchBootstrap } from '../utils/bootstrap';
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL || '';
 const API = BACKEND_URL ? `${BACKEND_URL}/api` : '/api';
@@ -21,13 +21,13 @@ export const SiteSettingsProvider = ({ children }) => {
       setLoading(true);
       setError(null);
       
-      const [siteResponse, mediaResponse] = await Promise.all([
-        axios.get(`${API}/site-settings`),
-        axios.get(`${API}/media-settings`)
+      const [siteData, mediaData] = await Promise.all([
+        fetchBootstrap(API, 'site_settings'),
+        fetchBootstrap(API, 'media_settings')
       ]);
       
-      setSiteSettings(siteResponse.data);
-      setMediaSettings(mediaResponse.data);
+      setSiteSettings(siteData);
+      setMediaSettings(mediaData);
     } catch (err) {
       console.error('Failed to fetch site settings:', err);
       setError(err);
@@ -14,6 +14,7 @@ import {
   Save, X, Bold, Italic, Underline, List, Link2, Code
 } from 'lucide-react';
 import axios from 'axios';
+import { fetchAllPages } from '../../utils/pagination';
 import { useAuth } from '../../context/AuthContext';
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL || "";
@@ -68,9 +69,9 @@ const AdminBlogs = () => {
         headers: { Authorization: `Bearer ${token}` }
       } : {};
       
-      const response = await axios.get(`${API}/admin/blogs`, config);
-      setBlogs(response.data);
-      calculateStats(response.data);
+      const blogs = await fetchAllPages(`${API}/admin/blogs`, config);
+      setBlogs(blogs);
+      calculateStats(blogs);
     } catch (error) {
       console.error('Fetch blogs error:', error);
       toast({
@@ -224,7 +225,24 @@ const AdminBlogs = () => {
     }
   };
 
-  const handleEdit = (blog) => {
+  const handleEdit = async (summary) => {
+    // The list leaves out content, so load the full post for the editor
+    let blog;
+    try {
+      const config = token ? {
+        headers: { Authorization: `Bearer ${token}` }
+      } : {};
+      const response = await axios.get(`${API}/admin/blogs/${summary.id}`, config);
+      blog = response.data;
+    } catch (error) {
+      console.error('Fetch blog error:', error);
+      toast({
+        title: "Error",
+        description: "Failed to load blog post",
+        variant: "destructive"
+      });
+      return;
+    }
     setEditBlog(blog);
     setFormData({
       title: blog.title,
@@ -5,6 +5,7 @@ import { Badge } from '../../components/ui/badge';
 import { useToast } from '../../hooks/use-toast';
 import { Mail, Phone, Clock, Eye, Trash2, MessageSquare } from 'lucide-react';
 import axios from 'axios';
+import { fetchAllPages } from '../../utils/pagination';
 import { useAuth } from '../../context/AuthContext';
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL || "";
@@ -26,8 +27,7 @@ const AdminContacts = () => {
         headers: { Authorization: `Bearer ${token}` }
       } : {};
       
-      const response = await axios.get(`${API}/admin/contacts`, config);
-      setContacts(response.data);
+      setContacts(await fetchAllPages(`${API}/admin/contacts`, config));
     } catch (error) {
       console.error('Fetch contacts error:', error);
       toast({
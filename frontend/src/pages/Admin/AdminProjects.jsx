@@ -9,6 +9,7 @@ import { Dialog, DialogContent, DialogHeader, DialogTitle, DialogTrigger } from
 import { useToast } from '../../hooks/use-toast';
 import { Plus, Edit, Trash2, ExternalLink, Github } from 'lucide-react';
 import axios from 'axios';
+import { fetchAllPages } from '../../utils/pagination';
 import { useAuth } from '../../context/AuthContext';
 import { handleError, handleSuccess, apiCall, handleValidationErrors } from '../../utils/errorHandler';
 import { LoadingWrapper, CardLoading, ButtonLoading, EmptyState } from '../../components/ui/loading';
@@ -47,8 +48,7 @@ const AdminProjects = () => {
           headers: { Authorization: `Bearer ${token}` }
         } : {};
         
-        const response = await axios.get(`${API}/admin/projects`, config);
-        return response.data;
+        return await fetchAllPages(`${API}/admin/projects`, config);
       },
       {
         onStart: () => setLoading(true),
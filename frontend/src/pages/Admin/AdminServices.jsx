@@ -9,6 +9,7 @@ import { Dialog, DialogContent, DialogHeader, DialogTitle, DialogTrigger } from
 import { useToast } from '../../hooks/use-toast';
 import { Plus, Edit, Trash2, Eye } from 'lucide-react';
 import axios from 'axios';
+import { fetchAllPages } from '../../utils/pagination';
 import { useAuth } from '../../context/AuthContext';
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL || "";
@@ -43,8 +44,7 @@ const AdminServices = () => {
         headers: { Authorization: `Bearer ${token}` }
       } : {};
       
-      const response = await axios.get(`${API}/admin/services`, config);
-      setServices(response.data);
+      setServices(await fetchAllPages(`${API}/admin/services`, config));
     } catch (error) {
       console.error('Fetch services error:', error);
       toast({
@@ -29,6 +29,7 @@ import {
   Image as ImageIcon
 } from 'lucide-react';
 import axios from 'axios';
+import { fetchAllPages } from '../../utils/pagination';
 import { useAuth } from '../../context/AuthContext';
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL || "";
@@ -74,8 +75,7 @@ const AdminTestimonials = () => {
         headers: { Authorization: `Bearer ${token}` }
       } : {};
       
-      const response = await axios.get(`${API}/admin/testimonials`, config);
-      setTestimonials(response.data);
+      setTestimonials(await fetchAllPages(`${API}/admin/testimonials`, config));
     } catch (error) {
       console.error('Fetch testimonials error:', error);
       toast({
@@ -4,7 +4,7 @@ import { Card, CardContent } from '../components/ui/card';
 import { Button } from '../components/ui/button';
 import { Input } from '../components/ui/input';
 import { Calendar, Clock, User, Search, Tag, ArrowRight } from 'lucide-react';
-import axios from 'axios';
+import { fetchSynced } from '../utils/sync';
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL || '';
 const API = BACKEND_URL ? `${BACKEND_URL}/api` : "/api";
@@ -21,8 +21,7 @@ const Blog = () => {
 
   const fetchBlogs = async () => {
     try {
-      const response = await axios.get(`${API}/blogs`);
-      setBlogPosts(response.data);
+      setBlogPosts(await fetchSynced(API, 'blogs'));
     } catch (error) {
       console.error('Failed to fetch blogs:', error);
     } finally {
@@ -4,7 +4,8 @@ import { Button } from '../components/ui/button';
 import { Card, CardContent } from '../components/ui/card';
 import { Badge } from '../components/ui/badge';
 import { ArrowRight, Star, Globe, Layout, Palette, Code, PenTool, TrendingUp, Users, CheckCircle, Award, Target, ExternalLink } from 'lucide-react';
-import axios from 'axios';
+import { fetchBootstrap } from '../utils/bootstrap';
+import { fetchSynced } from '../utils/sync';
 import { useSiteSettings } from '../context/SiteSettingsContext';
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL || "";
@@ -26,17 +27,17 @@ const Home = () => {
 
   const fetchData = async () => {
     try {
-      const [servicesRes, projectsRes, testimonialsRes, heroRes] = await Promise.all([
-        axios.get(`${API}/services`),
-        axios.get(`${API}/projects`),
-        axios.get(`${API}/testimonials`),
-        axios.get(`${API}/hero-section`)
+      const [services, projects, testimonials, heroSection] = await Promise.all([
+        fetchSynced(API, 'services'),
+        fetchSynced(API, 'projects'),
+        fetchSynced(API, 'testimonials'),
+        fetchBootstrap(API, 'hero_section')
       ]);
       
-      setServices(servicesRes.data);
-      setProjects(projectsRes.data);
-      setTestimonials(testimonialsRes.data);
-      setHeroData(heroRes.data);
+      setServices(services);
+      setProjects(projects);
+      setTestimonials(testimonials);
+      setHeroData(heroSection);
     } catch (error) {
       console.error('Failed to fetch data:', error);
     } finally {
@@ -3,7 +3,7 @@ import { Badge } from '../components/ui/badge';
 import { Card, CardContent } from '../components/ui/card';
 import { Button } from '../components/ui/button';
 import { ExternalLink, Github, Filter } from 'lucide-react';
-import axios from 'axios';
+import { fetchSynced } from '../utils/sync';
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL || '';
 const API = BACKEND_URL ? `${BACKEND_URL}/api` : '/api';
@@ -19,8 +19,7 @@ const Portfolio = () => {
 
   const fetchProjects = async () => {
     try {
-      const response = await axios.get(`${API}/projects`);
-      setProjects(response.data);
+      setProjects(await fetchSynced(API, 'projects'));
     } catch (error) {
       console.error('Failed to fetch projects:', error);
     } finally {
@@ -4,7 +4,7 @@ import { Card, CardContent } from '../components/ui/card';
 import { Button } from '../components/ui/button';
 import { Link } from 'react-router-dom';
 import { CheckCircle, Globe, Layout, Palette, Code, PenTool, TrendingUp, ArrowRight } from 'lucide-react';
-import axios from 'axios';
+import { fetchSynced } from '../utils/sync';
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL || '';
 const API = BACKEND_URL ? `${BACKEND_URL}/api` : '/api';
@@ -19,8 +19,7 @@ const Services = () => {
 
   const fetchServices = async () => {
     try {
-      const response = await axios.get(`${API}/services`);
-      setServices(response.data);
+      setServices(await fetchSynced(API, 'services'));
     } catch (error) {
       console.error('Failed to fetch services:', error);
     } finally {
@@ -2,7 +2,7 @@ import React, { useState, useEffect } from 'react';
 import { Badge } from '../components/ui/badge';
 import { Card, CardContent } from '../components/ui/card';
 import { Star, Quote } from 'lucide-react';
-import axios from 'axios';
+import { fetchSynced } from '../utils/sync';
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL || '';
 const API = BACKEND_URL ? `${BACKEND_URL}/api` : '/api';
@@ -17,8 +17,7 @@ const Testimonials = () => {
 
   const fetchTestimonials = async () => {
     try {
-      const response = await axios.get(`${API}/testimonials`);
-      setTestimonials(response.data);
+      setTestimonials(await fetchSynced(API, 'testimonials'));
     } catch (error) {
       console.error('Failed to fetch testimonials:', error);
     } finally {
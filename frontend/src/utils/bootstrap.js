@@ -0,0 +1,42 @@
+import axios from 'axios';
+
+// Site settings, hero section, media settings, profile and active offers
+// come from a single /api/bootstrap response: one round trip on first paint
+// instead of one per section. The lists come from sync.js instead.
+const SECTIONS = 'site_settings,hero_section,media_settings,profile,offers';
+
+// The server renders the same data into index.html, which answers the
+// requests made while the page first renders without any round trip
+const readEmbedded = () => {
+  try {
+    const script = document.getElementById('bootstrap-data');
+    return script ? JSON.parse(script.textContent) : null;
+  } catch (error) {
+    return null;
+  }
+};
+
+let embedded = readEmbedded();
+let pending = null;
+
+// Return one section of the bootstrap data. Sections requested together
+// share one request.
+export const fetchBootstrap = async (api, section) => {
+  if (embedded && section in embedded) {
+    const data = embedded;
+    // Later requests, such as refreshes after an edit, fetch afresh
+    queueMicrotask(() => {
+      embedded = null;
+    });
+    return data[section];
+  }
+  if (!pending) {
+    pending = axios
+      .get(`${api}/bootstrap`, { params: { sections: SECTIONS } })
+      .then((response) => response.data)
+      .finally(() => {
+        pending = null;
+      });
+  }
+  return (await pending)[section];
+};
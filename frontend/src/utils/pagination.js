@@ -0,0 +1,17 @@
+import axios from 'axios';
+
+// List endpoints return one page at a time and point to the next one in the
+// X-Next-Cursor header; follow it until the last page
+export const fetchAllPages = async (url, config = {}) => {
+  const items = [];
+  let cursor = null;
+  do {
+    const response = await axios.get(url, {
+      ...config,
+      params: { ...config.params, ...(cursor ? { cursor } : {}) }
+    });
+    items.push(...response.data);
+    cursor = response.headers['x-next-cursor'];
+  } while (cursor);
+  return items;
+};
@@ -0,0 +1,52 @@
+import axios from 'axios';
+
+// The public lists are kept in localStorage between visits. /api/changes
+// brings them up to date with only what changed since the stored version.
+const STORAGE_KEY = 'mmb-sync';
+
+const readState = () => {
+  try {
+    return JSON.parse(localStorage.getItem(STORAGE_KEY)) || { version: null, collections: {} };
+  } catch (error) {
+    return { version: null, collections: {} };
+  }
+};
+
+// Same order as the list endpoints: oldest first, id settles ties
+const compareValues = (a = '', b = '') => (a < b ? -1 : a > b ? 1 : 0);
+const createdOrder = (a, b) => compareValues(a.created_at, b.created_at) || compareValues(a.id, b.id);
+
+const sync = async (api) => {
+  const state = readState();
+  const response = await axios.get(`${api}/changes`, {
+    params: state.version ? { since: state.version } : {}
+  });
+  const { version, collections } = response.data;
+  for (const [name, change] of Object.entries(collections)) {
+    const kept = change.reset ? [] : state.collections[name] || [];
+    const items = new Map(kept.map((item) => [item.id, item]));
+    change.deleted.forEach((id) => items.delete(id));
+    change.documents.forEach((doc) => items.set(doc.id, doc));
+    state.collections[name] = [...items.values()].sort(createdOrder);
+  }
+  state.version = version;
+  try {
+    localStorage.setItem(STORAGE_KEY, JSON.stringify(state));
+  } catch (error) {
+    // Out of quota or disabled: the next visit syncs in full
+  }
+  return state.collections;
+};
+
+let pending = null;
+
+// Return the synced list `name` (services, projects, testimonials, blogs or
+// offers). Lists requested together share one request.
+export const fetchSynced = async (api, name) => {
+  if (!pending) {
+    pending = sync(api).finally(() => {
+      pending = null;
+    });
+  }
+  return (await pending)[name] || [];
+};